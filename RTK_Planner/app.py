@@ -1,25 +1,54 @@
+import binascii
 import datetime
 import json
 import os
-import queue
+import socketserver
 import sqlite3
+import struct
+import threading
+import time
 
+import numpy as np
 from flask import Flask, Response, abort, g, jsonify, render_template, request
 
+from broker import DROP_OLDEST, LATEST, Broker
+from commandmailbox import CommandMailbox
+from database import ConnectionPool, ensure_unique_index
+from geodesy import densify, simplify
+from roverregistry import RoverRegistry
+from trackstore import TrackStore
+from trailstore import (create_schema, delete_points, format_microdegrees, get_points, insert_points,
+                        migrate_legacy_trails, parse_microdegrees, parse_points, points_as_degrees,
+                        points_in_bbox, trail_summaries, trails_near)
+
 DATABASE = "rovers.db"
 DATABASE_SCHEMA = "schema.sql"
+TRACK_DATABASE = "tracks.db"
+TELEMETRY_PORT = 5001
 
-# Queue to store data from connected rovers.
-rover_data_queue = queue.Queue()
+# Data from connected rovers, topic is the rover MAC.
+rover_broker = Broker()
+SSE_HEARTBEAT_S = 15
+SSE_BUFFER_SIZE = 100
 
 app = Flask(__name__)
 
 
 # Database helper functions
+db_pool = None
+
+
+def get_pool():
+    global db_pool
+    if db_pool is None or db_pool.path != DATABASE:
+        db_pool = ConnectionPool(DATABASE)
+    return db_pool
+
+
 def get_db():
+    # Connection is borrowed from the pool for the request.
     if "db" not in g:
-        g.db = sqlite3.connect(DATABASE)
-        g.db.row_factory = sqlite3.Row  # DB cursor returns dict instead of tuple.
+        g.db = get_pool().acquire()
     return g.db
 
 
@@ -27,7 +56,7 @@ def get_db():
 def close_connection(exception):
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        get_pool().release(db)
 
 
 def init_db():
@@ -84,10 +113,13 @@ def create_rover():
         )
         rover_id = cursor.lastrowid
         conn.commit()
+        rover_registry.invalidate()
 
         # Get the newly created rover
         rover = query_db("SELECT * FROM rover WHERE id = ?", [rover_id], one=True)
         return jsonify(dict(rover))
+    except sqlite3.IntegrityError:
+        return jsonify({"error": f"Rover with MAC address {mac} already exists"}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -114,12 +146,15 @@ def update_rover(rover_id):
             "UPDATE rover SET name = ?, mac = ? WHERE id = ?",
             (name, mac, rover_id)
         )
+        rover_registry.invalidate()
 
         # Get the updated rover
         rover = query_db("SELECT * FROM rover WHERE id = ?", [rover_id], one=True)
         if rover is None:
             return jsonify({"error": "Rover not found"}), 404
         return jsonify(dict(rover))
+    except sqlite3.IntegrityError:
+        return jsonify({"error": f"Rover with MAC address {mac} already exists"}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -127,10 +162,13 @@ def update_rover(rover_id):
 @app.route("/api/rovers/<int:rover_id>", methods=["DELETE"])
 def delete_rover(rover_id):
     try:
-        # First delete associations
-        modify_db("DELETE FROM rover_trail WHERE rover_id = ?", [rover_id])
-        # Then delete the rover
-        modify_db("DELETE FROM rover WHERE id = ?", [rover_id])
+        # One transaction, committed at the end of the block.
+        with get_db() as conn:
+            # First delete associations
+            conn.execute("DELETE FROM rover_trail WHERE rover_id = ?", [rover_id])
+            # Then delete the rover
+            conn.execute("DELETE FROM rover WHERE id = ?", [rover_id])
+        rover_registry.invalidate()
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -138,8 +176,7 @@ def delete_rover(rover_id):
 
 @app.route("/api/trails", methods=["GET"])
 def get_trails():
-    trails = query_db("SELECT * FROM trail ORDER BY name")
-    return jsonify([dict(trail) for trail in trails])
+    return jsonify(trail_summaries(get_db()))
 
 
 @app.route("/api/trails", methods=["POST"])
@@ -152,21 +189,20 @@ def create_trail():
         return jsonify({"error": "Name and trail points are required"}), 400
 
     try:
-        # Convert trail_points to proper JSON string
-        trail_points_json = json.dumps(trail_points)
+        points = parse_points(trail_points)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid trail points: {e}"}), 400
 
+    try:
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO trail (name, trail_points) VALUES (?, ?)",
-            (name, trail_points_json)
-        )
+        cursor.execute("INSERT INTO trail (name) VALUES (?)", (name,))
         trail_id = cursor.lastrowid
+        insert_points(conn, trail_id, points)
         conn.commit()
 
         # Get the newly created trail
-        trail = query_db("SELECT * FROM trail WHERE id = ?", [trail_id], one=True)
-        return jsonify(dict(trail))
+        return jsonify(trail_summaries(conn, trail_id=trail_id)[0])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -176,24 +212,51 @@ def delete_trail(trail_name):
     try:
         trail_row = query_db("SELECT id FROM trail WHERE name = ?", [trail_name], one=True)
         trail_id = dict(trail_row).get("id")
-        # First delete associations
-        modify_db("DELETE FROM rover_trail WHERE trail_id = ?", [trail_id])
-        # Then delete the trail
-        modify_db("DELETE FROM trail WHERE name = ?", [trail_name])
+        # One transaction, committed at the end of the block.
+        with get_db() as conn:
+            # First delete associations and points
+            conn.execute("DELETE FROM rover_trail WHERE trail_id = ?", [trail_id])
+            delete_points(conn, trail_id)
+            # Then delete the trail
+            conn.execute("DELETE FROM trail WHERE name = ?", [trail_name])
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/trails/<int:trail_id>/points", methods=["GET"])
+def get_trail_points(trail_id):
+    """
+    Points [[lon, lat], ...] of the trail.
+    Optional query min_lon, min_lat, max_lon, max_lat [deg] returns only points inside the box.
+    """
+    bbox = [request.args.get(key) for key in ("min_lon", "min_lat", "max_lon", "max_lat")]
+    if not any(bbox):
+        return jsonify(points_as_degrees(get_points(get_db(), trail_id)))
+    try:
+        bbox = [parse_microdegrees(value) for value in bbox]
+    except (ValueError, AttributeError):
+        return jsonify({"error": "Bounding box requires min_lon, min_lat, max_lon, max_lat"}), 400
+    points = points_in_bbox(get_db(), *bbox, trail_id=trail_id)
+    return jsonify(points_as_degrees([(lon, lat) for _, _, lon, lat in points]))
+
+
+@app.route("/api/trails/near", methods=["GET"])
+def get_trails_near():
+    """Query: lon, lat [deg], radius_cm. Returns trails passing within radius, nearest first."""
+    try:
+        lon = parse_microdegrees(request.args["lon"])
+        lat = parse_microdegrees(request.args["lat"])
+        radius_cm = float(request.args.get("radius_cm", 1000))
+    except (KeyError, ValueError):
+        return jsonify({"error": "lon and lat are required"}), 400
+    return jsonify([{"id": trail_id, "distance_cm": distance}
+                    for trail_id, distance in trails_near(get_db(), lon, lat, radius_cm)])
+
+
 @app.route("/api/rovers/<int:rover_id>/trails", methods=["GET"])
 def get_rover_trails(rover_id):
-    trails = query_db("""
-        SELECT t.* FROM trail t
-        JOIN rover_trail rt ON t.id = rt.trail_id
-        WHERE rt.rover_id = ?
-        ORDER BY t.name
-    """, [rover_id])
-    return jsonify([dict(trail) for trail in trails])
+    return jsonify(trail_summaries(get_db(), rover_id=rover_id))
 
 
 @app.route("/api/rovers/<int:rover_id>/trails", methods=["POST"])
@@ -236,7 +299,9 @@ def remove_trail_from_rover(rover_id, trail_id):
         return jsonify({"error": str(e)}), 500
 
 
-latest_gps_data = {
+# Latest data of each rover, MAC -> data.
+latest_gps_data = {}
+gps_data_template = {
     "mac": None,
     "fix_status": "Unknown",
     "latitude": None,
@@ -254,33 +319,226 @@ latest_gps_data = {
 
 @app.route("/rover/get_coords", methods=["GET"])
 def get_coords():
+    """
+    SSE stream of rover data.
+    Optional query: mac - only this rover, policy - drop_oldest (default) or latest
+    (slow client gets only the newest data of each rover).
+    Heartbeat comment is sent when there is no data, so closed clients are detected.
+    """
+    mac = request.args.get("mac")
+    policy = request.args.get("policy", DROP_OLDEST)
+    if policy not in (DROP_OLDEST, LATEST):
+        return abort(400, f"Unknown policy {policy}.")
+
     def event_stream():
-        while True:
-            # Get data from the queue and send
-            data = rover_data_queue.get()
-            yield f"data: {json.dumps(data)}\n\n"
+        # Subscribed only once streaming starts, a response that is never
+        # iterated does not leave the subscription behind.
+        with rover_broker.subscribe(mac, SSE_BUFFER_SIZE, policy) as subscription:
+            # Start with the current state of the rovers.
+            for rover_mac, data in list(latest_gps_data.items()):
+                if mac in (None, rover_mac):
+                    subscription.put(rover_mac, dict(data))
+            while True:
+                data = subscription.get(timeout=SSE_HEARTBEAT_S)
+                if data is None:
+                    yield ": heartbeat\n\n"
+                else:
+                    yield f"data: {json.dumps(data)}\n\n"
 
     return Response(event_stream(), mimetype="text/event-stream")
 
 
+# Binary GNSS frame sent by the rover. Must match rtkplanner.py.
+# Header: version, frame length, mac, lat [microdeg], lon [microdeg], fix status code,
+#         speed [knots * 100], course [deg * 100], time UTC [HHMMSS * 1000 + ms].
+# Then per GNSS system in use: 2 chars system name, satellites count, satellite numbers.
+GNSS_FRAME_VERSION = 1
+GNSS_FRAME_HEADER = "<BB6siiBHHI"
+GNSS_FRAME_HEADER_SIZE = struct.calcsize(GNSS_FRAME_HEADER)
+GNSS_FRAME_NO_POSITION = -0x80000000    # lat and lon before the first fix.
+GNSS_FRAME_NO_TIME = 0xFFFFFFFF         # UTC time before the receiver has it, 000000.000 is midnight.
+# Index is the fix status code (GGA quality indicator), 255 is unknown.
+FIX_STATUS = ("Invalid", "SPS Fix", "DGPS Fix", "PPS Fix", "RTK Fix",
+              "RTK Float", "Estimated", "Manual", "Simulation")
+
+
+def decode_gnss_frame(frame):
+    """
+    Decode one binary GNSS frame into the same dict as the JSON update.
+    Raises ValueError for malformed frame.
+    """
+    if len(frame) < GNSS_FRAME_HEADER_SIZE:
+        raise ValueError("GNSS frame too short")
+    (version, size, mac, lat, lon, status_code,
+     speed, course, time_utc) = struct.unpack_from(GNSS_FRAME_HEADER, frame)
+    if version != GNSS_FRAME_VERSION or size != len(frame):
+        raise ValueError(f"Unsupported GNSS frame version {version} or size {size}")
+
+    satellites_used = {}
+    pos = GNSS_FRAME_HEADER_SIZE
+    while pos + 3 <= size:
+        system = bytes(frame[pos:pos + 2]).decode().strip()
+        count = frame[pos + 2]
+        pos += 3
+        satellites_used[system] = [f"{satellite:02d}" for satellite in frame[pos:pos + count]]
+        pos += count
+
+    return {
+        "mac": binascii.hexlify(mac).decode(),
+        "fix_status": FIX_STATUS[status_code] if status_code < len(FIX_STATUS) else "Unknown",
+        "latitude": None if lat == GNSS_FRAME_NO_POSITION else format_microdegrees(lat),
+        "longitude": None if lon == GNSS_FRAME_NO_POSITION else format_microdegrees(lon),
+        "speed": f"{speed / 100:.2f}",
+        "course": f"{course / 100:.2f}",
+        "time_utc": None if time_utc == GNSS_FRAME_NO_TIME else f"{time_utc // 1000:06d}.{time_utc % 1000:03d}",
+        "sv": None,
+        "su": satellites_used
+    }
+
+
+def publish_gnss_update(gnssdata_dict):
+    """Returns False and drops the update of not registered rover."""
+    mac = gnssdata_dict.get("mac")
+    if not rover_registry.seen(mac):
+        return False
+    rover_data = latest_gps_data.setdefault(mac, dict(gps_data_template))
+    rover_data.update(gnssdata_dict)
+    rover_data["last_update"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"Rover MAC: {gnssdata_dict['mac']}, "
+          f"{gnssdata_dict['fix_status']}, "
+          f"({gnssdata_dict['latitude']}, "
+          f"{gnssdata_dict['longitude']})\n"
+          f"Sat in Use: {gnssdata_dict['su']}\n",
+          f"Sat in View: {gnssdata_dict['sv']}")
+
+    rover_broker.publish(mac, dict(rover_data))
+    if track_store:
+        record_track_point(gnssdata_dict)
+    return True
+
+
+# History of rover positions, started with start_track_store.
+track_store = None
+TRACK_DEFAULT_WINDOW_S = 3600
+TRACK_RETENTION_DAYS = 30       # None keeps the track history forever.
+TRACK_MAX_POINTS = 10000
+
+
+def start_track_store(path=None):
+    global track_store
+    retention_s = TRACK_RETENTION_DAYS * 86400 if TRACK_RETENTION_DAYS is not None else None
+    track_store = TrackStore(path or TRACK_DATABASE, retention_s=retention_s)
+    track_store.start()
+    return track_store
+
+
+def record_track_point(gnssdata_dict):
+    if not gnssdata_dict.get("longitude") or not gnssdata_dict.get("latitude"):
+        # Rover without position yet.
+        return
+    try:
+        lon = parse_microdegrees(gnssdata_dict["longitude"])
+        lat = parse_microdegrees(gnssdata_dict["latitude"])
+    except (KeyError, ValueError, TypeError):
+        # Rover without position yet.
+        return
+    status = gnssdata_dict.get("fix_status")
+    track_store.append(gnssdata_dict["mac"], lon, lat, FIX_STATUS.index(status) if status in FIX_STATUS else 255)
+
+
+@app.route("/api/rovers/<string:mac>/track", methods=["GET"])
+def get_rover_track(mac):
+    """
+    Query: start, end - time window [ms since epoch], default last hour,
+           points - max returned points, longer tracks are downsampled.
+    Returns points [[t_ms, lon, lat, fix_status], ...] oldest first.
+    """
+    if not track_store:
+        return jsonify({"error": "Track history is not enabled"}), 503
+    try:
+        end_ms = int(request.args.get("end", time.time() * 1000))
+        start_ms = int(request.args.get("start", end_ms - TRACK_DEFAULT_WINDOW_S * 1000))
+        max_points = min(int(request.args.get("points", 1000)), TRACK_MAX_POINTS)
+    except ValueError:
+        return jsonify({"error": "start, end and points must be integers"}), 400
+    if max_points < 1 or start_ms > end_ms:
+        return jsonify({"error": "Invalid time window or points"}), 400
+    points = track_store.get_track(mac, start_ms, end_ms, max_points)
+    return jsonify({
+        "mac": mac,
+        "start": start_ms,
+        "end": end_ms,
+        "total": track_store.count(mac, start_ms, end_ms),
+        "points": [[t_ms, format_microdegrees(lon), format_microdegrees(lat),
+                    FIX_STATUS[fix] if fix < len(FIX_STATUS) else "Unknown"]
+                   for t_ms, lon, lat, fix in points],
+    })
+
+
+def load_rover_json(data):
+    # Older rovers send JSON encoded string inside JSON.
+    return json.loads(data) if isinstance(data, str) else data
+
+
 @app.route("/rover/update_gps", methods=["POST"])
 def update_gps():
-    data = request.json
-    gnssdata_dict = json.loads(data)
-    if gnssdata_dict:
-        latest_gps_data.update(gnssdata_dict)
-        latest_gps_data["last_update"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"Rover MAC: {gnssdata_dict['mac']}, "
-              f"{gnssdata_dict['fix_status']}, "
-              f"({gnssdata_dict['latitude']}, "
-              f"{gnssdata_dict['longitude']})\n"
-              f"Sat in Use: {gnssdata_dict['su']}\n",
-              f"Sat in View: {gnssdata_dict['sv']}")
-
-        rover_data_queue.put(latest_gps_data)
+    gnssdata_dict = load_rover_json(request.json)
+    if gnssdata_dict and publish_gnss_update(gnssdata_dict):
         return "GPS Updated", 201
     else:
-        return abort(406, "New rover registration.")
+        return abort(406, "Rover not registered.")
+
+
+@app.route("/rover/update_gps_bin", methods=["POST"])
+def update_gps_bin():
+    try:
+        gnssdata_dict = decode_gnss_frame(request.get_data())
+    except (ValueError, struct.error) as e:
+        return abort(400, str(e))
+    if publish_gnss_update(gnssdata_dict):
+        return "GPS Updated", 201
+    return abort(406, "Rover not registered.")
+
+
+class TelemetryHandler(socketserver.StreamRequestHandler):
+    """
+    Persistent rover connection. The stream is a sequence of binary GNSS frames,
+    each frame starts with version and frame length bytes.
+    Malformed frame closes the connection, the rover reconnects.
+    """
+    def handle(self):
+        print(f"Telemetry connected: {self.client_address}")
+        while True:
+            header = self.rfile.read(2)
+            if len(header) < 2:
+                break
+            version, size = header
+            if version != GNSS_FRAME_VERSION or size < GNSS_FRAME_HEADER_SIZE:
+                print(f"Telemetry malformed frame from {self.client_address}")
+                break
+            body = self.rfile.read(size - 2)
+            if len(body) < size - 2:
+                break
+            try:
+                gnssdata_dict = decode_gnss_frame(header + body)
+            except (ValueError, struct.error) as e:
+                print(f"Telemetry malformed frame from {self.client_address}: {e}")
+                break
+            if not publish_gnss_update(gnssdata_dict):
+                print(f"Telemetry from not registered rover {gnssdata_dict['mac']}")
+                break
+        print(f"Telemetry disconnected: {self.client_address}")
+
+
+class TelemetryServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_telemetry_server(host="0.0.0.0", port=TELEMETRY_PORT):
+    server = TelemetryServer((host, port), TelemetryHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
 
 
 def format_utc_time(time_str):
@@ -296,66 +554,172 @@ def format_utc_time(time_str):
         return time_str
 
 
+def load_rovers():
+    db = get_pool().acquire()
+    try:
+        return db.execute("SELECT mac, status, last_active FROM rover").fetchall()
+    finally:
+        get_pool().release(db)
+
+
+def write_rovers(updates):
+    db = get_pool().acquire()
+    try:
+        with db:
+            db.executemany("UPDATE rover SET last_active = ?, status = ? WHERE mac = ?", updates)
+    finally:
+        get_pool().release(db)
+
+
+# Registered rovers in memory, reloaded after create_rover, update_rover, delete_rover.
+rover_registry = RoverRegistry(load_rovers, write_rovers)
+ROVER_WRITE_BACK_S = 5
+
+
 @app.route("/rover/register", methods=["POST"])
 def register():
-    data = request.json
-    mac_dict = json.loads(data)
+    mac_dict = load_rover_json(request.json)
     mac = mac_dict.get("mac")
     print(f"Rover trying to connect, MAC: {mac}")
-    rovers = query_db("SELECT * FROM rover ORDER BY id DESC")
-    rovers_list = [dict(rover) for rover in rovers]
-    _rover_registered = any([rover.get("mac") == mac for rover in rovers_list])
-    if _rover_registered:
+    if rover_registry.seen(mac):
         return "Rover registered", 200
     else:
         return abort(406, "Rover not registered.")
 
 
-#  HTTP polling to update rover with trails.
-#  Simplest approach for demo purpose. Consider sockets or mqtt.
+#  Commands for rovers (trail to execute, stop) are kept per rover MAC in the mailbox.
 #
-#  get_data = the Rover is pulling data every few seconds. trails are stored in trail_points_for_rover.
-#  upload_trail_to_rover - prepare get trails from database and put into trail_points_for_rover.
-#  stop_rover - send empty trails to the Rover.
-trail_points_for_rover = {"mac": "", "trail_points": ""}
+#  upload_trail_to_rover - get trail from database and post it for the rover.
+#  stop_rover - post empty trail, the Rover stops.
+#  get_rover_command - long poll of the Rover, returns as soon as a new command is posted.
+#  ack_rover_command - the Rover confirms the applied command version, it is not delivered again.
+rover_mailbox = CommandMailbox()
+ROVER_POLL_MAX_WAIT_S = 30
+# Waypoints of the last trail command per rover, MAC -> (command version, [(lon, lat), ...]).
+dispatched_trails = {}
+TRAIL_PAGE_MAX_POINTS = 256
+
+
+# Simplification tolerance as part of the target precision, the rover passes removed points
+# within precision even if it reaches the neighbour waypoints at the edge of precision.
+TRAIL_TOLERANCE_RATIO = 0.5
+
+
+def prepare_trail(points, precision, max_leg_cm=0):
+    """
+    Waypoints for the rover from trail points (lon, lat) in microdegrees.
+    Near collinear points are removed (Ramer-Douglas-Peucker, tolerance tied to precision [cm]),
+    with max_leg_cm > 0 longer legs get intermediate waypoints.
+    """
+    if len(points) < 2:
+        return points
+    lon, lat = np.array(points, dtype=np.int64).T
+    kept = simplify(lon, lat, precision * TRAIL_TOLERANCE_RATIO)
+    lon, lat = lon[kept], lat[kept]
+    if max_leg_cm > 0:
+        lon, lat = densify(lon, lat, max_leg_cm)
+    return list(zip(lon.tolist(), lat.tolist()))
 
 
 @app.route("/trail/upload/<int:rover_id>/<int:trail_id>/<int:precision>", methods=["POST"])
 def upload_trail_to_rover(rover_id, trail_id, precision):
-    global trail_points_for_rover
+    """Optional query max_leg_cm - insert waypoints into longer legs."""
     rover_mac = query_db("SELECT mac FROM rover WHERE id = ?", [rover_id], one=True)
-    trail_points = query_db("SELECT trail_points FROM trail WHERE id = ?", [trail_id], one=True)
-    trail_points_dict = dict(trail_points)
-    trail_points_for_rover = dict(rover_mac)
-    trail_points_for_rover.update({"precision" : precision})
-    trail_points_for_rover.update(trail_points_dict)
-    if trail_points_for_rover["mac"] and trail_points_dict["trail_points"]:
-        return trail_points_for_rover, 200
+    trail_points = get_points(get_db(), trail_id)
+    if rover_mac and rover_mac["mac"] and trail_points:
+        waypoints = prepare_trail(trail_points, precision, request.args.get("max_leg_cm", 0, type=int))
+        print(f"Trail {trail_id} for rover {rover_mac['mac']}: {len(trail_points)} points, "
+              f"{len(waypoints)} waypoints.")
+        # JSON text for older rover firmware, paging rovers get the waypoints with get_trail_page.
+        command = rover_mailbox.post(rover_mac["mac"], {"precision": precision,
+                                                        "trail_points": json.dumps(points_as_degrees(waypoints)),
+                                                        "total": len(waypoints)})
+        dispatched_trails[rover_mac["mac"]] = (command["version"], waypoints)
+        return command, 200
     else:
         return abort(400, "No trails to send.")
 
 
 @app.route("/trail/stop/<int:rover_id>", methods=["POST"])
 def stop_rover(rover_id):
-    global trail_points_for_rover
     rover_mac = query_db("SELECT mac FROM rover WHERE id = ?", [rover_id], one=True)
-    trail_points_for_rover = dict(rover_mac)
-    trail_points_for_rover.update({"trail_points": "[]"})
     if rover_mac:
-        return trail_points_for_rover, 200
+        command = rover_mailbox.post(rover_mac["mac"], {"trail_points": "[]", "total": 0})
+        dispatched_trails.pop(rover_mac["mac"], None)
+        return command, 200
     else:
         return abort(400, f"Rover does not exist {rover_id} {rover_mac}.")
 
 
-@app.route("/trail/upload", methods=["GET"])
-def get_data():
-    global trail_points_for_rover
-    tmp = trail_points_for_rover
-    trail_points_for_rover = {"mac": "", "trail_points": ""}
-    return jsonify(tmp)
+def poll_args(args):
+    """Returns (version, wait_s, paged) of the rover long poll query."""
+    version = int(args.get("version", 0))
+    wait_s = min(float(args.get("wait", 0)), ROVER_POLL_MAX_WAIT_S)
+    return version, wait_s, args.get("paged") == "1"
 
 
-if __name__ == "__main__":
+def command_for_rover(command, paged):
+    # Paging rover downloads waypoints in pages, without the whole trail in the command.
+    if paged:
+        return {key: value for key, value in command.items() if key != "trail_points"}
+    return command
+
+
+def trail_page(mac, version, offset, count):
+    """
+    Waypoints [[lon, lat], ...] in microdegrees from offset, at most count.
+    Returns None when the rover has no trail of this version (replaced or stopped).
+    Raises ValueError for negative offset, slicing would count it from the end.
+    """
+    if offset < 0:
+        raise ValueError(f"Negative offset {offset}")
+    version_points = dispatched_trails.get(mac)
+    if not version_points or version_points[0] != version:
+        return None
+    points = version_points[1]
+    count = max(0, min(count, TRAIL_PAGE_MAX_POINTS))
+    return {"version": version, "offset": offset, "total": len(points),
+            "points": [list(point) for point in points[offset:offset + count]]}
+
+
+@app.route("/trail/upload/<string:mac>", methods=["GET"])
+def get_rover_command(mac):
+    """
+    Query: version - last version applied by the rover, wait - max wait [s],
+           paged=1 - without trail_points, the rover gets them with get_trail_page.
+    Returns 204 when there is no new command.
+    """
+    try:
+        version, wait_s, paged = poll_args(request.args)
+    except ValueError:
+        return abort(400, "Invalid query.")
+    command = rover_mailbox.wait(mac, version, wait_s)
+    if command:
+        return jsonify(command_for_rover(command, paged))
+    return "", 204
+
+
+@app.route("/trail/page/<string:mac>/<int:version>", methods=["GET"])
+def get_trail_page(mac, version):
+    """Query: offset - index of the first waypoint, count - number of waypoints."""
+    try:
+        page = trail_page(mac, version, request.args.get("offset", 0, type=int),
+                          request.args.get("count", 16, type=int))
+    except ValueError:
+        return abort(400, "Invalid query.")
+    if page is None:
+        return abort(409, f"Trail {version} of rover {mac} was replaced.")
+    return jsonify(page)
+
+
+@app.route("/trail/ack/<string:mac>/<int:version>", methods=["POST"])
+def ack_rover_command(mac, version):
+    if rover_mailbox.ack(mac, version):
+        return "Acknowledged", 200
+    return abort(404, f"No command {version} for rover {mac}.")
+
+
+def prepare_database():
     # Create schema.sql file.
     if not os.path.exists(DATABASE_SCHEMA):
         with open(DATABASE_SCHEMA, "w") as f:
@@ -371,13 +735,16 @@ if __name__ == "__main__":
         last_active TEXT
     );
 
-    -- Trail table
+    -- Trail table, points are in trail_point table (see trailstore.py).
+    -- trail_points is JSON text of older versions, migrated on start.
     CREATE TABLE IF NOT EXISTS trail (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL,
         trail_points TEXT
     );
 
+    CREATE UNIQUE INDEX IF NOT EXISTS rover_mac ON rover (mac);
+
     -- Rover-Trail association table
     CREATE TABLE IF NOT EXISTS rover_trail (
         rover_id INTEGER,
@@ -395,4 +762,24 @@ if __name__ == "__main__":
     """)
     if not os.path.exists(DATABASE):
         init_db()
+    # Indexes and trail points table, created also in databases from older versions.
+    with app.app_context():
+        db = get_db()
+        if not ensure_unique_index(db, "rover_mac", "rover", "mac"):
+            print("Rovers with duplicated MAC address, remove duplicates to make MAC unique.")
+        if not create_schema(db):
+            print("SQLite without R*-tree, trails near a point are searched without index.")
+        migrated = migrate_legacy_trails(db)
+        db.commit()
+        if migrated:
+            print(f"Migrated {migrated} trails to trail_point table.")
+
+
+if __name__ == "__main__":
+    prepare_database()
+    # With debug reloader only the serving child process starts the telemetry server.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_telemetry_server()
+        start_track_store()
+        rover_registry.start(ROVER_WRITE_BACK_S)
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,256 @@
+"""
+Asyncio serving mode of RTK Planner.
+
+Rover ingest and SSE streams are handled natively in one event loop, so an
+open stream costs a coroutine instead of a thread:
+    POST /rover/update_gps, POST /rover/update_gps_bin, POST /rover/register,
+    GET /trail/upload/<mac> (long poll), GET /trail/page/<mac>/<version>,
+    POST /trail/ack/<mac>/<version>,
+    GET /rover/get_coords
+and the telemetry ingest (TELEMETRY_PORT) runs as asyncio server.
+Remaining REST routes are served by the Flask app through asgiref when it is installed.
+
+Run from the RTK_Planner directory with any ASGI server, e.g.:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import struct
+from urllib.parse import parse_qs
+
+import app as flask_app
+from broker import DROP_OLDEST, LATEST, AsyncSubscription
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    flask_asgi = WsgiToAsgi(flask_app.app)
+except ImportError:
+    flask_asgi = None
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_response(send, status, body=b"", content_type="text/plain"):
+    if isinstance(body, str):
+        body = body.encode()
+    await send({"type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", content_type.encode()),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, data):
+    await send_response(send, status, json.dumps(data), "application/json")
+
+
+async def update_gps(scope, receive, send):
+    try:
+        gnssdata_dict = flask_app.load_rover_json(json.loads(await read_body(receive)))
+    except ValueError:
+        gnssdata_dict = None
+    if gnssdata_dict and flask_app.publish_gnss_update(gnssdata_dict):
+        await send_response(send, 201, "GPS Updated")
+    else:
+        await send_response(send, 406, "Rover not registered.")
+
+
+async def update_gps_bin(scope, receive, send):
+    try:
+        gnssdata_dict = flask_app.decode_gnss_frame(await read_body(receive))
+    except (ValueError, struct.error) as e:
+        await send_response(send, 400, str(e))
+        return
+    if flask_app.publish_gnss_update(gnssdata_dict):
+        await send_response(send, 201, "GPS Updated")
+    else:
+        await send_response(send, 406, "Rover not registered.")
+
+
+async def register(scope, receive, send):
+    try:
+        mac = flask_app.load_rover_json(json.loads(await read_body(receive))).get("mac")
+    except (ValueError, AttributeError):
+        await send_response(send, 400, "Invalid request.")
+        return
+    print(f"Rover trying to connect, MAC: {mac}")
+    # Registry lookup, the database is read only on the first call after a rover table change.
+    if flask_app.rover_registry.seen(mac):
+        await send_response(send, 200, "Rover registered")
+    else:
+        await send_response(send, 406, "Rover not registered.")
+
+
+async def get_rover_command(scope, receive, send, mac):
+    """Same as app.get_rover_command, waiting costs no thread."""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    try:
+        version, wait_s, paged = flask_app.poll_args({k: v[0] for k, v in query.items()})
+    except ValueError:
+        await send_response(send, 400, "Invalid query.")
+        return
+    command = await flask_app.rover_mailbox.wait_async(mac, version, wait_s)
+    if command:
+        await send_json(send, 200, flask_app.command_for_rover(command, paged))
+    else:
+        await send_response(send, 204)
+
+
+async def get_trail_page(scope, receive, send, path):
+    query = parse_qs(scope.get("query_string", b"").decode())
+    mac, _, version = path.partition("/")
+    try:
+        page = flask_app.trail_page(mac, int(version), int(query.get("offset", [0])[0]),
+                                    int(query.get("count", [16])[0]))
+    except ValueError:
+        await send_response(send, 400, "Invalid query.")
+        return
+    if page is None:
+        await send_response(send, 409, f"Trail {version} of rover {mac} was replaced.")
+    else:
+        await send_json(send, 200, page)
+
+
+async def ack_rover_command(scope, receive, send, path):
+    mac, _, version = path.partition("/")
+    if version.isdigit() and flask_app.rover_mailbox.ack(mac, int(version)):
+        await send_response(send, 200, "Acknowledged")
+    else:
+        await send_response(send, 404, f"No command {version} for rover {mac}.")
+
+
+async def get_coords(scope, receive, send):
+    """Same stream as app.get_coords, one coroutine per client."""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    mac = query.get("mac", [None])[0]
+    policy = query.get("policy", [DROP_OLDEST])[0]
+    if policy not in (DROP_OLDEST, LATEST):
+        await send_response(send, 400, f"Unknown policy {policy}.")
+        return
+
+    subscription = flask_app.rover_broker.subscribe(mac, flask_app.SSE_BUFFER_SIZE, policy,
+                                                    subscription_class=AsyncSubscription)
+    for rover_mac, data in list(flask_app.latest_gps_data.items()):
+        if mac in (None, rover_mac):
+            subscription.put(rover_mac, dict(data))
+
+    disconnected = asyncio.Event()
+
+    async def wait_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+        # Wake up the stream loop.
+        subscription.event.set()
+
+    watcher = asyncio.create_task(wait_disconnect())
+    try:
+        await send({"type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"),
+                                (b"cache-control", b"no-cache")]})
+        while not disconnected.is_set():
+            data = await subscription.get_async(timeout=flask_app.SSE_HEARTBEAT_S)
+            if disconnected.is_set():
+                break
+            chunk = ": heartbeat\n\n" if data is None else f"data: {json.dumps(data)}\n\n"
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+    except OSError:
+        # Client gone while sending.
+        pass
+    finally:
+        watcher.cancel()
+        subscription.close()
+
+
+ROUTES = {
+    ("POST", "/rover/update_gps"): update_gps,
+    ("POST", "/rover/update_gps_bin"): update_gps_bin,
+    ("POST", "/rover/register"): register,
+    ("GET", "/rover/get_coords"): get_coords,
+}
+
+# Routes with the rest of the path as the last argument.
+PREFIX_ROUTES = (
+    ("GET", "/trail/upload/", get_rover_command),
+    ("GET", "/trail/page/", get_trail_page),
+    ("POST", "/trail/ack/", ack_rover_command),
+)
+
+
+async def handle_telemetry(reader, writer):
+    """Asyncio version of app.TelemetryHandler."""
+    peer = writer.get_extra_info("peername")
+    print(f"Telemetry connected: {peer}")
+    try:
+        while True:
+            header = await reader.readexactly(2)
+            version, size = header
+            if version != flask_app.GNSS_FRAME_VERSION or size < flask_app.GNSS_FRAME_HEADER_SIZE:
+                print(f"Telemetry malformed frame from {peer}")
+                break
+            body = await reader.readexactly(size - 2)
+            gnssdata_dict = flask_app.decode_gnss_frame(header + body)
+            if not flask_app.publish_gnss_update(gnssdata_dict):
+                print(f"Telemetry from not registered rover {gnssdata_dict['mac']}")
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    except (ValueError, struct.error) as e:
+        print(f"Telemetry malformed frame from {peer}: {e}")
+    finally:
+        writer.close()
+    print(f"Telemetry disconnected: {peer}")
+
+
+async def lifespan(receive, send, telemetry_port=flask_app.TELEMETRY_PORT):
+    telemetry_server = None
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            flask_app.prepare_database()
+            flask_app.start_track_store()
+            flask_app.rover_registry.start(flask_app.ROVER_WRITE_BACK_S)
+            telemetry_server = await asyncio.start_server(handle_telemetry, "0.0.0.0", telemetry_port)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if telemetry_server:
+                telemetry_server.close()
+                await telemetry_server.wait_closed()
+            if flask_app.track_store:
+                flask_app.track_store.close()
+            flask_app.rover_registry.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler:
+        await handler(scope, receive, send)
+        return
+    for method, prefix, prefix_handler in PREFIX_ROUTES:
+        if scope["method"] == method and scope["path"].startswith(prefix):
+            await prefix_handler(scope, receive, send, scope["path"][len(prefix):])
+            return
+    if flask_asgi:
+        await flask_asgi(scope, receive, send)
+    else:
+        await send_response(send, 404, "Not found, install asgiref to serve Flask routes.")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,143 @@
+import asyncio
+import collections
+import threading
+
+# Slow subscriber policies.
+DROP_OLDEST = "drop_oldest"     # Bounded buffer, the oldest message is dropped when full.
+LATEST = "latest"               # Only the latest message per topic is kept.
+
+
+class Subscription:
+    """
+    Messages for one subscriber, e.g. one SSE stream.
+    topic None receives messages of all topics.
+    """
+    def __init__(self, broker, topic=None, maxlen=100, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, LATEST):
+            raise ValueError(f"Unknown policy {policy}")
+        self.broker = broker
+        self.topic = topic
+        self.policy = policy
+        self.messages = collections.deque(maxlen=maxlen)
+        self.latest = {}
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def put(self, topic, message):
+        with self.condition:
+            if self.policy == LATEST:
+                if topic in self.latest:
+                    # Coalesce, newer message goes to the end of the queue.
+                    del self.latest[topic]
+                    self.dropped += 1
+                self.latest[topic] = message
+            else:
+                if len(self.messages) == self.messages.maxlen:
+                    self.dropped += 1
+                self.messages.append(message)
+            self._notify()
+
+    def _notify(self):
+        self.condition.notify_all()
+
+    def pop(self):
+        """Returns the oldest message or None, without waiting."""
+        with self.condition:
+            return self._pop()
+
+    def _pop(self):
+        if self.messages:
+            return self.messages.popleft()
+        if self.latest:
+            topic = next(iter(self.latest))
+            return self.latest.pop(topic)
+        return None
+
+    def get(self, timeout=None):
+        """Returns the oldest message, None if nothing arrived within timeout [s]."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.messages or self.latest, timeout)
+            return self._pop()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+
+class AsyncSubscription(Subscription):
+    """
+    Subscription awaited in asyncio event loop.
+    Messages may be published from any thread.
+    Must be created inside the running loop.
+    """
+    def __init__(self, broker, topic=None, maxlen=100, policy=DROP_OLDEST):
+        super().__init__(broker, topic, maxlen, policy)
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def _notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # Event loop already closed.
+            pass
+
+    async def get_async(self, timeout=None):
+        """Returns the oldest message, None if nothing arrived within timeout [s]."""
+        message = self.pop()
+        if message is not None:
+            return message
+        self.event.clear()
+        # Message published between pop and clear would not wake us up.
+        message = self.pop()
+        if message is not None:
+            return message
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.pop()
+
+
+class Broker:
+    """
+    In-process publish/subscribe with per-subscriber buffers.
+    Every subscriber gets every message of its topic, a slow subscriber
+    loses only its own messages according to its policy.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}      # topic -> set of subscriptions, None is all topics.
+
+    def subscribe(self, topic=None, maxlen=100, policy=DROP_OLDEST, subscription_class=Subscription):
+        subscription = subscription_class(self, topic, maxlen, policy)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    def publish(self, topic, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+            if topic is not None:
+                subscribers.extend(self._subscribers.get(None, ()))
+        for subscription in subscribers:
+            subscription.put(topic, message)
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
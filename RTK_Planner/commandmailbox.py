@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+
+from broker import LATEST, AsyncSubscription, Broker
+
+
+class CommandMailbox:
+    """
+    Latest command for each rover, addressed by MAC.
+    A new command replaces the previous one (new trail or stop), every command
+    gets a new version. The command is delivered until the rover acknowledges
+    its version, so repeated delivery is harmless - the rover applies a version once.
+    Waiting for a command uses the broker, topic is the MAC.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = {}     # MAC -> command dict with "version".
+        self._acked = {}        # MAC -> acknowledged version.
+        # Versions keep growing after server restart, rover ignores versions it already applied.
+        self._version = int(time.time() * 1000)
+        self.broker = Broker()
+
+    def post(self, mac, command):
+        with self._lock:
+            self._version += 1
+            command = dict(command, mac=mac, version=self._version)
+            self._commands[mac] = command
+        self.broker.publish(mac, command["version"])
+        return command
+
+    def pending(self, mac, since_version=0):
+        """Returns not acknowledged command newer than since_version, or None."""
+        with self._lock:
+            command = self._commands.get(mac)
+            if command and command["version"] > max(since_version, self._acked.get(mac, 0)):
+                return command
+            return None
+
+    def ack(self, mac, version):
+        with self._lock:
+            command = self._commands.get(mac)
+            if not command or version > command["version"]:
+                return False
+            self._acked[mac] = max(version, self._acked.get(mac, 0))
+            return True
+
+    def wait(self, mac, since_version=0, timeout=None):
+        """Long poll, returns pending command as soon as it is posted or None after timeout [s]."""
+        deadline = time.monotonic() + (timeout or 0)
+        with self.broker.subscribe(mac, maxlen=1, policy=LATEST) as subscription:
+            while True:
+                command = self.pending(mac, since_version)
+                remaining = deadline - time.monotonic()
+                if command or remaining <= 0:
+                    return command
+                subscription.get(remaining)
+
+    async def wait_async(self, mac, since_version=0, timeout=None):
+        """Same as wait, for asyncio event loop."""
+        loop_time = asyncio.get_running_loop().time
+        deadline = loop_time() + (timeout or 0)
+        with self.broker.subscribe(mac, maxlen=1, policy=LATEST,
+                                   subscription_class=AsyncSubscription) as subscription:
+            while True:
+                command = self.pending(mac, since_version)
+                remaining = deadline - loop_time()
+                if command or remaining <= 0:
+                    return command
+                await subscription.get_async(remaining)
@@ -0,0 +1,78 @@
+"""
+SQLite connections shared by requests.
+
+Connections are opened once and kept in a pool, so a request does not pay
+for opening the file and parsing the schema, and every connection keeps
+its prepared statement cache. The database runs in write-ahead logging mode:
+readers do not block the writer and the writer does not block readers.
+"""
+import queue
+import sqlite3
+import threading
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",      # Durable with WAL except on power loss, fsync only at checkpoint.
+    "PRAGMA busy_timeout = 5000",       # Wait for the write lock [ms] instead of failing at once.
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",        # Page cache [KiB] per connection.
+)
+STATEMENT_CACHE_SIZE = 256
+
+
+def connect(path):
+    db = sqlite3.connect(path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    db.row_factory = sqlite3.Row  # DB cursor returns dict instead of tuple.
+    for pragma in PRAGMAS:
+        db.execute(pragma)
+    return db
+
+
+class ConnectionPool:
+    """
+    Idle connections to one database file. A connection is used by one thread
+    at a time, between acquire and release. At most max_idle are kept open.
+    """
+    def __init__(self, path, max_idle=8):
+        self.path = path
+        self._idle = queue.LifoQueue(max_idle)
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.opened += 1
+            return connect(self.path)
+
+    def release(self, db):
+        if db.in_transaction:
+            # Request failed in the middle of a transaction.
+            db.rollback()
+        try:
+            self._idle.put_nowait(db)
+        except queue.Full:
+            db.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def ensure_unique_index(db, name, table, column):
+    """
+    Unique index on a column of a database created by older versions.
+    Returns False when existing rows have duplicates, plain index is created then.
+    """
+    try:
+        db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+        return True
+    except sqlite3.IntegrityError:
+        db.execute(f"CREATE INDEX IF NOT EXISTS {name}_lookup ON {table} ({column})")
+        return False
@@ -0,0 +1,253 @@
+"""
+Batch geodesy over NumPy arrays for server side trail and track analysis.
+
+Integer functions reproduce the rover math from navigation.py
+(Navigation.cos_int, atan2_int, isqrt, calculate_distance_bearing and
+TrailFrame) for whole arrays at once, so results match the rover exactly
+with its default polynomial trigonometry. A rover configured with
+navigation.trig_tables uses the lookup tables (atan2_table, cos_table)
+instead. Those are within 0.02 deg of math.atan2, but differ from the
+polynomial atan2_int by up to 6.8 deg in bearings and from cos_int by up
+to 0.02 in cosine.
+With exact=True the same flat earth model is evaluated in float, without
+the integer approximations, as a reference.
+
+Units: coordinates in microdegrees (degrees * 1000000), local frame in mm,
+distances in cm, bearings in degrees (0 - north, 90 - east).
+"""
+import numpy as np
+
+# 1 microdegree of latitude in mm, used by the rover as 1113 / 10.
+MM_PER_MICRODEGREE = 111.32
+
+# Elements of one (points x segments) temporary array in cross_track_errors,
+# about 8 such float64 arrays are alive at once, 32 MB in total.
+CROSS_TRACK_BUDGET = 1 << 19
+
+
+def to_microdegrees(coords):
+    """
+    Convert coordinates in degrees to int64 microdegrees.
+    Strings are truncated after 6 decimals like Navigation.str_to_microdegrees,
+    floats are rounded to 7 decimals first to remove representation error.
+    """
+    coords = np.asarray(coords)
+    if coords.dtype.kind in "USO":
+        result = np.empty(coords.shape, dtype=np.int64)
+        flat = result.reshape(-1)
+        for i, value in enumerate(coords.reshape(-1)):
+            value = str(value)
+            whole, _, fraction = value.lstrip("+-").partition(".")
+            microdeg = int(whole or "0") * 1000000 + int((fraction + "000000")[:6])
+            flat[i] = -microdeg if value[0] == "-" else microdeg
+        return result
+    return np.trunc(np.round(coords.astype(np.float64) * 1e7) / 10).astype(np.int64)
+
+
+def cos_int(lat_microdeg):
+    """Navigation.cos_int over array, returns cosine * 10000."""
+    deg = np.asarray(lat_microdeg, dtype=np.int64) // 10000 % 36000
+    angle = np.where(deg <= 9000, deg,
+                     np.where(deg <= 18000, 18000 - deg,
+                              np.where(deg <= 27000, deg - 18000, 36000 - deg)))
+    sign = np.where((deg > 9000) & (deg <= 27000), -1, 1)
+    rad_x10000 = (angle * 1745) // 1000
+    rad_sq = (rad_x10000 * rad_x10000) // 10000
+    rad_4 = (rad_sq * rad_sq) // 10000
+    return (10000 - (rad_sq * 5000) // 10000 + (rad_4 * 417) // 10000) * sign
+
+
+def atan2_int(y, x):
+    """Navigation.atan2_int over arrays, returns angle in degrees * 100 (0 - 36000)."""
+    y = np.asarray(y, dtype=np.int64)
+    x = np.asarray(x, dtype=np.int64)
+    abs_y = np.abs(y)
+    abs_x = np.abs(x)
+    horizontal = abs_x > abs_y
+
+    # Ratio of the smaller to the bigger value, divisor 1 only where both are 0.
+    divisor = np.where(horizontal, abs_x, abs_y)
+    ratio = (np.where(horizontal, abs_y, abs_x) * 10000) // np.maximum(divisor, 1)
+    ratio_sq = (ratio * ratio) // 10000
+    ratio_cu = (ratio_sq * ratio) // 10000
+    angle = (ratio * 5730) // 10000 - (ratio_cu * 1910) // 10000
+    angle = np.where(horizontal, angle, 9000 - angle)
+
+    q1 = np.where(horizontal, (x > 0) & (y >= 0), (x >= 0) & (y > 0))
+    q2 = (x < 0) & np.where(horizontal, y >= 0, y > 0)
+    q3 = (x < 0) & (y < 0)
+    result = np.where(q1, angle,
+                      np.where(q2, 18000 - angle,
+                               np.where(q3, 18000 + angle, 36000 - angle)))
+    return np.where((x == 0) & (y == 0), 0, result)
+
+
+def isqrt(n):
+    """Integer square root over int64 array."""
+    n = np.asarray(n, dtype=np.int64)
+    root = np.floor(np.sqrt(n.astype(np.float64))).astype(np.int64)
+    # Float square root may be off by one for big values.
+    root -= root * root > n
+    root += (root + 1) * (root + 1) <= n
+    return root
+
+
+def local_frame(lon, lat, origin_lon, origin_lat, exact=False):
+    """
+    Microdegrees to (east_mm, north_mm) relative to origin, cos(lat) of origin
+    fixed like in TrailFrame.to_local.
+    """
+    dlon = np.asarray(lon, dtype=np.int64) - origin_lon
+    dlat = np.asarray(lat, dtype=np.int64) - origin_lat
+    if exact:
+        cos_lat = np.cos(np.radians(origin_lat / 1e6))
+        return dlon * cos_lat * MM_PER_MICRODEGREE, dlat * MM_PER_MICRODEGREE
+    cos_lat = int(cos_int(origin_lat))
+    return (dlon * cos_lat * 1113) // 100000, (dlat * 1113) // 10
+
+
+def distance_bearing(lon1, lat1, lon2, lat2, exact=False):
+    """
+    Navigation.calculate_distance_bearing for arrays of point pairs in microdegrees.
+    Returns (distance_cm, bearing_deg) arrays, integer unless exact.
+    """
+    lon1 = np.asarray(lon1, dtype=np.int64)
+    lat1 = np.asarray(lat1, dtype=np.int64)
+    lon2 = np.asarray(lon2, dtype=np.int64)
+    lat2 = np.asarray(lat2, dtype=np.int64)
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    if exact:
+        cos_lat = np.cos(np.radians((lat1 + lat2) / 2e6))
+        x_mm = dlon * cos_lat * MM_PER_MICRODEGREE
+        y_mm = dlat * MM_PER_MICRODEGREE
+        return np.hypot(x_mm, y_mm) / 10, np.degrees(np.arctan2(x_mm, y_mm)) % 360
+    cos_lat = cos_int((lat1 + lat2) // 2)
+    y_mm = (dlat * 1113) // 10
+    x_mm = (dlon * cos_lat * 1113) // 100000
+    dist_cm = (isqrt(x_mm * x_mm + y_mm * y_mm) + 5) // 10
+    return dist_cm, atan2_int(x_mm, y_mm) // 100
+
+
+def leg_lengths(lon, lat, exact=False):
+    """Length [cm] of every trail leg, n points give n - 1 legs."""
+    lon = np.asarray(lon, dtype=np.int64)
+    lat = np.asarray(lat, dtype=np.int64)
+    return distance_bearing(lon[:-1], lat[:-1], lon[1:], lat[1:], exact)[0]
+
+
+def cumulative_distance(lon, lat, exact=False):
+    """Distance [cm] along the trail from the first point to every point."""
+    legs = leg_lengths(lon, lat, exact)
+    return np.concatenate((np.zeros(1, dtype=legs.dtype), np.cumsum(legs)))
+
+
+def headings(lon, lat, exact=False):
+    """Bearing [deg] of every trail leg."""
+    lon = np.asarray(lon, dtype=np.int64)
+    lat = np.asarray(lat, dtype=np.int64)
+    return distance_bearing(lon[:-1], lat[:-1], lon[1:], lat[1:], exact)[1]
+
+
+def cross_track_errors(track_lon, track_lat, trail_lon, trail_lat, exact=False, budget=CROSS_TRACK_BUDGET):
+    """
+    Distance [cm] of every track point to the nearest trail segment.
+    Positive when the point is on the right side of the segment direction.
+    Points are projected into the local frame of the first trail point.
+    Track points are processed in chunks of budget // segments, so memory does
+    not grow with the trail length.
+    Returns (errors_cm, segment_index) arrays, errors are float.
+    """
+    trail_lon = np.asarray(trail_lon, dtype=np.int64)
+    trail_lat = np.asarray(trail_lat, dtype=np.int64)
+    origin_lon, origin_lat = int(trail_lon[0]), int(trail_lat[0])
+    trail_e, trail_n = local_frame(trail_lon, trail_lat, origin_lon, origin_lat, exact)
+    track_e, track_n = local_frame(track_lon, track_lat, origin_lon, origin_lat, exact)
+    trail_e = trail_e.astype(np.float64)
+    trail_n = trail_n.astype(np.float64)
+    track_e = track_e.astype(np.float64)
+    track_n = track_n.astype(np.float64)
+
+    if len(trail_e) == 1:
+        return np.hypot(track_e - trail_e[0], track_n - trail_n[0]) / 10, np.zeros(len(track_e), dtype=np.int64)
+
+    # Segments (k,), points chunk (m, 1).
+    seg_e = trail_e[:-1]
+    seg_n = trail_n[:-1]
+    dir_e = trail_e[1:] - seg_e
+    dir_n = trail_n[1:] - seg_n
+    seg_len_sq = np.maximum(dir_e * dir_e + dir_n * dir_n, 1e-9)
+
+    chunk_size = max(1, budget // len(seg_e))
+    errors = np.empty(len(track_e))
+    segments = np.empty(len(track_e), dtype=np.int64)
+    for start in range(0, len(track_e), chunk_size):
+        rel_e = track_e[start:start + chunk_size, None] - seg_e
+        rel_n = track_n[start:start + chunk_size, None] - seg_n
+        t = np.clip((rel_e * dir_e + rel_n * dir_n) / seg_len_sq, 0, 1)
+        off_e = rel_e - t * dir_e
+        off_n = rel_n - t * dir_n
+        dist_sq = off_e * off_e + off_n * off_n
+        nearest = np.argmin(dist_sq, axis=1)
+        rows = np.arange(len(nearest))
+        # Cross product sign: segment direction x point offset, negative on the left.
+        side = np.sign(dir_n[nearest] * rel_e[rows, nearest] - dir_e[nearest] * rel_n[rows, nearest])
+        side[side == 0] = 1
+        errors[start:start + chunk_size] = np.sqrt(dist_sq[rows, nearest]) * side / 10
+        segments[start:start + chunk_size] = nearest
+    return errors, segments
+
+
+def simplify(lon, lat, tolerance_cm):
+    """
+    Ramer-Douglas-Peucker simplification of a trail in microdegrees.
+    Removed points are within tolerance_cm of the simplified trail.
+    Returns sorted indexes of kept points, first and last are always kept.
+    """
+    lon = np.asarray(lon, dtype=np.int64)
+    lat = np.asarray(lat, dtype=np.int64)
+    if len(lon) < 3:
+        return np.arange(len(lon))
+    east, north = local_frame(lon, lat, int(lon[0]), int(lat[0]), exact=True)
+    tolerance_mm = tolerance_cm * 10
+    keep = np.zeros(len(lon), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(lon) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        # Distance of inner points to the segment first - last.
+        dir_e = east[last] - east[first]
+        dir_n = north[last] - north[first]
+        rel_e = east[first + 1:last] - east[first]
+        rel_n = north[first + 1:last] - north[first]
+        length_sq = dir_e * dir_e + dir_n * dir_n
+        t = np.clip((rel_e * dir_e + rel_n * dir_n) / length_sq, 0, 1) if length_sq else 0
+        dist = np.hypot(rel_e - t * dir_e, rel_n - t * dir_n)
+        farthest = int(np.argmax(dist))
+        if dist[farthest] > tolerance_mm:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return np.flatnonzero(keep)
+
+
+def densify(lon, lat, max_leg_cm):
+    """
+    Insert evenly spaced points into legs longer than max_leg_cm.
+    Returns (lon, lat) int64 arrays in microdegrees, original points included.
+    """
+    lon = np.asarray(lon, dtype=np.int64)
+    lat = np.asarray(lat, dtype=np.int64)
+    if len(lon) < 2:
+        return lon, lat
+    legs = leg_lengths(lon, lat, exact=True)
+    parts = np.maximum(np.ceil(legs / max_leg_cm).astype(np.int64), 1)
+    # Leg i contributes its start point and parts[i] - 1 inner points.
+    leg = np.repeat(np.arange(len(legs)), parts)
+    fraction = (np.arange(len(leg)) - np.repeat(np.cumsum(parts) - parts, parts)) / parts[leg]
+    new_lon = lon[leg] + np.round((lon[leg + 1] - lon[leg]) * fraction).astype(np.int64)
+    new_lat = lat[leg] + np.round((lat[leg + 1] - lat[leg]) * fraction).astype(np.int64)
+    return np.append(new_lon, lon[-1]), np.append(new_lat, lat[-1])
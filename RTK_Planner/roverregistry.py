@@ -0,0 +1,124 @@
+import datetime
+import threading
+
+ACTIVE = "active"
+INACTIVE = "inactive"
+
+
+def parse_last_active(last_active):
+    """rover.last_active text to datetime, None when missing or malformed."""
+    try:
+        return datetime.datetime.fromisoformat(last_active)
+    except (TypeError, ValueError):
+        return None
+
+
+class RoverRegistry:
+    """
+    Registered rovers by MAC, loaded from the database once and kept in memory.
+    Registration and GNSS updates are checked with a dict lookup.
+    invalidate() after any change of the rover table, the next lookup reloads it.
+
+    Last seen time and status are updated in memory and written back to
+    rover.last_active / rover.status by write_back, periodically from the thread
+    started with start(). Rover not seen for inactive_after_s becomes inactive,
+    after a reload the last seen time starts from last_active, an active rover
+    without it is inactive at the next write back.
+    """
+    def __init__(self, load, write, inactive_after_s=30):
+        self._load = load       # Returns iterable of (mac, status, last_active).
+        self._write = write     # Takes list of (last_active, status, mac).
+        self.inactive_after_s = inactive_after_s
+        self._lock = threading.Lock()
+        self._rovers = None     # MAC -> {"status", "last_active", "last_seen"}, None until loaded.
+        self._dirty = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _loaded(self):
+        # Called with the lock held.
+        if self._rovers is None:
+            self._rovers = {mac: {"status": status, "last_active": last_active,
+                                  "last_seen": parse_last_active(last_active)}
+                            for mac, status, last_active in self._load()}
+        return self._rovers
+
+    def invalidate(self):
+        # Keep status changes made since the last write back. Written with the lock
+        # held, a rover seen meanwhile is marked only after the reset.
+        with self._lock:
+            try:
+                if self._rovers is not None:
+                    updates = self._pending()
+                    if updates:
+                        self._write(updates)
+            finally:
+                self._rovers = None
+                self._dirty.clear()
+
+    def is_registered(self, mac):
+        with self._lock:
+            return mac in self._loaded()
+
+    def seen(self, mac):
+        """Mark the rover active. Returns False for a not registered MAC."""
+        now = datetime.datetime.now()
+        with self._lock:
+            rover = self._loaded().get(mac)
+            if rover is None:
+                return False
+            rover["last_seen"] = now
+            if rover["status"] != ACTIVE:
+                rover["status"] = ACTIVE
+            self._dirty.add(mac)
+            return True
+
+    def status(self, mac):
+        with self._lock:
+            rover = self._loaded().get(mac)
+            return dict(rover) if rover else None
+
+    def _pending(self):
+        # Called with the lock held, returns updates for the write function.
+        inactive_before = datetime.datetime.now() - datetime.timedelta(seconds=self.inactive_after_s)
+        for mac, rover in self._rovers.items():
+            if rover["status"] == ACTIVE and (rover["last_seen"] is None or rover["last_seen"] < inactive_before):
+                rover["status"] = INACTIVE
+                self._dirty.add(mac)
+        updates = []
+        for mac in self._dirty:
+            rover = self._rovers[mac]
+            if rover["last_seen"]:
+                rover["last_active"] = rover["last_seen"].strftime("%Y-%m-%d %H:%M:%S")
+            updates.append((rover["last_active"], rover["status"], mac))
+        self._dirty.clear()
+        return updates
+
+    def write_back(self):
+        """Store last seen time and status of changed rovers. Returns number of written rovers."""
+        with self._lock:
+            if self._rovers is None:
+                return 0
+            updates = self._pending()
+        if updates:
+            self._write(updates)
+        return len(updates)
+
+    def start(self, interval_s=5):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval_s,), daemon=True)
+            self._thread.start()
+
+    def _run(self, interval_s):
+        while not self._stop.wait(interval_s):
+            try:
+                self.write_back()
+            except Exception as e:
+                print(f"Rover status write back failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.write_back()
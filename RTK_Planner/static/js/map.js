@@ -385,30 +385,12 @@ function loadTrailOnMap(trailId) {
         return;
     }
 
-    // Fetch the trail data
-    fetch(`/api/trails`)
+    // Fetch the trail points
+    fetch(`/api/trails/${trailId}/points`)
         .then(response => response.json())
-        .then(trails => {
-            const trail = trails.find(t => t.id == trailId);
-            if (!trail || !trail.trail_points) {
-                console.error('Trail not found or has no points');
-                return;
-            }
-
-            // Parse the trail points
-            let points;
-            try {
-                // Replace single quotes with double quotes to make it valid JSON
-                const validJson = trail.trail_points.replace(/'/g, '"');
-                points = JSON.parse(validJson);
-            } catch (e) {
-                console.error('Error parsing trail points:', e);
-                console.error('Trail points value:', trail.trail_points);
-                return;
-            }
-
+        .then(points => {
             if (!Array.isArray(points) || points.length === 0) {
-                console.error('Invalid trail points format');
+                console.error('Trail not found or has no points');
                 return;
             }
 
@@ -508,7 +490,7 @@ trailSaveButton.addEventListener("click", function () {
                 console.log('Success:', data);
                 loadTrailsForDropdown();
                 trailConsole.style.color = '#00AA00';
-                trailConsole.innerHTML = "Trail " + data.name + " created.\nPoints: " + data.trail_points
+                trailConsole.innerHTML = "Trail " + data.name + " created.\nPoints: " + data.point_count
             })
             .catch(error => {
                 console.error('Error:', error);
@@ -0,0 +1,148 @@
+"""
+GNSS track history of every rover.
+
+Points are appended to a memory buffer and written in batches, one
+transaction per batch, into a separate database file so the high rate
+writes do not compete with the rover and trail tables.
+track_point is a WITHOUT ROWID table clustered by (mac, t_ms): points of one
+rover in a time window are stored next to each other and read as one range.
+
+Long windows are downsampled with min/max bucketing: the window is split
+into buckets and from each bucket the points with extreme latitude and
+longitude are returned, so turns and spikes survive the reduction.
+
+With retention_s set, the flush thread deletes points older than that
+every prune_interval_s, the first time right after start.
+"""
+import threading
+import time
+
+from database import connect
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS track_point (
+        mac TEXT NOT NULL,
+        t_ms INTEGER NOT NULL,
+        lon INTEGER NOT NULL,
+        lat INTEGER NOT NULL,
+        fix INTEGER NOT NULL,
+        PRIMARY KEY (mac, t_ms)
+    ) WITHOUT ROWID;
+"""
+
+# Extreme points of every bucket, SQLite returns the row of MIN / MAX for bare columns.
+BUCKET_QUERY = """
+    SELECT t_ms, lon, lat, fix FROM (
+        SELECT MIN(lat), t_ms, lon, lat, fix FROM track_window GROUP BY bucket
+        UNION SELECT MAX(lat), t_ms, lon, lat, fix FROM track_window GROUP BY bucket
+        UNION SELECT MIN(lon), t_ms, lon, lat, fix FROM track_window GROUP BY bucket
+        UNION SELECT MAX(lon), t_ms, lon, lat, fix FROM track_window GROUP BY bucket
+    )
+    GROUP BY t_ms
+    ORDER BY t_ms
+"""
+POINTS_PER_BUCKET = 4
+
+
+class TrackStore:
+    def __init__(self, path, batch_size=500, flush_interval_s=1.0, retention_s=None, prune_interval_s=3600):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.retention_s = retention_s      # None keeps all points.
+        self.prune_interval_s = prune_interval_s
+        self._next_prune = 0                # time.monotonic() of the next prune.
+        self._pending = []
+        self._last_ms = {}      # MAC -> time of the last point.
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._db = connect(path)
+        self._db.executescript(SCHEMA)
+        self._stop = threading.Event()
+        self._thread = None
+        self.written = 0
+
+    def append(self, mac, lon, lat, fix, t_ms=None):
+        """Add point (microdegrees, fix status code). Written when the batch is full or by the flush thread."""
+        if t_ms is None:
+            t_ms = int(time.time() * 1000)
+        with self._lock:
+            # Telemetry batches arrive within one millisecond, keep time unique and increasing per rover.
+            t_ms = max(t_ms, self._last_ms.get(mac, -1) + 1)
+            self._last_ms[mac] = t_ms
+            self._pending.append((mac, t_ms, lon, lat, fix))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        with self._write_lock, self._db:
+            # Time going back after server clock change, the later point wins.
+            self._db.executemany("INSERT OR REPLACE INTO track_point VALUES (?, ?, ?, ?, ?)", batch)
+        self.written += len(batch)
+        return len(batch)
+
+    def start(self):
+        """Start thread flushing the buffer every flush_interval_s."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval_s):
+            self.flush()
+            if self.retention_s is not None and time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval_s
+                self.prune()
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._db.close()
+
+    def count(self, mac, start_ms, end_ms):
+        self.flush()
+        with self._write_lock:
+            return self._db.execute("SELECT COUNT(*) FROM track_point WHERE mac = ? AND t_ms BETWEEN ? AND ?",
+                                    [mac, start_ms, end_ms]).fetchone()[0]
+
+    def get_track(self, mac, start_ms, end_ms, max_points=1000):
+        """
+        Points (t_ms, lon, lat, fix) of the rover in the time window, oldest first.
+        Windows with more than max_points points are downsampled to at most max_points.
+        """
+        total = self.count(mac, start_ms, end_ms)
+        with self._write_lock:
+            args = [mac, start_ms, end_ms]
+            if total <= max_points:
+                rows = self._db.execute("SELECT t_ms, lon, lat, fix FROM track_point "
+                                        "WHERE mac = ? AND t_ms BETWEEN ? AND ? ORDER BY t_ms", args).fetchall()
+                return [tuple(row) for row in rows]
+            buckets = max(1, max_points // POINTS_PER_BUCKET)
+            rows = self._db.execute(f"""
+                WITH track_window AS (
+                    SELECT t_ms, lon, lat, fix, (t_ms - ?) * ? / (? - ? + 1) AS bucket
+                    FROM track_point WHERE mac = ? AND t_ms BETWEEN ? AND ?
+                )
+                {BUCKET_QUERY}
+            """, [start_ms, buckets, end_ms, start_ms] + args).fetchall()
+            return [tuple(row) for row in rows]
+
+    def prune(self):
+        """Delete points older than retention_s. Returns number of deleted points."""
+        if self.retention_s is None:
+            return 0
+        return self.delete_before(int((time.time() - self.retention_s) * 1000))
+
+    def delete_before(self, t_ms):
+        """Retention, removes points older than t_ms. Returns number of deleted points."""
+        self.flush()
+        with self._write_lock, self._db:
+            return self._db.execute("DELETE FROM track_point WHERE t_ms < ?", [t_ms]).rowcount
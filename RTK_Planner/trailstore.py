@@ -0,0 +1,203 @@
+"""
+Trail points stored one row per point in SQLite.
+
+Coordinates are integer microdegrees (degrees * 1000000), the unit used by
+the rover navigation, so points survive the round trip without float error.
+Every trail segment (point seq -> seq + 1) has its bounding box in the
+R*-tree trail_segment_index, id is the trail_point id of the segment start
+(single point trail has the point itself).
+It answers "trails near this point" without reading whole trails.
+"""
+import json
+import math
+import sqlite3
+
+# 1 microdegree of latitude in cm.
+CM_PER_MICRODEGREE = 11.132
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS trail_point (
+        id INTEGER PRIMARY KEY,
+        trail_id INTEGER NOT NULL,
+        seq INTEGER NOT NULL,
+        lon INTEGER NOT NULL,
+        lat INTEGER NOT NULL,
+        FOREIGN KEY (trail_id) REFERENCES trail(id) ON DELETE CASCADE
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS trail_point_trail_seq ON trail_point (trail_id, seq);
+    CREATE INDEX IF NOT EXISTS trail_point_lat_lon ON trail_point (lat, lon);
+"""
+
+SEGMENT_INDEX_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS trail_segment_index
+        USING rtree_i32(id, min_lon, max_lon, min_lat, max_lat);
+"""
+
+
+def parse_microdegrees(value):
+    """Coordinate in degrees (string or number) to integer microdegrees, truncated after 6 decimals."""
+    value = str(value).strip()
+    if "e" in value.lower():
+        # Exponent notation from float formatting, round off representation error first.
+        return int(round(float(value) * 10000000) / 10)
+    whole, _, fraction = value.lstrip("+-").partition(".")
+    result = int(whole or "0") * 1000000 + int((fraction + "000000")[:6])
+    return -result if value.startswith("-") else result
+
+
+def format_microdegrees(value):
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    return f"{sign}{value // 1000000}.{value % 1000000:06d}"
+
+
+def create_schema(db):
+    """Create tables and indexes, returns False when SQLite is built without R*-tree."""
+    db.executescript(SCHEMA)
+    try:
+        db.executescript(SEGMENT_INDEX_SCHEMA)
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_segment_index(db):
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name = 'trail_segment_index'").fetchone() is not None
+
+
+def parse_points(trail_points):
+    """
+    [[lon, lat], ...] as list or JSON text (also the legacy form with single quotes)
+    to list of (lon, lat) microdegrees.
+    """
+    if isinstance(trail_points, str):
+        trail_points = json.loads(trail_points.replace("'", "\""))
+    return [(parse_microdegrees(lon), parse_microdegrees(lat)) for lon, lat in trail_points]
+
+
+def insert_points(db, trail_id, points):
+    """Store trail points (lon, lat) in microdegrees, replacing the previous ones. Caller commits."""
+    delete_points(db, trail_id)
+    db.executemany("INSERT INTO trail_point (trail_id, seq, lon, lat) VALUES (?, ?, ?, ?)",
+                   ((trail_id, seq, lon, lat) for seq, (lon, lat) in enumerate(points)))
+    if has_segment_index(db):
+        rows = db.execute("SELECT id, lon, lat FROM trail_point WHERE trail_id = ? ORDER BY seq",
+                          [trail_id]).fetchall()
+        db.executemany("INSERT INTO trail_segment_index VALUES (?, ?, ?, ?, ?)",
+                       ((start[0], min(start[1], end[1]), max(start[1], end[1]),
+                         min(start[2], end[2]), max(start[2], end[2]))
+                        for start, end in zip(rows, rows[1:] or rows)))
+
+
+def delete_points(db, trail_id):
+    if has_segment_index(db):
+        db.execute("DELETE FROM trail_segment_index WHERE id IN (SELECT id FROM trail_point WHERE trail_id = ?)",
+                   [trail_id])
+    db.execute("DELETE FROM trail_point WHERE trail_id = ?", [trail_id])
+
+
+def get_points(db, trail_id):
+    """Returns list of (lon, lat) microdegrees in trail order."""
+    return db.execute("SELECT lon, lat FROM trail_point WHERE trail_id = ? ORDER BY seq", [trail_id]).fetchall()
+
+
+def points_as_degrees(points):
+    """(lon, lat) microdegrees to [[lon, lat], ...] decimal strings, the format of rover trails."""
+    return [[format_microdegrees(lon), format_microdegrees(lat)] for lon, lat in points]
+
+
+def trail_summaries(db, trail_id=None, rover_id=None):
+    """
+    id, name, point count and bounding box [min_lon, min_lat, max_lon, max_lat]
+    of trails, without the points. Filtered by trail or by rover association.
+    """
+    query = """
+        SELECT t.id, t.name, COUNT(p.id) AS point_count,
+               MIN(p.lon) AS min_lon, MIN(p.lat) AS min_lat, MAX(p.lon) AS max_lon, MAX(p.lat) AS max_lat
+        FROM trail t LEFT JOIN trail_point p ON p.trail_id = t.id
+    """
+    args = []
+    if trail_id is not None:
+        query += " WHERE t.id = ?"
+        args.append(trail_id)
+    elif rover_id is not None:
+        query += " WHERE t.id IN (SELECT trail_id FROM rover_trail WHERE rover_id = ?)"
+        args.append(rover_id)
+    rows = db.execute(query + " GROUP BY t.id ORDER BY t.name", args).fetchall()
+    return [trail_summary(row) for row in rows]
+
+
+def trail_summary(row):
+    summary = {"id": row[0], "name": row[1], "point_count": row[2], "bbox": None}
+    if row[2]:
+        summary["bbox"] = [format_microdegrees(value) for value in row[3:7]]
+    return summary
+
+
+def points_in_bbox(db, min_lon, min_lat, max_lon, max_lat, trail_id=None):
+    """Returns (trail_id, seq, lon, lat) of points inside the box, all in microdegrees."""
+    query = "SELECT trail_id, seq, lon, lat FROM trail_point WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?"
+    args = [min_lat, max_lat, min_lon, max_lon]
+    if trail_id is not None:
+        query += " AND trail_id = ?"
+        args.append(trail_id)
+    return db.execute(query + " ORDER BY trail_id, seq", args).fetchall()
+
+
+def _segment_distance_cm(lon, lat, start, end):
+    """Distance of the point to the segment in local flat frame, all in microdegrees."""
+    cos_lat = math.cos(math.radians(lat / 1e6))
+    ax, ay = (start[0] - lon) * cos_lat, start[1] - lat
+    bx, by = (end[0] - lon) * cos_lat, end[1] - lat
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0 if length_sq == 0 else min(1, max(0, -(ax * dx + ay * dy) / length_sq))
+    return math.hypot(ax + t * dx, ay + t * dy) * CM_PER_MICRODEGREE
+
+
+def trails_near(db, lon, lat, radius_cm):
+    """
+    Trails passing within radius_cm of the point (microdegrees).
+    Returns list of (trail_id, distance_cm) sorted by distance.
+    """
+    radius_lat = int(radius_cm / CM_PER_MICRODEGREE) + 1
+    radius_lon = int(radius_lat / max(math.cos(math.radians(lat / 1e6)), 0.01)) + 1
+    # Segment end is missing only for single point trails.
+    segment_query = """
+        SELECT s.trail_id, s.lon, s.lat, COALESCE(e.lon, s.lon), COALESCE(e.lat, s.lat)
+        FROM trail_point s LEFT JOIN trail_point e ON e.trail_id = s.trail_id AND e.seq = s.seq + 1
+    """
+    if has_segment_index(db):
+        segments = db.execute(segment_query + """
+            JOIN trail_segment_index i ON i.id = s.id
+            WHERE i.max_lon >= ? AND i.min_lon <= ? AND i.max_lat >= ? AND i.min_lat <= ?
+        """, [lon - radius_lon, lon + radius_lon, lat - radius_lat, lat + radius_lat]).fetchall()
+    else:
+        # No R*-tree in this SQLite build, check all segments.
+        segments = db.execute(segment_query).fetchall()
+
+    nearest = {}
+    for trail_id, start_lon, start_lat, end_lon, end_lat in segments:
+        distance = _segment_distance_cm(lon, lat, (start_lon, start_lat), (end_lon, end_lat))
+        if distance <= radius_cm and distance < nearest.get(trail_id, radius_cm + 1):
+            nearest[trail_id] = distance
+    return sorted(((trail_id, round(distance, 1)) for trail_id, distance in nearest.items()), key=lambda x: x[1])
+
+
+def migrate_legacy_trails(db):
+    """
+    Move points of trails stored as JSON text in trail.trail_points into trail_point.
+    Returns number of migrated trails. Caller commits.
+    """
+    migrated = 0
+    for trail_id, trail_points in db.execute(
+            "SELECT id, trail_points FROM trail WHERE trail_points IS NOT NULL AND trail_points != ''").fetchall():
+        try:
+            points = parse_points(trail_points)
+        except (ValueError, TypeError) as e:
+            print(f"Trail {trail_id} not migrated, invalid points: {e}")
+            continue
+        insert_points(db, trail_id, points)
+        db.execute("UPDATE trail SET trail_points = NULL WHERE id = ?", [trail_id])
+        migrated += 1
+    return migrated
@@ -9,7 +9,8 @@ from esp32board import WLAN
 # --------------------------------------------------
 # Logger init.
 # --------------------------------------------------
-logger = logger.init_logger("rover.log", max_size=200000, use_file=True)
+logger = logger.init_logger("rover.log", max_size=200000, use_file=True,
+                            buffered=True, buffer_size=4096, flush_interval_ms=2000)
 
 #logger.to_console()
 logger.to_file()
@@ -2,44 +2,121 @@ import os
 import time
 
 
+DEBUG = 10
+INFO = 20
+ERROR = 40
+
+
 class Logger:
     """
     This logger uses 2 files each with the max_size.
     The logger is toggling between these 2 files, and overwrite them each time.
-    The max_size of file is approximate value. The logger does not care
-    about the precise size of file but is faster.
+    The file size is tracked by counting written bytes instead of os.stat.
+
+    Buffered mode keeps the file open and collects lines in a preallocated
+    buffer. The buffer is written when it is full, when flush_interval_ms
+    elapsed, on ERROR level or on flush() call.
+    Lines below level are dropped before formatting.
     """
-    def __init__(self, filename="log.txt", max_size=10240, use_file=True):
+    def __init__(self, filename="log.txt", max_size=10240, use_file=True,
+                 buffered=False, buffer_size=2048, flush_interval_ms=2000, level=INFO):
         self._filename1 = "1" + filename
         self._filename2 = "2" + filename
         self.filename = self._filename1
         self.max_size = max_size
         self.use_file = use_file
-        self._write_estimator = 0   # Compare integer instead of use os.stat to save time.
-        self._mode = "a"
-        self.buf = []
+        self.buffered = buffered
+        self.flush_interval_ms = flush_interval_ms
+        self.level = level
+        self._file = None
+        self._buffer = bytearray(buffer_size) if buffered else None
+        self._buffer_view = memoryview(self._buffer) if buffered else None
+        self._buffer_len = 0
+        self._last_flush_ms = time.ticks_ms()
         self.size = self.get_size()
 
+    def debug(self, message: str) -> None:
+        if self.level <= DEBUG:
+            self._log("D", message)
+
     def info(self, message: str) -> None:
-        line = f"[{time.ticks_ms()}] {message}\n"
-        if self.use_file:
-            if self._write_estimator % 50 == 0 and self.get_size() > self.max_size:
-                self.filename = self._filename1 if self.filename == self._filename2 else self._filename2
-                self._mode = "w"
-            else:
-                self._mode = "a"
-            with open(self.filename, self._mode) as f:
+        if self.level <= INFO:
+            self._log("I", message)
+
+    def error(self, message: str) -> None:
+        if self.level <= ERROR:
+            self._log("E", message)
+            self.flush()
+
+    def _log(self, level_char, message):
+        line = f"[{time.ticks_ms()}] {level_char} {message}\n"
+        if not self.use_file:
+            print(line, end="")
+        elif self.buffered:
+            self._write_buffered(line.encode())
+        else:
+            self._rotate_if_full()
+            with open(self.filename, "a") as f:
                 f.write(line)
-            self._write_estimator += 1
+            self.size += len(line)
+
+    def _write_buffered(self, data):
+        size = len(data)
+        if self._buffer_len + size > len(self._buffer):
+            self.flush()
+        if size > len(self._buffer):
+            self._write_file(data)
         else:
-            print(line, end="")
+            self._buffer_view[self._buffer_len:self._buffer_len + size] = data
+            self._buffer_len += size
+        if time.ticks_diff(time.ticks_ms(), self._last_flush_ms) >= self.flush_interval_ms:
+            self.flush()
+
+    def _write_file(self, data):
+        self._rotate_if_full()
+        if self._file is None:
+            self._file = open(self.filename, "ab")
+        self._file.write(data)
+        self.size += len(data)
+
+    def _rotate_if_full(self):
+        if self.size > self.max_size:
+            self.filename = self._filename1 if self.filename == self._filename2 else self._filename2
+            if self._file:
+                self._file.close()
+                self._file = None
+            # Truncate the other file.
+            with open(self.filename, "w"):
+                pass
+            self.size = 0
+
+    def flush(self):
+        """Write buffered lines to file."""
+        self._last_flush_ms = time.ticks_ms()
+        if self._buffer_len:
+            self._write_file(self._buffer_view[:self._buffer_len])
+            self._buffer_len = 0
+        if self._file:
+            self._file.flush()
+
+    def poll(self):
+        """Flush buffered lines older than flush_interval_ms, call periodically."""
+        if self._buffer_len and time.ticks_diff(time.ticks_ms(), self._last_flush_ms) >= self.flush_interval_ms:
+            self.flush()
 
+    def close(self):
+        if self.buffered:
+            self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
 
     def to_file(self):
         self.use_file = True
         self.size = self.get_size()
 
     def to_console(self):
+        self.close()
         self.use_file = False
 
     def get_size(self):
@@ -54,11 +131,12 @@ class Logger:
 # This can be used in multiple modules.
 logger = None
 
-def init_logger(filename="log.txt", max_size=10240, use_file=True):
+def init_logger(filename="log.txt", max_size=10240, use_file=True,
+                buffered=False, buffer_size=2048, flush_interval_ms=2000, level=INFO):
     """
     Initialize global logger."""
     global logger
-    logger = Logger(filename, max_size, use_file)
+    logger = Logger(filename, max_size, use_file, buffered, buffer_size, flush_interval_ms, level)
     return logger
 
 def get_logger():
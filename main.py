@@ -1,9 +1,6 @@
-import json
-import time
-
 from machine import I2C, Pin, Timer
 
-from logger import get_logger
+from logger import DEBUG, get_logger
 
 try:
     from boot_main_config import *
@@ -12,10 +9,12 @@ except:
 
 
 from microNMEA.microNMEA import MicroNMEA
-from navigation import Movement, Navigation
-from ntripclient import NTRIPClient
+from navigation import DeadReckoning, Movement, Navigation, PathFollower, LevelPIDController, Steering
+from ntripclient import NTRIPClient, NTRIPManager
 from px1122r import PX1122RUART
+from rtcmforwarder import RTCMForwarder
 from rtkplanner import RTKPlanner
+from scheduler import Scheduler, ticks_ms
 
 try:
     import ubinascii as ubin
@@ -46,8 +45,13 @@ if __name__ == "__main__":
                                config["ntrip"]["port"],
                                config["ntrip"]["mountpoint"],
                                config["ntrip"]["user"],
-                               config["ntrip"]["password"])
+                               config["ntrip"]["password"],
+                               read_timeout_s=0,     # Reading must not block other tasks.
+                               connect_timeout_s=3)
     ntrip_client.connect()
+    # Reconnects dead stream and sends rover position to VRS mountpoints.
+    ntrip_manager = NTRIPManager(ntrip_client)
+    rtcm_forwarder = RTCMForwarder(ntrip_manager, gps_uart)
 
     # --------------------------------------------------
     # Prepare Compass and driving motors.
@@ -76,84 +80,170 @@ if __name__ == "__main__":
 
     # Compass and driving motors.
     i2c = I2C(0, scl=Pin(22), sda=Pin(21), freq=100000)
-    nav = Navigation(i2c)
-    mov = Movement((27, 14), (12, 13), tolerance_heading = 5)
+    # Lookup table trigonometry is opt-in, the default polynomial one matches RTK Planner geodesy.
+    nav = Navigation(i2c, trig_tables=config.get("navigation", {}).get("trig_tables", False))
+    # Compass sampled and motors steered at 50 Hz, independent of the GNSS fix rate.
+    # Logging every motor command would flood the log.
+    STEERING_PERIOD_MS = 20
+    steering_config = config.get("steering", {})
+    controller = None   # Bang-bang by default.
+    if steering_config.get("controller") == "pid":
+        controller = LevelPIDController(steering_config.get("kp_x100", 100),
+                                   steering_config.get("ki_x100", 0),
+                                   steering_config.get("kd_x100", 200),
+                                   tolerance_heading=5)
+    mov = Movement((27, 14), (12, 13), tolerance_heading = 5, debug_print=False, controller=controller)
+    steering = Steering(mov, nav.heading)
+    # Position between GNSS fixes for the control task.
+    dead_reckoning = DeadReckoning(nav)
+    # Follow the trail segments instead of heading to every waypoint.
+    path_follower = None
+    if "lookahead_cm" in steering_config:
+        path_follower = PathFollower(nav, steering_config["lookahead_cm"])
 
 
     # --------------------------------------------------
     # RTK Planner.
     # --------------------------------------------------
-    rtk_planner = RTKPlanner(config["server"]["host"], config["server"]["port"], wlan.get_mac())
+    rtk_planner = RTKPlanner(config["server"]["host"], config["server"]["port"], wlan.get_mac(),
+                             telemetry_port=config["server"].get("telemetry_port"))
 
     # Rover must be registered in RTK planner first.
     rtk_planner.register()
 
-    # Main loop variables.
-    check_updates_s = time.time()   # Timer for trail pull.
-    check_updates_interval_s = 2    # Interval for trail pull.
+    # Task variables.
     previous_coordinates = (0, 0)   # To track coordinate changes.
     previous_quality = ""
 
     # --------------------------------------------------
-    #
-    # Start main loop.
-    #
+    # Tasks run by cooperative scheduler.
+    # Each task must return quickly, blocking call delays all tasks.
     # --------------------------------------------------
-    while True:
-        try:
-            # Check WLAN status.
-            wlan.check()
-
-            # Receive NTRIP data from configured service.
-            ntrip_data = ntrip_client.read_data()
-
-            # Resend NTRIP data to GNSS rover.
-            gps_uart.send_data(ntrip_data)
-
-            # Receive data from GNSS rover. Check data is correct.
-            sentence = gps_uart.process_received_data()
-
-            if sentence:
-                # Decode NMEA data.
+    def wlan_task():
+        # Check WLAN status.
+        wlan.check()
+
+    async def ntrip_task():
+        # Reconnect dead stream, waiting for the caster does not block other tasks.
+        await ntrip_manager.maintain()
+        # Receive NTRIP data from configured service and resend complete RTCM frames to GNSS rover.
+        rtcm_forwarder.forward()
+
+    def nmea_task():
+        global previous_coordinates, previous_quality
+
+        # Receive data from GNSS rover. Only sentences with correct checksum are returned.
+        sentences = gps_uart.process_received_data()
+
+        if sentences:
+            # Decode NMEA data.
+            new_position = False
+            for sentence in sentences:
                 micro_nmea.parse(sentence)
+                kind = sentence[3:6]
+                if kind == "GGA":
+                    ntrip_manager.set_gga(sentence)
+                if kind == "GGA" or kind == "RMC":
+                    new_position = True
+            # Epoch output spans several reads, only position sentences carry a new fix.
+            if new_position and micro_nmea.lat:
+                dead_reckoning.fix(micro_nmea.lon, micro_nmea.lat, micro_nmea.speed, micro_nmea.course, ticks_ms(),
+                                   micro_nmea.time)
+
+            # Send data to RTK Planner server.
+            if ((micro_nmea.lat, micro_nmea.lon) != previous_coordinates
+                    or micro_nmea.quality != previous_quality):
+                rtk_planner.send_gnss_update(micro_nmea)
+                previous_coordinates = micro_nmea.lat, micro_nmea.lon
+                previous_quality = micro_nmea.quality
+
+    async def telemetry_task():
+        # Send batched GNSS updates waiting too long, or the latest update over HTTP without telemetry.
+        await rtk_planner.flush_gnss_updates()
+
+    async def trail_task():
+        # Long poll of the rover mailbox, returns as soon as the server posts new trail.
+        # Waiting is asynchronous, other tasks keep running.
+        await rtk_planner.poll_trails(wait_s=20)
+        if not rtk_planner.has_trail():
+            logger.info("NO TRAIL")
+
+    async def trail_page_task():
+        # Download next waypoints before the rover reaches the end of the window.
+        await rtk_planner.fill_trail_window()
+
+    def control_task():
+        # GNSS path: updates the target bearing of the steering stage, runs at the fix rate.
+        global compass_calibration
+
+        # Navigation part.
+        # Calibrate compass if button is pressed.
+        if compass_calibration:
+            steering.stop()
+            steering.step()
+            compass_calibration_led_status.value(1)
+            nav.compass.calibrate_magnetometer(duration_s=120)
+            compass_calibration_led_status.value(0)
+            compass_calibration = False
+
+        if micro_nmea.quality not in ["SPS Fix", "RTK Fix", "RTK Float"]:
+            logger.debug("No RTK fix")
+            steering.stop()
+            return
+
+        # Position predicted from the last fix, updated at the control rate.
+        position = dead_reckoning.predict(ticks_ms(), steering.heading)
+        if not rtk_planner.has_trail() or position is None:
+            steering.stop()
+            return
+
+        lon, lat = position
+        if path_follower:
+            waypoints = rtk_planner.waypoints
+            cursor = waypoints.cursor
+            result = path_follower.update(lon, lat, waypoints, rtk_planner.target_precision_cm)
+            if waypoints.cursor != cursor:
+                logger.info(f"TRAIL SEGMENT FINISHED: {waypoints.previous}")
+            if result is None:
+                steering.stop()
+                return
+            dist, target_heading = result
+            steering.set_target(target_heading)
+            if logger.level <= DEBUG:
+                logger.debug(f"POS: {lon, lat} Distance: {dist} Cross track [mm]: {path_follower.cross_track_mm} Heading (current, target): ({steering.heading}, {target_heading})")
+            return
+
+        dist, target_heading = nav.distance_bearing_position(lon, lat, rtk_planner.waypoints)
+        steering.set_target(target_heading)
+        if logger.level <= DEBUG:
+            logger.debug(f"POS (current, target): ({lon, lat}, {rtk_planner.current_trail_point()}) Distance: {dist} Heading (current, target): ({steering.heading}, {target_heading}) Fix error [mm]: {dead_reckoning.last_error_mm}")
+        if dist <= rtk_planner.target_precision_cm:
+            logger.info(f"TRAIL POIT REACHED: {rtk_planner.current_trail_point()}")
+            rtk_planner.next_trail_point()
+
+    def log_task():
+        # Write buffered log lines.
+        logger.poll()
+
+    def stats_task():
+        logger.info(f"Tasks: {scheduler.stats()}")
+        logger.info(rtcm_forwarder.stats())
+        logger.info(ntrip_manager.stats())
 
-                # Send data to RTK Planner server.
-                if ((micro_nmea.lat, micro_nmea.lon) != previous_coordinates
-                        or micro_nmea.quality != previous_quality):
-                    rtk_planner.send_gnss_update(micro_nmea)
-                    previous_coordinates = micro_nmea.lat, micro_nmea.lon
-                    previous_quality = micro_nmea.quality
-            
-            # HTTP pull trails every few seconds.
-            if time.time() - check_updates_s > check_updates_interval_s:
-                rtk_planner.get_trails()
-                check_updates_s = time.time()
-                if not rtk_planner.trail_points:
-                    logger.info("NO TRAIL")
-
-            # Navigation part.
-            # Calibrate compass if button is pressed.
-            if compass_calibration:
-                compass_calibration_led_status.value(1)
-                nav.compass.calibrate_magnetometer(duration_s=120)
-                compass_calibration_led_status.value(0)
-                compass_calibration = False
-
-            if micro_nmea.quality not in ["SPS Fix", "RTK Fix", "RTK Float"]:
-                logger.info("No RTK fix")
-                mov.move(-1, -1, True)
-                continue
-
-            if not rtk_planner.trail_points:
-                mov.move(-1, -1, True)
-                continue
-
-            dist, target_heading, current_heading = nav.calculate_distance_bearing(micro_nmea.lon, micro_nmea.lat, *rtk_planner.trail_points[0])
-            mov.move(current_heading, target_heading, False)
-            logger.info(f"POS (current, target): ({micro_nmea.lon, micro_nmea.lat}, {rtk_planner.trail_points[0]}) Distance: {dist}")
-            if dist <= rtk_planner.target_precision_cm:
-                logger.info(f"TRAIL POIT REACHED: {rtk_planner.trail_points[0]}")
-                rtk_planner.trail_points.pop(0)
-
-        except Exception as e:
-            logger.info(f"Main loop error: {e}")
+    # --------------------------------------------------
+    #
+    # Start scheduler, period [ms] per task.
+    #
+    # --------------------------------------------------
+    scheduler = Scheduler()
+    scheduler.add("wlan", 1000, wlan_task)
+    scheduler.add("ntrip", 50, ntrip_task)
+    scheduler.add("nmea", 20, nmea_task)
+    scheduler.add("telemetry", 100, telemetry_task, deadline_ms=1000)
+    scheduler.add("trail", 500, trail_task, deadline_ms=25000)
+    scheduler.add("trail_page", 200, trail_page_task, deadline_ms=5000)
+    scheduler.add("control", 100, control_task, deadline_ms=50)
+    scheduler.add("steering", STEERING_PERIOD_MS, steering.step, deadline_ms=STEERING_PERIOD_MS // 2)
+    scheduler.add("log", 1000, log_task)
+    scheduler.add("stats", 60000, stats_task)
+    scheduler.run()
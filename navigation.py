@@ -1,4 +1,6 @@
+import math
 import sys
+from array import array
 
 from machine import I2C
 
@@ -6,12 +8,119 @@ from logger import get_logger
 from microIMU9v6.imu9v6 import MinIMU9v6
 from microMX1508.microMX1508 import microMX1508
 from microNMEA.microNMEA import Precise
+from scheduler import ticks_diff
+
+
+# Quarter wave lookup tables, built once at import, linear interpolation between entries.
+TRIG_TABLE_STEPS = 256
+# atan(i / 256) [deg * 100], i = 0 - 256.
+ATAN_TABLE = array("H", (round(math.degrees(math.atan(i / TRIG_TABLE_STEPS)) * 100)
+                         for i in range(TRIG_TABLE_STEPS + 1)))
+# cos(i * 90 / 256 deg) * 10000, i = 0 - 256.
+COS_TABLE = array("H", (round(math.cos(math.radians(i * 90 / TRIG_TABLE_STEPS)) * 10000)
+                        for i in range(TRIG_TABLE_STEPS + 1)))
+
+FORWARD = -1    # Steering level: drive straight, otherwise turn speed 0 - 3 of the motor driver.
+
+
+def turn_levels(tolerance_heading):
+    """
+    Steering level for every absolute heading error 0 - 180 [deg]:
+    FORWARD within tolerance, then turn speed 0 - 3 growing with the error.
+    """
+    levels = array("b")
+    for abs_diff in range(181):
+        if abs_diff <= tolerance_heading:
+            levels.append(FORWARD)
+        elif abs_diff <= tolerance_heading * 2:
+            levels.append(0)
+        elif abs_diff <= tolerance_heading * 8:
+            levels.append(1)
+        elif abs_diff <= tolerance_heading * 15:
+            levels.append(2)
+        else:
+            levels.append(3)
+    return levels
+
+
+class BangBangController:
+    """
+    Default steering controller, the level depends on the current heading error only.
+    """
+    def __init__(self, tolerance_heading=5):
+        self.levels = turn_levels(tolerance_heading)
+
+    def reset(self):
+        pass
+
+    def steer(self, diff):
+        """
+        diff: heading error -180 - 180 [deg], positive turns right.
+        Returns (signed error the level was taken for, level).
+        """
+        return diff, self.levels[abs(diff)]
+
+
+class LevelPIDController:
+    """
+    Level quantised PID steering controller on the heading error, integer math.
+    Called at the fixed Steering rate, so the time step is folded into the gains.
+    Gains are scaled by 100: kp_x100=150 is 1.5. The output is quantised by the
+    same level table as BangBangController, so the rover still either drives
+    straight or turns with one of the 4 turn speeds, forward speed and turn are
+    not blended like in differential drive (the motor driver offers only these
+    commands). The PID only picks the level: while the error shrinks quickly
+    the derivative term drops it to a gentle turn or straight drive before the
+    rover overshoots, a steady error is removed by the integral.
+    """
+    def __init__(self, kp_x100=100, ki_x100=0, kd_x100=200, tolerance_heading=5, integral_limit=3000):
+        self.kp_x100 = kp_x100
+        self.ki_x100 = ki_x100
+        self.kd_x100 = kd_x100
+        self.integral_limit = integral_limit     # Sum of errors [deg * steps].
+        self.levels = turn_levels(tolerance_heading)
+        self.integral = 0
+        self.previous_diff = None
+
+    def reset(self):
+        self.integral = 0
+        self.previous_diff = None
+
+    def steer(self, diff):
+        """
+        diff: heading error -180 - 180 [deg], positive turns right.
+        Returns (controller output [deg], level).
+        """
+        integral = self.integral + diff
+        if integral > self.integral_limit:
+            integral = self.integral_limit
+        elif integral < -self.integral_limit:
+            integral = -self.integral_limit
+        self.integral = integral
+
+        derivative = 0
+        if self.previous_diff is not None:
+            derivative = diff - self.previous_diff
+            # Error crossing +-180 is a small change, not a full turn.
+            if derivative > 180:
+                derivative -= 360
+            elif derivative < -180:
+                derivative += 360
+        self.previous_diff = diff
+
+        output = (self.kp_x100 * diff + self.ki_x100 * integral + self.kd_x100 * derivative) // 100
+        if output > 180:
+            output = 180
+        elif output < -180:
+            output = -180
+        return output, self.levels[abs(output)]
 
 
 class Movement:
     def __init__(self, motor_a = (27, 14), motor_b = (12, 13),
-                 tolerance_heading = 5, debug_print: bool = True) -> None:
+                 tolerance_heading = 5, debug_print: bool = True, controller=None) -> None:
         self.tolerance_heading = tolerance_heading
+        self.controller = controller or BangBangController(tolerance_heading)
         self.motors = None
         self.status = "S"   # S - Stop, L = Left, R - Right,F - Forward
         self.debug_print = debug_print
@@ -22,20 +131,11 @@ class Movement:
             self.logger.info(f"ERROR Motors not started: {e}")
             sys.exit(1)
 
-    def _turn_speed(self, abs_diff):
-        if self.tolerance_heading < abs_diff <= self.tolerance_heading * 2:
-            return 0
-        elif self.tolerance_heading * 2 < abs_diff <= self.tolerance_heading * 8:
-            return 1
-        elif self.tolerance_heading * 8 < abs_diff <= self.tolerance_heading * 15:
-            return 2
-        else:
-            return 3
-
     def move(self, current_heading, target_heading, stop):
         # Stop moving.
         if stop:
             self.status = "S"
+            self.controller.reset()
             self.motors.stop()
             self.motors.update()
             return
@@ -43,18 +143,14 @@ class Movement:
         # Normalize headings to 0-360 range
         actual_h = int(current_heading % 360)
         target_h = int(target_heading % 360)
-        diff = target_h - actual_h
 
-        # Normalize the <0 ; 360> range to <-180 ; 180> range.
-        if diff > 180:
-            diff -= 360
-        elif diff < -180:
-            diff += 360
+        # Difference in <-180 ; 180) range.
+        diff = (target_h - actual_h + 180) % 360 - 180
 
-        abs_diff = abs(diff)
+        output, turn_speed = self.controller.steer(diff)
 
-        # If the absolute value is withing acceptable margin, move forward.
-        if abs_diff <= self.tolerance_heading:
+        # If the controller keeps the heading, move forward.
+        if turn_speed == FORWARD:
             if self.debug_print:
                 self.logger.info(f"forward {actual_h} {target_h}")
             self.status = "F"
@@ -63,8 +159,7 @@ class Movement:
             return
 
         # Determine movement direction based on the sign.
-        turn_speed = self._turn_speed(abs_diff)
-        if diff > 0:
+        if output > 0:
             if self.debug_print:
                 self.logger.info(f"right {actual_h} {target_h} {turn_speed}")
             self.status = "R"
@@ -79,10 +174,78 @@ class Movement:
             self.motors.update()
 
 
+class Steering:
+    """
+    Fixed rate steering stage, step() is called every period by the Scheduler.
+    Each step samples the compass heading and steers against the cached target
+    bearing. The GNSS path only replaces the target with set_target() / stop(),
+    it does not wait for the compass or the motors.
+    """
+    def __init__(self, movement, read_heading):
+        self.movement = movement
+        self.read_heading = read_heading
+        self.target_heading = None      # Degrees, None - stopped.
+        self.heading = None             # Last sampled heading [deg].
+        self.target_updates = 0
+
+    def set_target(self, target_heading):
+        self.target_heading = target_heading
+        self.target_updates += 1
+
+    def stop(self):
+        self.target_heading = None
+
+    def step(self):
+        target_heading = self.target_heading
+        if target_heading is None:
+            self.movement.move(-1, -1, True)
+            return
+        self.heading = self.read_heading()
+        self.movement.move(self.heading, target_heading, False)
+
+
+class TrailFrame:
+    """
+    Trail waypoints compiled once into a local east/north frame.
+    The origin is the first waypoint and cos(lat) is fixed per trail,
+    so per fix only the rover position needs converting.
+    Offsets are stored as integer millimeters: [e0, n0, e1, n1, ...].
+    """
+    def __init__(self, origin_lon, origin_lat, cos_lat):
+        self.origin_lon = origin_lon    # microdegrees
+        self.origin_lat = origin_lat    # microdegrees
+        self.cos_lat = cos_lat          # cosine * 10000
+        self.offsets_mm = array("i")
+
+    def __len__(self):
+        return len(self.offsets_mm) // 2
+
+    def to_local(self, lon, lat):
+        """
+        Convert microdegrees to (east_mm, north_mm) relative to the origin.
+        1 microdegree = 111.3 mm, see Navigation.calculate_distance_bearing.
+        """
+        east_mm = ((lon - self.origin_lon) * self.cos_lat * 1113) // 100000
+        north_mm = ((lat - self.origin_lat) * 1113) // 10
+        return east_mm, north_mm
+
+    def append(self, lon, lat):
+        east_mm, north_mm = self.to_local(lon, lat)
+        self.offsets_mm.append(east_mm)
+        self.offsets_mm.append(north_mm)
+
+    def point(self, index):
+        return self.offsets_mm[2 * index], self.offsets_mm[2 * index + 1]
+
+
 class Navigation:
-    def __init__(self, i2c: I2C) -> None:
+    def __init__(self, i2c: I2C, trig_tables: bool = False) -> None:
         self.compass = None
         self.logger = get_logger()
+        if trig_tables:
+            # Every calculation uses the lookup table versions.
+            self.atan2_int = self.atan2_table
+            self.cos_int = self.cos_table
         try:
             self.compass = MinIMU9v6(i2c, calibrate=False)
         except Exception as e:
@@ -188,6 +351,62 @@ class Navigation:
 
         return cos_val * sign
 
+    def atan2_table(self, y, x):
+        """
+        Same as atan2_int, from ATAN_TABLE. Error below 0.02 deg.
+        Output: angle in degrees * 100 (0-35999)
+        """
+        if x == 0 and y == 0:
+            return 0
+        abs_y = abs(y)
+        abs_x = abs(x)
+        # Ratio of the smaller to the bigger side in 1/65536, table index and fraction in 1/256.
+        if abs_x >= abs_y:
+            ratio = (abs_y << 16) // abs_x
+        else:
+            ratio = (abs_x << 16) // abs_y
+        index = ratio >> 8
+        angle = ATAN_TABLE[index]
+        if index < TRIG_TABLE_STEPS:
+            angle += ((ATAN_TABLE[index + 1] - angle) * (ratio & 0xFF)) >> 8
+        if abs_x < abs_y:
+            angle = 9000 - angle
+
+        if x >= 0:
+            if y >= 0:
+                return angle
+            return 36000 - angle if angle else 0
+        if y >= 0:
+            return 18000 - angle
+        return 18000 + angle
+
+    def cos_table(self, lat_microdeg):
+        """
+        Same as cos_int, from COS_TABLE. Error below 0.0002.
+        Input: angle in microdegrees
+        Output: cosine * 10000
+        """
+        # Millidegrees, 0 - 360000.
+        mdeg = (lat_microdeg // 1000) % 360000
+        if mdeg <= 90000:
+            angle = mdeg
+            sign = 1
+        elif mdeg <= 180000:
+            angle = 180000 - mdeg
+            sign = -1
+        elif mdeg <= 270000:
+            angle = mdeg - 180000
+            sign = -1
+        else:
+            angle = 360000 - mdeg
+            sign = 1
+        position = angle * TRIG_TABLE_STEPS
+        index = position // 90000
+        cos_val = COS_TABLE[index]
+        if index < TRIG_TABLE_STEPS:
+            cos_val -= ((cos_val - COS_TABLE[index + 1]) * (position % 90000)) // 90000
+        return cos_val * sign
+
     def str_to_microdegrees(self, coord_str):
         """
         Convert coordinate string to microdegrees (degrees * 1,000,000)
@@ -261,3 +480,198 @@ class Navigation:
             bearing_x100 += 36000
 
         return dist_cm, bearing_x100//100, self.compass.get_tilt_compensated_heading()
+
+    def heading(self):
+        """Current compass heading [deg]."""
+        return self.compass.get_tilt_compensated_heading()
+
+    def _distance_bearing_local(self, lon, lat, frame, index):
+        east_mm, north_mm = frame.to_local(lon, lat)
+        target_east_mm, target_north_mm = frame.point(index)
+        x_mm = target_east_mm - east_mm
+        y_mm = target_north_mm - north_mm
+
+        dist_cm = (self.isqrt(x_mm * x_mm + y_mm * y_mm) + 5) // 10
+        bearing_x100 = self.atan2_int(x_mm, y_mm)
+        if bearing_x100 < 0:
+            bearing_x100 += 36000
+
+        return dist_cm, bearing_x100//100
+
+    def compile_waypoints(self, waypoints):
+        """Convert the waypoints window (see waypoints.Waypoints) into the local frame."""
+        if not waypoints.length:
+            return None
+        coords = waypoints.coords
+        frame = TrailFrame(coords[0], coords[1], self.cos_int(coords[1]))
+        for i in range(0, 2 * waypoints.length, 2):
+            frame.append(coords[i], coords[i + 1])
+        return frame
+
+    def distance_bearing_position(self, lon, lat, waypoints):
+        """
+        Distance and bearing to the current waypoint of waypoints.Waypoints, without reading the compass.
+        The position (e.g. from DeadReckoning) in microdegrees. The window is compiled into
+        the local frame again only after it changed.
+        Returns:
+            tuple: (distance_cm, bearing_deg)
+        """
+        if waypoints.frame is None:
+            waypoints.frame = self.compile_waypoints(waypoints)
+        return self._distance_bearing_local(lon, lat, waypoints.frame, waypoints.current_index())
+
+
+class DeadReckoning:
+    """
+    Rover position between GNSS fixes, integer math.
+    fix() stores the GNSS position with the speed over ground, predict() moves
+    it along the heading by speed * time since the fix, so the control loop
+    gets a fresh position at its own rate. Every new fix replaces the prediction,
+    the distance between them is kept in last_error_mm.
+    """
+    def __init__(self, navigation, max_age_ms=1000):
+        self.navigation = navigation
+        self.max_age_ms = max_age_ms    # Not extrapolated further when fixes stop coming.
+        self.lon = None                 # Last fix [microdeg], None - no fix yet.
+        self.lat = None
+        self.cos_lat = 10000            # cosine * 10000
+        self.speed_mm_s = 0
+        self.course = 0                 # Course over ground [deg].
+        self.fix_ms = 0
+        self.fix_time = None            # NMEA UTC time of the last fix.
+        self.fixes = 0
+        self.last_error_mm = 0
+
+    def fix(self, lon_str, lat_str, speed_knots_str, course_str, now_ms, fix_time=None):
+        """
+        New GNSS fix, NMEA strings as decoded by MicroNMEA.
+        fix_time: NMEA UTC time, a repeated epoch (GGA and RMC of one fix) is ignored
+        so it does not restart the prediction from the old position.
+        Returns True when the fix was taken.
+        """
+        if fix_time is not None and fix_time == self.fix_time:
+            return False
+        self.fix_time = fix_time
+        nav = self.navigation
+        lon = nav.str_to_microdegrees(lon_str)
+        lat = nav.str_to_microdegrees(lat_str)
+        if self.lat is not None:
+            predicted_lon, predicted_lat = self.predict(now_ms)
+            east_mm, north_mm = self._to_mm(lon - predicted_lon, lat - predicted_lat)
+            self.last_error_mm = nav.isqrt(east_mm * east_mm + north_mm * north_mm)
+        self.lon = lon
+        self.lat = lat
+        self.cos_lat = nav.cos_int(lat)
+        # 1 knot = 514.4 mm/s.
+        self.speed_mm_s = nav.str_to_microdegrees(speed_knots_str) * 5144 // 10000000 if speed_knots_str else 0
+        self.course = nav.str_to_microdegrees(course_str) // 1000000 if course_str else 0
+        self.fix_ms = now_ms
+        self.fixes += 1
+        return True
+
+    def _to_mm(self, dlon, dlat):
+        # 1 microdegree = 111.3 mm, see TrailFrame.to_local.
+        return (dlon * self.cos_lat * 1113) // 100000, (dlat * 1113) // 10
+
+    def predict(self, now_ms, heading=None):
+        """
+        Predicted (lon, lat) [microdeg], None before the first fix.
+        heading: compass heading [deg], the NMEA course when None.
+        """
+        if self.lat is None:
+            return None
+        age_ms = ticks_diff(now_ms, self.fix_ms)
+        if age_ms > self.max_age_ms:
+            age_ms = self.max_age_ms
+        dist_mm = self.speed_mm_s * age_ms // 1000
+        if dist_mm <= 0:
+            return self.lon, self.lat
+        angle = int(self.course if heading is None else heading) * 1000000
+        cos_int = self.navigation.cos_int
+        north_mm = dist_mm * cos_int(angle) // 10000
+        east_mm = dist_mm * cos_int(angle - 90000000) // 10000     # sin(a) = cos(a - 90)
+        dlat = north_mm * 10 // 1113
+        dlon = east_mm * 100000 // (self.cos_lat * 1113) if self.cos_lat else 0
+        return self.lon + dlon, self.lat + dlat
+
+
+class PathFollower:
+    """
+    Follows the trail as segments from the previous to the current waypoint (pure pursuit).
+    The rover steers to a look-ahead point lookahead_cm along the trail ahead of its
+    projection onto the active segment, so it converges on the line instead of aiming
+    at every waypoint. The segment is finished when the projection passes its end,
+    the waypoint radius is checked too, e.g. for the last waypoint.
+    Integer math in the local frame of the waypoints window [mm].
+    """
+    def __init__(self, navigation, lookahead_cm=100):
+        self.navigation = navigation
+        self.lookahead_mm = lookahead_cm * 10
+        self.cross_track_mm = 0     # Signed distance from the active segment, positive - right of it
+                                    # like geodesy.cross_track_errors in RTK Planner.
+
+    def update(self, lon, lat, waypoints, precision_cm):
+        """
+        lon, lat: rover position in microdegrees.
+        Advances waypoints past finished segments.
+        Returns (distance_cm to the current waypoint, bearing_deg to the look-ahead point),
+        None when the window has no current waypoint.
+        """
+        nav = self.navigation
+        while waypoints.has_current():
+            if waypoints.frame is None:
+                waypoints.frame = nav.compile_waypoints(waypoints)
+            frame = waypoints.frame
+            x, y = frame.to_local(lon, lat)
+            index = waypoints.current_index()
+            end_x, end_y = frame.point(index)
+            dist_mm = nav.isqrt((end_x - x) * (end_x - x) + (end_y - y) * (end_y - y))
+            if waypoints.previous is None:
+                # Trail start, straight to the first waypoint.
+                start_x, start_y = x, y
+            else:
+                start_x, start_y = frame.to_local(*waypoints.previous)
+            seg_x = end_x - start_x
+            seg_y = end_y - start_y
+            seg_sq = seg_x * seg_x + seg_y * seg_y
+            # Projection on the segment * segment length.
+            along = (x - start_x) * seg_x + (y - start_y) * seg_y
+            if dist_mm > precision_cm * 10 and (not seg_sq or along < seg_sq):
+                break
+            waypoints.advance()
+        else:
+            return None
+
+        if seg_sq:
+            seg_len = nav.isqrt(seg_sq)
+            self.cross_track_mm = (seg_y * (x - start_x) - seg_x * (y - start_y)) // seg_len
+            if along < 0:
+                along = 0
+            target_x = start_x + seg_x * along // seg_sq
+            target_y = start_y + seg_y * along // seg_sq
+        else:
+            self.cross_track_mm = 0
+            target_x, target_y = x, y
+
+        # Walk lookahead_mm along the trail from the projection.
+        remaining_mm = self.lookahead_mm
+        next_x, next_y = end_x, end_y
+        while True:
+            dx = next_x - target_x
+            dy = next_y - target_y
+            leg_mm = nav.isqrt(dx * dx + dy * dy)
+            if leg_mm >= remaining_mm:
+                if leg_mm:
+                    target_x += dx * remaining_mm // leg_mm
+                    target_y += dy * remaining_mm // leg_mm
+                break
+            remaining_mm -= leg_mm
+            target_x, target_y = next_x, next_y
+            index += 1
+            if index >= waypoints.length:
+                # End of the window, aim at its last waypoint.
+                break
+            next_x, next_y = frame.point(index)
+
+        bearing_x100 = nav.atan2_int(target_x - x, target_y - y)
+        return (dist_mm + 5) // 10, bearing_x100 // 100
@@ -1,7 +1,10 @@
+import select
 import socket
+from errno import EAGAIN, EINPROGRESS, ETIMEDOUT
 
 from esp32board import error_indicator_led
 from logger import get_logger
+from scheduler import sleep_ms, ticks_add, ticks_diff, ticks_ms
 
 try:
     import ubinascii as ubin
@@ -10,13 +13,17 @@ except:
 
 
 class NTRIPClient:
-    def __init__(self, host, port, mountpoint, username, password):
+    def __init__(self, host, port, mountpoint, username, password, read_timeout_s=10, connect_timeout_s=10):
         self.host = host
         self.port = port
         self.mountpoint = mountpoint
         self.username = username
         self.password = password
         self.socket = None
+        self.read_timeout_s = read_timeout_s    # 0 - reading does not wait for data.
+        self.connect_timeout_s = connect_timeout_s
+        self.address = None     # Resolved caster address, DNS lookup blocks.
+        self.pending = b""      # Stream data received together with the response header.
         self.ntrip_failures_counter = 0
         self.logger = get_logger()
 
@@ -24,60 +31,285 @@ class NTRIPClient:
         try:
             # Create socket connection
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.settimeout(10)
+            self.socket.settimeout(self.connect_timeout_s)
             self.socket.connect((self.host, self.port))
 
-            # Prepare authentication string
-            auth = ubin.b2a_base64(f"{self.username}:{self.password}".encode()).decode()
-
-            # Create NTRIP request
-            request = (
-                f"GET /{self.mountpoint} HTTP/1.0\r\n"
-                f"User-Agent: NTRIP PythonClient/1.0\r\n"
-                f"Accept: */*\r\n"
-                f"Authorization: Basic {auth}\r\n"
-                f"Connection: close\r\n"
-                f"\r\n"
-            )
-
             # Send request
-            self.socket.sendall(request.encode())
+            self.socket.sendall(self._request())
 
             # Check response
-            response = self.socket.recv(4096).decode()
-            if "ICY 200 OK" not in response:
-                raise ConnectionError(f"NTRIP Server responded with: {response}")
+            self._connected(self.socket.recv(4096))
+            return True
+
+        except Exception as e:
+            self._connect_failed(e)
+            return False
 
-            self.logger.info("NTRIP Successfully connected to server")
+    async def connect_async(self, poll_ms=20):
+        """
+        Same as connect, but waiting for the connection and the caster response
+        does not block other tasks. Only the first address lookup blocks,
+        the address is kept for reconnects.
+        """
+        deadline_ms = ticks_add(ticks_ms(), self.connect_timeout_s * 1000)
+        try:
+            if self.address is None:
+                self.address = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0][-1]
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setblocking(False)
+            try:
+                self.socket.connect(self.address)
+            except OSError as e:
+                if not e.args or e.args[0] not in (EINPROGRESS, EAGAIN):
+                    raise
+            await self._wait(select.POLLOUT, deadline_ms, poll_ms)
+            # Request fits into the empty socket buffer.
+            self.socket.send(self._request())
+            response = b""
+            while b"\r\n" not in response:
+                await self._wait(select.POLLIN, deadline_ms, poll_ms)
+                data = self.socket.recv(4096)
+                if not data:
+                    raise ConnectionError("NTRIP Server closed connection")
+                response += data
+            self._connected(response)
             return True
 
         except Exception as e:
-            self.logger.info(f"NTRIP Error connecting to server: {e}")
-            if self.socket:
-                self.socket.close()
+            self._connect_failed(e)
             return False
 
+    async def _wait(self, event, deadline_ms, poll_ms):
+        poller = select.poll()
+        poller.register(self.socket, event)
+        while True:
+            events = poller.poll(0)
+            if events:
+                if events[0][1] & (select.POLLERR | select.POLLHUP) and event == select.POLLOUT:
+                    raise ConnectionError("NTRIP Connection refused")
+                return
+            if ticks_diff(deadline_ms, ticks_ms()) <= 0:
+                raise OSError(ETIMEDOUT, "NTRIP Connection timed out")
+            await sleep_ms(poll_ms)
+
+    def _request(self):
+        # Prepare authentication string
+        auth = ubin.b2a_base64(f"{self.username}:{self.password}".encode()).decode()
+
+        # Create NTRIP request
+        return (
+            f"GET /{self.mountpoint} HTTP/1.0\r\n"
+            f"User-Agent: NTRIP PythonClient/1.0\r\n"
+            f"Accept: */*\r\n"
+            f"Authorization: Basic {auth}\r\n"
+            f"Connection: close\r\n"
+            f"\r\n"
+        ).encode()
+
+    def _connected(self, response):
+        # RTCM data may follow the header in the same read, kept for the first read.
+        status, _, data = response.partition(b"\r\n")
+        status = status.decode()
+        if "ICY 200 OK" not in status:
+            raise ConnectionError(f"NTRIP Server responded with: {status}")
+        if data.startswith(b"\r\n"):
+            data = data[2:]
+        elif b"\r\n\r\n" in data:
+            # Header lines after the status line.
+            data = data.split(b"\r\n\r\n", 1)[1]
+        self.pending = data
+        self.socket.settimeout(self.read_timeout_s)
+        self.logger.info("NTRIP Successfully connected to server")
+
+    def _connect_failed(self, e):
+        self.logger.info(f"NTRIP Error connecting to server: {e}")
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
     def read_data(self, buffer_size=1024):
         if not self.socket:
             self.logger.info("NTRIP Not connected to server")
             return
 
         data = None
+        if self.pending:
+            data, self.pending = self.pending[:buffer_size], self.pending[buffer_size:]
+            return data
 
         try:
             data = self.socket.recv(buffer_size)
             self.ntrip_failures_counter = 0
             error_indicator_led.stop_blinking()
+        except OSError as e:
+            # With short timeout no data is normal, not a failure.
+            if self.read_timeout_s < 1 and self._no_data(e):
+                return data
+            self._read_failed(e)
         except Exception as e:
-            self.ntrip_failures_counter += 1
-            if self.ntrip_failures_counter > 10:
-                error_indicator_led.start_blinking()
-            self.logger.info(f"NTRIP Error reading data: {e}")
-        finally:
-            return data
+            self._read_failed(e)
+        return data
+
+    def read_into(self, buffer):
+        """
+        Receive data directly into buffer (bytearray or memoryview slice).
+        Returns number of bytes received, None when no data is available,
+        0 when the server closed the connection.
+        """
+        if not self.socket:
+            return None
+        if self.pending:
+            received = min(len(buffer), len(self.pending))
+            buffer[:received] = self.pending[:received]
+            self.pending = self.pending[received:]
+            return received
+
+        try:
+            # MicroPython sockets provide readinto, CPython sockets recv_into.
+            if hasattr(self.socket, "readinto"):
+                received = self.socket.readinto(buffer)
+            else:
+                received = self.socket.recv_into(buffer)
+            if received:
+                self.ntrip_failures_counter = 0
+                error_indicator_led.stop_blinking()
+            elif received == 0:
+                self.logger.info("NTRIP Connection closed by server")
+                self.disconnect()
+            return received
+        except OSError as e:
+            if self.read_timeout_s < 1 and self._no_data(e):
+                return None
+            self._read_failed(e)
+        except Exception as e:
+            self._read_failed(e)
+        return None
+
+    def _no_data(self, e):
+        """Socket with short or no timeout raises error when there is nothing to read."""
+        return isinstance(e, BlockingIOError) or (e.args and e.args[0] in (EAGAIN, ETIMEDOUT))
+
+    def _read_failed(self, e):
+        self.ntrip_failures_counter += 1
+        if self.ntrip_failures_counter > 10:
+            error_indicator_led.start_blinking()
+        self.logger.info(f"NTRIP Error reading data: {e}")
+
+    def send_gga(self, sentence):
+        """Send rover position to the caster, required by VRS mountpoints."""
+        if not self.socket:
+            return False
+        try:
+            self.socket.send(f"{sentence}\r\n".encode())
+            return True
+        except Exception as e:
+            self.logger.info(f"NTRIP Error sending GGA: {e}")
+            return False
 
     def disconnect(self):
+        self.pending = b""
         if self.socket:
             self.socket.close()
             self.socket = None
             self.logger.info("NTRIP Disconnected from server")
+
+
+class NTRIPManager:
+    """
+    Keeps NTRIPClient stream alive.
+    Dead stream (closed by server or without data for stale_ms) is dropped
+    and maintain() retries the connection with exponential backoff. The attempt
+    is awaited, other tasks keep running while the caster answers.
+    Latest GGA sentence is sent upstream every gga_interval_ms (VRS mountpoints).
+    Provides read_into like NTRIPClient, so it plugs into RTCMForwarder.
+    """
+    def __init__(self, client, stale_ms=10000, gap_ms=2000, gga_interval_ms=10000,
+                 reconnect_min_ms=1000, reconnect_max_ms=60000):
+        self.client = client
+        self.stale_ms = stale_ms
+        self.gap_ms = gap_ms
+        self.gga_interval_ms = gga_interval_ms
+        self.reconnect_min_ms = reconnect_min_ms
+        self.reconnect_max_ms = reconnect_max_ms
+        self.reconnect_delay_ms = reconnect_min_ms
+        self.gga = None
+        now = ticks_ms()
+        self.next_connect_ms = now
+        self.last_data_ms = now
+        self.last_gga_ms = now
+        self.stats_ms = now
+        # Stream health metrics.
+        self.bytes_total = 0
+        self.bytes_window = 0
+        self.gaps = 0
+        self.reconnects = 0
+        self.logger = get_logger()
+
+    def set_gga(self, sentence):
+        self.gga = sentence
+
+    async def maintain(self):
+        """Reconnect the dropped stream when the backoff delay expired."""
+        if self.client.socket:
+            return
+        now = ticks_ms()
+        if ticks_diff(now, self.next_connect_ms) >= 0:
+            await self._connect(now)
+
+    def read_into(self, buffer):
+        now = ticks_ms()
+        if not self.client.socket:
+            return None
+
+        received = self.client.read_into(buffer)
+        if received:
+            if ticks_diff(now, self.last_data_ms) > self.gap_ms:
+                self.gaps += 1
+            self.last_data_ms = now
+            self.bytes_total += received
+            self.bytes_window += received
+            self.reconnect_delay_ms = self.reconnect_min_ms
+        elif received == 0 or not self.client.socket:
+            self._drop(now, "connection closed")
+            return None
+        elif ticks_diff(now, self.last_data_ms) > self.stale_ms:
+            self._drop(now, f"no data for {self.stale_ms} [ms]")
+            return None
+
+        if self.gga and ticks_diff(now, self.last_gga_ms) >= self.gga_interval_ms:
+            self.client.send_gga(self.gga)
+            self.last_gga_ms = now
+        return received
+
+    async def _connect(self, now):
+        if await self.client.connect_async():
+            self.reconnects += 1
+            now = ticks_ms()
+            self.last_data_ms = now
+            # Send position immediately, VRS caster waits for it before streaming.
+            if self.gga:
+                self.client.send_gga(self.gga)
+            self.last_gga_ms = now
+        else:
+            self._schedule_reconnect(now)
+
+    def _drop(self, now, reason):
+        self.logger.info(f"NTRIP Stream dead ({reason}), reconnect in {self.reconnect_delay_ms} [ms]")
+        error_indicator_led.start_blinking()
+        self.client.disconnect()
+        self._schedule_reconnect(now)
+
+    def _schedule_reconnect(self, now):
+        self.next_connect_ms = ticks_add(now, self.reconnect_delay_ms)
+        self.reconnect_delay_ms = min(self.reconnect_delay_ms * 2, self.reconnect_max_ms)
+
+    def stats(self):
+        """Stream health since the previous call."""
+        now = ticks_ms()
+        elapsed_ms = ticks_diff(now, self.stats_ms)
+        bytes_per_s = self.bytes_window * 1000 // elapsed_ms if elapsed_ms > 0 else 0
+        self.stats_ms = now
+        self.bytes_window = 0
+        return (f"NTRIP {bytes_per_s} [B/s] total {self.bytes_total} [B] "
+                f"gaps {self.gaps} reconnects {self.reconnects} "
+                f"age {ticks_diff(now, self.last_data_ms)} [ms]")
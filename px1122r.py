@@ -7,44 +7,99 @@ except:
 
 
 class PX1122RUART:
+    """
+    UART link to PX1122R receiver.
+    Received bytes are read into one preallocated buffer and framed
+    in bulk: every complete NMEA sentence with valid checksum is returned,
+    the incomplete tail is kept for the next call.
+    """
     def __init__(self, uart_id=2, baud_rate=115200, buffer_size=1024):
         self.uart = UART(uart_id, baudrate=baud_rate, rxbuf=buffer_size, txbuf=buffer_size)
-        self.message_buffer = bytearray()
-        self.receiving_message = False
+        self.rx_buffer = bytearray(buffer_size)
+        self.rx_view = memoryview(self.rx_buffer)
+        self.rx_len = 0
+        self.checksum_errors = 0
+        self.overflows = 0
         self.logger = get_logger()
 
     def send_data(self, data_to_send):
+        """Returns number of bytes written, UART may accept only part of the data."""
         if data_to_send:
             # Send NTRIP data to UART.
-            self.uart.write(data_to_send)
+            return self.uart.write(data_to_send) or 0
+        return 0
 
     def process_received_data(self):
-        if self.uart.any():  # Check if data available.
-            try:
-                # Read available bytes (non-blocking).
-                data = self.uart.read()
-
-                if data:
-                    for byte in data:
-                        if byte == ord("$"):
-                            # Start of new message.
-                            self.message_buffer = bytearray([byte])
-                            self.receiving_message = True
-                        elif self.receiving_message:
-                            self.message_buffer.append(byte)
-                            if byte == ord("\n"):
-                                # Message complete.
-                                message = bytes(self.message_buffer)
-                                self.receiving_message = False
-                                self.message_buffer = bytearray()
-                                return message.decode("utf-8")[:-2]
-
-                        # Protection against buffer overflow
-                        if len(self.message_buffer) > 1024:
-                            self.message_buffer = bytearray()
-                            self.receiving_message = False
-            except Exception as e:
-                self.logger.info(f"Error processing UART data: {e}")
-                self.message_buffer = bytearray()
-                self.receiving_message = False
-        return None
+        """
+        Read available UART bytes and frame NMEA sentences.
+        Returns list of sentences (str without "\\r\\n"), empty if none is complete.
+        """
+        sentences = []
+        if not self.uart.any():  # Check if data available.
+            return sentences
+        try:
+            # Read available bytes (non-blocking) behind the kept tail.
+            received = self.uart.readinto(self.rx_view[self.rx_len:])
+            if received:
+                self.rx_len += received
+
+            buf = self.rx_buffer
+            start = 0
+            while True:
+                start = buf.find(b"$", start, self.rx_len)
+                if start < 0:
+                    # No sentence start, drop the garbage.
+                    start = self.rx_len
+                    break
+                end = buf.find(b"\n", start, self.rx_len)
+                if end < 0:
+                    # Sentence not complete yet.
+                    break
+                # Sentence corrupted by lost bytes starts again at the last "$".
+                start = buf.rfind(b"$", start, end)
+                stop = end - 1 if buf[end - 1] == 0x0D else end
+                if self._checksum_ok(start, stop):
+                    sentences.append(str(self.rx_view[start:stop], "ascii"))
+                else:
+                    self.checksum_errors += 1
+                start = end + 1
+
+            # Move the incomplete tail to the beginning of the buffer.
+            remaining = self.rx_len - start
+            if remaining == len(buf):
+                # Protection against buffer overflow.
+                self.overflows += 1
+                remaining = 0
+            elif remaining and start:
+                self.rx_view[:remaining] = self.rx_view[start:self.rx_len]
+            self.rx_len = remaining
+        except Exception as e:
+            self.logger.info(f"Error processing UART data: {e}")
+            self.rx_len = 0
+        return sentences
+
+    def _checksum_ok(self, start, stop):
+        """
+        Verify "*hh" checksum of sentence rx_buffer[start:stop].
+        Sentence without checksum field is accepted.
+        """
+        buf = self.rx_buffer
+        star = buf.find(b"*", start, stop)
+        if star < 0:
+            return True
+        if stop - star != 3:
+            return False
+        checksum = 0
+        for byte in self.rx_view[start + 1:star]:
+            checksum ^= byte
+        return checksum == (self._hex_value(buf[star + 1]) << 4 | self._hex_value(buf[star + 2]))
+
+    @staticmethod
+    def _hex_value(char):
+        if 0x30 <= char <= 0x39:    # 0-9
+            return char - 0x30
+        if 0x41 <= char <= 0x46:    # A-F
+            return char - 0x37
+        if 0x61 <= char <= 0x66:    # a-f
+            return char - 0x57
+        return -256
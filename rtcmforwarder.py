@@ -0,0 +1,107 @@
+from logger import get_logger
+
+
+RTCM3_PREAMBLE = 0xD3
+RTCM3_OVERHEAD = 6      # Preamble, 2 bytes length, 3 bytes CRC.
+
+
+class RTCMForwarder:
+    """
+    Forward correction data from NTRIP client to GNSS receiver UART.
+    Data is received into one preallocated buffer and written to UART
+    with memoryview slices, partial UART writes are continued in the next call.
+    With frame_aligned only complete RTCM3 frames are written, bytes
+    between frames are dropped.
+
+    Buffer layout: [0:sent] written, [sent:ready] to write, [ready:length] incomplete frame.
+    """
+    def __init__(self, ntrip_client, gps_uart, buffer_size=2048, frame_aligned=True):
+        self.ntrip_client = ntrip_client
+        self.gps_uart = gps_uart
+        self.frame_aligned = frame_aligned
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.length = 0
+        self.ready = 0
+        self.sent = 0
+        self.bytes_received = 0
+        self.bytes_forwarded = 0
+        self.bytes_dropped = 0
+        self.frames = 0
+        self.logger = get_logger()
+
+    def forward(self):
+        """
+        Write pending data, receive new data and write complete frames.
+        Returns number of bytes received.
+        """
+        if not self._write_pending():
+            # UART is busy, keep the data in buffer.
+            return 0
+
+        # Everything is written, reuse the buffer from the beginning.
+        if self.sent:
+            remaining = self.length - self.sent
+            if remaining:
+                self.view[:remaining] = self.view[self.sent:self.length]
+            self.length = remaining
+            self.ready = 0
+            self.sent = 0
+
+        received = self.ntrip_client.read_into(self.view[self.length:])
+        if not received:
+            return 0
+        self.length += received
+        self.bytes_received += received
+
+        if self.frame_aligned:
+            self._find_frames()
+        else:
+            self.ready = self.length
+
+        if self.length == len(self.buffer) and self.ready == 0:
+            # Frame longer than buffer, cannot be forwarded.
+            self.bytes_dropped += self.length
+            self.length = 0
+
+        self._write_pending()
+        return received
+
+    def _write_pending(self):
+        """Returns True if all complete data is written."""
+        if self.sent < self.ready:
+            written = self.gps_uart.send_data(self.view[self.sent:self.ready])
+            self.sent += written
+            self.bytes_forwarded += written
+        return self.sent == self.ready
+
+    def _find_frames(self):
+        buf = self.buffer
+        pos = self.ready
+        while pos < self.length:
+            if buf[pos] != RTCM3_PREAMBLE or (pos + 1 < self.length and buf[pos + 1] & 0xFC):
+                # Not a frame start, drop bytes up to the next preamble.
+                start = buf.find(b"\xd3", pos + 1, self.length)
+                if start < 0:
+                    start = self.length
+                self._drop(pos, start)
+                continue
+            if pos + 3 > self.length:
+                break
+            frame_end = pos + (((buf[pos + 1] & 0x03) << 8) | buf[pos + 2]) + RTCM3_OVERHEAD
+            if frame_end > self.length:
+                break
+            pos = frame_end
+            self.frames += 1
+        self.ready = pos
+
+    def _drop(self, start, end):
+        remaining = self.length - end
+        if remaining:
+            self.view[start:start + remaining] = self.view[end:self.length]
+        self.length -= end - start
+        self.bytes_dropped += end - start
+
+    def stats(self):
+        return (f"RTCM received {self.bytes_received} forwarded {self.bytes_forwarded} "
+                f"dropped {self.bytes_dropped} [B] frames {self.frames}")
@@ -1,34 +1,229 @@
 import json
+import select
+import socket
+import struct
 import time
+from errno import EAGAIN, EINPROGRESS, ETIMEDOUT
 
 import urequests
 
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
 from esp32board import error_indicator_led
 from logger import get_logger
+from waypoints import Waypoints
+
+try:
+    import ubinascii as ubin
+except:
+    import binascii as ubin
+
+
+# Binary GNSS frame sent to "/rover/update_gps_bin". Must match RTK_Planner/app.py.
+# Header: version, frame length, mac, lat [microdeg], lon [microdeg], fix status code,
+#         speed [knots * 100], course [deg * 100], time UTC [HHMMSS * 1000 + ms].
+# Then per GNSS system in use: 2 chars system name, satellites count, satellite numbers.
+GNSS_FRAME_VERSION = 1
+GNSS_FRAME_HEADER = "<BB6siiBHHI"
+GNSS_FRAME_HEADER_SIZE = struct.calcsize(GNSS_FRAME_HEADER)
+GNSS_FRAME_MAX_SIZE = 255
+GNSS_FRAME_NO_POSITION = -0x80000000    # lat and lon before the first fix.
+GNSS_FRAME_NO_TIME = 0xFFFFFFFF         # UTC time before the receiver has it, 000000.000 is midnight.
+# Index is the fix status code (GGA quality indicator), 255 is unknown.
+FIX_STATUS = ("Invalid", "SPS Fix", "DGPS Fix", "PPS Fix", "RTK Fix",
+              "RTK Float", "Estimated", "Manual", "Simulation")
+
+# Paged trail download, the rover keeps only a window of upcoming waypoints.
+TRAIL_PAGE_SIZE = 16        # Waypoints per request.
+TRAIL_WINDOW_SIZE = 48      # Waypoints kept in RAM, multiple of page size.
+
+
+def scaled_int(value, decimals):
+    """
+    Convert decimal string to integer scaled by 10**decimals without float.
+    Example: ("51.7059096", 6) -> 51705909
+    """
+    if not value:
+        return 0
+    value = str(value)
+    whole, _, fraction = value.lstrip("+-").partition(".")
+    result = int(whole or "0") * 10 ** decimals + int((fraction + "0" * decimals)[:decimals])
+    return -result if value[0] == "-" else result
+
+
+class TelemetryChannel:
+    """
+    Persistent TCP connection to the RTK Planner telemetry ingest.
+    GNSS frames are collected in one preallocated buffer and written in batches.
+    The socket is non-blocking, called from the NMEA task it must not wait:
+    the connection is completed and partial writes are continued by later
+    add() / poll() calls. Only the first address lookup blocks, the address
+    is kept for reconnects. Broken connection is reopened with exponential
+    backoff, the unsent batch is dropped.
+
+    Buffer layout: [0:sent] written, [sent:length] to write.
+    """
+    def __init__(self, host, port, batch_size=5, max_delay_ms=500, buffer_size=1024,
+                 reconnect_min_ms=1000, reconnect_max_ms=30000, timeout_s=0.5):
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.max_delay_ms = max_delay_ms
+        self.reconnect_min_ms = reconnect_min_ms
+        self.reconnect_max_ms = reconnect_max_ms
+        self.timeout_s = timeout_s      # Limit for the connection to complete.
+        self.address = None
+        self.socket = None
+        self.poller = None
+        self.connecting = False
+        self.connect_started_ms = 0
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.length = 0
+        self.sent = 0
+        self.frames = 0                 # Frames not completely written.
+        self.first_frame_ms = 0
+        self.reconnect_delay_ms = reconnect_min_ms
+        self.next_connect_ms = time.ticks_ms()
+        self.dropped_frames = 0
+        self.reconnects = 0
+        self.logger = get_logger()
+
+    def connect(self):
+        """Start the connection, returns False before the backoff delay expired or on error."""
+        if time.ticks_diff(time.ticks_ms(), self.next_connect_ms) < 0:
+            return False
+        try:
+            if self.address is None:
+                self.address = socket.getaddrinfo(self.host, self.port)[0][-1]
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setblocking(False)
+            try:
+                self.socket.connect(self.address)
+            except OSError as e:
+                if not e.args or e.args[0] not in (EINPROGRESS, EAGAIN):
+                    raise
+            self.poller = select.poll()
+            self.poller.register(self.socket, select.POLLOUT)
+            self.connecting = True
+            self.connect_started_ms = time.ticks_ms()
+            return True
+        except Exception as e:
+            self._failed("connection failed", e)
+            return False
+
+    def _writable(self):
+        """True when connected, False while still connecting. Raises when the connection failed."""
+        if not self.connecting:
+            return True
+        events = self.poller.poll(0)
+        if events:
+            if events[0][1] & (select.POLLERR | select.POLLHUP):
+                raise OSError("Connection refused")
+            self.connecting = False
+            self.reconnect_delay_ms = self.reconnect_min_ms
+            self.reconnects += 1
+            self.logger.info("Telemetry connected.")
+            return True
+        if time.ticks_diff(time.ticks_ms(), self.connect_started_ms) > self.timeout_s * 1000:
+            raise OSError(ETIMEDOUT, "Connection timed out")
+        return False
+
+    def _failed(self, reason, e):
+        self.logger.info(f"Telemetry {reason}, retry in {self.reconnect_delay_ms} [ms]: {e}")
+        self.close()
+        self.next_connect_ms = time.ticks_add(time.ticks_ms(), self.reconnect_delay_ms)
+        self.reconnect_delay_ms = min(self.reconnect_delay_ms * 2, self.reconnect_max_ms)
+
+    def close(self):
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+        self.poller = None
+        self.connecting = False
+
+    def add(self, frame):
+        size = len(frame)
+        if self.length + size > len(self.buffer):
+            self.flush()
+            if self.length + size > len(self.buffer):
+                # Connection cannot keep up, drop the oldest frames.
+                if self.sent:
+                    # Rest of a partially written frame would break the stream.
+                    self.close()
+                self._drop()
+        if self.frames == 0:
+            self.first_frame_ms = time.ticks_ms()
+        self.view[self.length:self.length + size] = frame
+        self.length += size
+        self.frames += 1
+        if self.frames >= self.batch_size:
+            self.flush()
+
+    def poll(self):
+        """
+        Flush the batch if its oldest frame waits longer than max_delay_ms,
+        continue a started connection or a partial write.
+        """
+        if self.frames and (self.sent or self.connecting
+                            or time.ticks_diff(time.ticks_ms(), self.first_frame_ms) >= self.max_delay_ms):
+            self.flush()
+
+    def flush(self):
+        """Write what the socket accepts, the rest stays in the buffer."""
+        if not self.frames:
+            return
+        if not self.socket and not self.connect():
+            self._drop()
+            return
+        try:
+            if not self._writable():
+                return
+            while self.sent < self.length:
+                try:
+                    sent = self.socket.send(self.view[self.sent:self.length])
+                except OSError as e:
+                    if e.args and e.args[0] == EAGAIN:
+                        return
+                    raise
+                if not sent:
+                    return
+                self.sent += sent
+        except Exception as e:
+            self._failed("send failed", e)
+            self._drop()
+            return
+        self.length = 0
+        self.sent = 0
+        self.frames = 0
+
+    def _drop(self):
+        self.dropped_frames += self.frames
+        self.length = 0
+        self.sent = 0
+        self.frames = 0
 
 
 class RTKPlanner:
-    # Data structure to send to RTK Planner.
-    gps_data = {
-        "mac": None,
-        "fix_status": "Unknowsn",
-        "latitude": None,
-        "longitude": None,
-        "lat_raw": None,
-        "lon_raw": None,
-        "speed": None,
-        "course": None,
-        "time_utc": None,
-        "last_update": None,
-        "sv": None,
-        "su": None
-    }
-
-    def __init__(self, host: str, port: str, mac):
+    def __init__(self, host: str, port: str, mac, telemetry_port=None):
         self.url = f"http://{host}:{port}"
+        self.host = host
+        self.port = int(port)
         self.mac = mac
+        self.applied_version = 0        # Version of the last applied server command.
         self.target_precision_cm = 0
-        self.trail_points = []
+        self.waypoints = Waypoints(TRAIL_WINDOW_SIZE)     # Window of upcoming waypoints.
+        self.trail_version = 0          # Command version of the paged trail, 0 - no pages to download.
+        self.trail_page_pending = False  # Page request in progress, one at a time.
+        self.frame_buffer = bytearray(GNSS_FRAME_MAX_SIZE)    # Reused for every GNSS frame.
+        self.frame_view = memoryview(self.frame_buffer)
+        self.mac_bytes = ubin.unhexlify(mac) if mac else b""
+        # Without telemetry port GNSS frames are sent with one HTTP request each.
+        self.telemetry = TelemetryChannel(host, telemetry_port) if telemetry_port else None
+        self.gnss_update = None         # Latest frame waiting for the HTTP request, without telemetry.
         self.logger = get_logger()
 
     def register(self):
@@ -51,35 +246,182 @@ class RTKPlanner:
                 self.logger.info(f"Failed to send mac {self.mac}: {e}")
             time.sleep(2)
 
-    def get_trails(self):
+    async def poll_trails(self, wait_s=20):
+        """
+        Long poll of the rover command mailbox. Server answers as soon as a new
+        command is posted, or with 204 after wait_s. Applied command is acknowledged,
+        a command version is applied only once.
+        Trail waypoints are not part of the command, they are downloaded in pages.
+        """
+        try:
+            status, body = await self._http_request(
+                "GET", f"/trail/upload/{self.mac}?version={self.applied_version}&wait={wait_s}&paged=1",
+                wait_s + 5)
+            if status != 200:
+                return False
+            data = json.loads(body)
+            del body
+            version = int(data.get("version", 0))
+            if version > self.applied_version:
+                if "total" in data:
+                    self._start_paged_trail(version, int(data["total"]), int(data.get("precision") or 0))
+                    await self.fill_trail_window()
+                else:
+                    # Server without paging.
+                    self._apply_trail(data)
+                self.applied_version = version
+            await self._http_request("POST", f"/trail/ack/{self.mac}/{version}", 5)
+            return True
+        except Exception as e:
+            self.logger.info(f"Error polling trails {e}")
+            return False
+
+    def _start_paged_trail(self, version, total, precision):
+        if self.waypoints.capacity > TRAIL_WINDOW_SIZE:
+            # Free the window of the last whole trail.
+            self.waypoints = Waypoints(TRAIL_WINDOW_SIZE)
+        self.target_precision_cm = precision
+        self.trail_version = version if total else 0
+        self.waypoints.clear(total)
+        self.logger.info(f"Received new trail {version}, waypoints: {total}.")
+
+    async def fill_trail_window(self):
+        """
+        Download the next page when there is space for it in the window.
+        Reached waypoints are dropped from the window.
+        """
+        waypoints = self.waypoints
+        next_offset = waypoints.end()
+        if (self.trail_page_pending or not self.trail_version or next_offset >= waypoints.total
+                or waypoints.free() < TRAIL_PAGE_SIZE):
+            return False
+        count = TRAIL_PAGE_SIZE
+        version = self.trail_version
+        self.trail_page_pending = True
         try:
-            # Make HTTP GET request to Flask server
-            response = urequests.get(self.url + "/trail/upload")
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('mac') == self.mac:
-                    self.target_precision_cm = int(data.get('precision'))
-                    self.trail_points = json.loads(data.get('trail_points').replace("'", "\""))
-                    self.logger.info(f"Received new trails: {self.trail_points}.")
-            response.close()
+            status, body = await self._http_request(
+                "GET", f"/trail/page/{self.mac}/{version}?offset={next_offset}&count={count}", 5)
         except Exception as e:
-            self.logger.info(f"Error getting trails {e}")
+            self.logger.info(f"Error getting trail page {e}")
+            return False
+        finally:
+            self.trail_page_pending = False
+        if version != self.trail_version:
+            # Replaced by a new trail while waiting.
+            return False
+        if status == 409:
+            # Trail replaced or stopped on the server, the new command comes with the long poll.
+            self._start_paged_trail(version, 0, self.target_precision_cm)
+            return False
+        if status != 200:
+            return False
+        # The window changes only here, between awaits, the control task sees it consistent.
+        waypoints.compact()
+        for lon, lat in json.loads(body)["points"]:
+            waypoints.append(lon, lat)
+        return True
+
+    async def _http_request(self, method, path, timeout_s, body=b"", content_type="application/octet-stream"):
+        """
+        Minimal HTTP/1.0 request on asyncio streams, urequests would block the
+        scheduler for the whole long poll. Returns (status code, body).
+        """
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout_s)
+        try:
+            header = f"{method} {path} HTTP/1.0\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+            if body:
+                header += f"Content-Type: {content_type}\r\n"
+            writer.write(header.encode() + b"\r\n")
+            if body:
+                writer.write(body)
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), timeout_s)
+            status = int(status_line.split(None, 2)[1])
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout_s)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            body = await asyncio.wait_for(reader.read(-1), timeout_s)
+            return status, body
+        finally:
+            writer.close()
+
+    def _apply_trail(self, data):
+        """Whole trail in one response, the window is sized for all waypoints."""
+        self.target_precision_cm = int(data.get('precision') or 0)
+        trail_points = data.get('trail_points') or "[]"
+        if isinstance(trail_points, str):
+            trail_points = json.loads(trail_points.replace("'", "\""))
+        self.waypoints = Waypoints(max(len(trail_points), TRAIL_WINDOW_SIZE))
+        self.waypoints.clear(len(trail_points))
+        for lon, lat in trail_points:
+            self.waypoints.append(scaled_int(lon, 6), scaled_int(lat, 6))
+        self.trail_version = 0
+        self.logger.info(f"Received new trails: {trail_points}.")
+
+    def has_trail(self):
+        """True when the current waypoint is in the window."""
+        return self.waypoints.has_current()
+
+    def current_trail_point(self):
+        """Current waypoint (lon, lat) in microdegrees."""
+        return self.waypoints.current()
+
+    def next_trail_point(self):
+        self.waypoints.advance()
+
+    def gnss_frame(self, nmea_data):
+        """
+        Pack NMEA data into the reused binary frame buffer.
+        Returns memoryview of the frame.
+        """
+        status = nmea_data.quality
+        status_code = FIX_STATUS.index(status) if status in FIX_STATUS else 255
+        buf = self.frame_buffer
+        size = GNSS_FRAME_HEADER_SIZE
+        for system, satellites in (nmea_data.satellites_used or {}).items():
+            count_pos = size + 2
+            if count_pos >= GNSS_FRAME_MAX_SIZE:
+                break
+            buf[size:count_pos] = (system + "  ")[:2].encode()
+            size = count_pos + 1
+            for satellite in satellites:
+                if satellite and satellite.isdigit() and size < GNSS_FRAME_MAX_SIZE:
+                    buf[size] = int(satellite) & 0xFF
+                    size += 1
+            buf[count_pos] = size - count_pos - 1
+        struct.pack_into(GNSS_FRAME_HEADER, buf, 0,
+                         GNSS_FRAME_VERSION,
+                         size,
+                         self.mac_bytes,
+                         scaled_int(nmea_data.lat, 6) if nmea_data.lat else GNSS_FRAME_NO_POSITION,
+                         scaled_int(nmea_data.lon, 6) if nmea_data.lon else GNSS_FRAME_NO_POSITION,
+                         status_code,
+                         min(scaled_int(nmea_data.speed, 2), 0xFFFF),
+                         min(scaled_int(nmea_data.course, 2), 0xFFFF),
+                         scaled_int(nmea_data.time, 3) if nmea_data.time else GNSS_FRAME_NO_TIME)
+        return self.frame_view[:size]
 
     def send_gnss_update(self, nmea_data):
-        self.gps_data["latitude"] = nmea_data.lat
-        self.gps_data["longitude"] = nmea_data.lon
-        self.gps_data["fix_status"] = nmea_data.quality
-        self.gps_data["speed"] = nmea_data.speed
-        self.gps_data["course"] = nmea_data.course
-        self.gps_data["time_utc"] = nmea_data.time
-        self.gps_data["sv"] = nmea_data.gsv_data
-        self.gps_data["su"] = nmea_data.satellites_used
-        self.gps_data["mac"] = self.mac
+        """
+        Queue the GNSS update, nothing is sent here. Without telemetry only
+        the latest frame is kept for the next flush_gnss_updates.
+        """
+        if self.telemetry:
+            self.telemetry.add(self.gnss_frame(nmea_data))
+        else:
+            self.gnss_update = bytes(self.gnss_frame(nmea_data))
+
+    async def flush_gnss_updates(self, timeout_s=1):
+        """Send waiting GNSS updates, the HTTP request is awaited without blocking other tasks."""
+        if self.telemetry:
+            self.telemetry.poll()
+            return
+        frame = self.gnss_update
+        if frame is None:
+            return
+        self.gnss_update = None
         try:
-            response = urequests.post(self.url + "/rover/update_gps",
-                                      headers={"Content-Type": "application/json"},
-                                      json=json.dumps(self.gps_data),
-                                      timeout=1)
-            response.close()
+            await self._http_request("POST", "/rover/update_gps_bin", timeout_s, frame)
         except Exception as e:
             self.logger.info(f"Failed to send data: {e}")
@@ -0,0 +1,108 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+try:
+    from time import ticks_add, ticks_diff, ticks_ms
+except ImportError:
+    # CPython shim, used by tests.
+    import time
+
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+from logger import get_logger
+
+
+async def sleep_ms(ms):
+    if hasattr(asyncio, "sleep_ms"):
+        await asyncio.sleep_ms(ms)
+    else:
+        await asyncio.sleep(ms / 1000)
+
+
+class PeriodicTask:
+    """
+    Function called every period_ms by the Scheduler.
+    The function may be a plain function or a coroutine function.
+    Keeps deadline accounting:
+        overruns - runs taking longer than deadline_ms,
+        missed - periods skipped because the previous run ended too late.
+    """
+    def __init__(self, name, period_ms, func, deadline_ms=None):
+        self.name = name
+        self.period_ms = period_ms
+        self.deadline_ms = deadline_ms if deadline_ms is not None else period_ms
+        self.func = func
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0
+        self.missed = 0
+        self.max_duration_ms = 0
+        self.total_duration_ms = 0
+        self.logger = get_logger()
+
+    async def run_forever(self):
+        next_run_ms = ticks_ms()
+        while True:
+            await self.run_once()
+            next_run_ms = ticks_add(next_run_ms, self.period_ms)
+            delay_ms = ticks_diff(next_run_ms, ticks_ms())
+            if delay_ms < 0:
+                # Too late for this slot, start again from now.
+                self.missed += 1
+                next_run_ms = ticks_ms()
+                delay_ms = 0
+            await sleep_ms(delay_ms)
+
+    async def run_once(self):
+        start_ms = ticks_ms()
+        try:
+            result = self.func()
+            if hasattr(result, "send"):
+                await result
+        except Exception as e:
+            self.errors += 1
+            self.logger.error(f"Task {self.name} error: {e}")
+        duration_ms = ticks_diff(ticks_ms(), start_ms)
+        self.runs += 1
+        self.total_duration_ms += duration_ms
+        if duration_ms > self.max_duration_ms:
+            self.max_duration_ms = duration_ms
+        if duration_ms > self.deadline_ms:
+            self.overruns += 1
+
+    def stats(self):
+        avg_ms = self.total_duration_ms // self.runs if self.runs else 0
+        return (f"{self.name}: runs {self.runs} avg {avg_ms} max {self.max_duration_ms} [ms] "
+                f"overruns {self.overruns} missed {self.missed} errors {self.errors}")
+
+
+class Scheduler:
+    """
+    Cooperative scheduler running periodic tasks on uasyncio (asyncio on CPython).
+    Tasks must not block: a task waiting for I/O delays all other tasks.
+    """
+    def __init__(self):
+        self.tasks = []
+
+    def add(self, name, period_ms, func, deadline_ms=None):
+        task = PeriodicTask(name, period_ms, func, deadline_ms)
+        self.tasks.append(task)
+        return task
+
+    def stats(self):
+        return "; ".join(task.stats() for task in self.tasks)
+
+    async def main(self):
+        await asyncio.gather(*[task.run_forever() for task in self.tasks])
+
+    def run(self):
+        asyncio.run(self.main())
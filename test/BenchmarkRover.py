@@ -0,0 +1,281 @@
+"""
+Benchmark of the rover hot path under CPython.
+
+Usage:
+    python test/BenchmarkRover.py                 # run and compare with baseline
+    python test/BenchmarkRover.py --save          # run and store new baseline
+    python test/BenchmarkRover.py --filter nav    # run benchmarks containing "nav"
+
+Reports ops/s, allocated bytes per call and latency percentiles.
+Baseline is stored in benchmark_baseline.json next to this file. It is
+machine specific, save it on the machine used for comparison.
+Exit code is 1 when any benchmark is slower than baseline by more than --tolerance.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from unittest.mock import MagicMock, Mock, patch
+
+
+class MockPrecise:
+    def __init__(self, coord_str):
+        parts = coord_str.split('.')
+        self.whole_part_with_sign = parts[0]
+        if len(parts) > 1:
+            self.decimal_part = parts[1][:10].ljust(10, '0')
+        else:
+            self.decimal_part = '0000000000'
+
+
+# Mock MicroPython modules, same as test/TestNavigationNavigation.py.
+sys.modules['machine'] = MagicMock()
+sys.modules['logger'] = MagicMock()
+sys.modules['microIMU9v6'] = MagicMock()
+sys.modules['microIMU9v6.imu9v6'] = MagicMock()
+sys.modules['microMX1508'] = MagicMock()
+sys.modules['microMX1508.microMX1508'] = MagicMock()
+mock_microNMEA = MagicMock()
+mock_microNMEA_microNMEA = MagicMock()
+mock_microNMEA_microNMEA.Precise = MockPrecise
+sys.modules['microNMEA'] = mock_microNMEA
+sys.modules['microNMEA.microNMEA'] = mock_microNMEA_microNMEA
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from navigation import DeadReckoning, Movement, Navigation, PathFollower, LevelPIDController, Steering
+from px1122r import PX1122RUART
+from waypoints import Waypoints
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def nmea(body):
+    checksum = 0
+    for char in body.encode():
+        checksum ^= char
+    return f"${body}*{checksum:02X}\r\n"
+
+
+def nmea_stream(epochs=10):
+    """Synthetic 10 Hz multi-constellation output, GGA+RMC+GSA+GSV per epoch."""
+    data = ""
+    for epoch in range(epochs):
+        t = f"1235{epoch // 10:02d}.{epoch % 10}0"
+        data += nmea(f"GNGGA,{t},5142.35457,N,01924.69306,E,4,24,0.6,210.3,M,34.1,M,1.0,0000")
+        data += nmea(f"GNRMC,{t},A,5142.35457,N,01924.69306,E,0.012,271.50,180126,,,R,V")
+        data += nmea("GNGSA,A,3,05,12,13,15,18,20,24,25,29,,,,1.1,0.6,0.9,1")
+        data += nmea("GNGSA,A,3,65,66,72,73,74,80,81,,,,,,1.1,0.6,0.9,2")
+        for msg in range(1, 4):
+            data += nmea(f"GPGSV,3,{msg},12,05,45,120,42,12,30,240,38,13,60,60,45,15,10,300,30,0")
+        for msg in range(1, 3):
+            data += nmea(f"GLGSV,2,{msg},8,65,45,120,42,66,30,240,38,72,60,60,45,73,10,300,30,0")
+    return data.encode()
+
+
+def trail_points(count=100):
+    return [[f"19.{411551 + i * 37:06d}", f"51.{705909 + i * 23:06d}"] for i in range(count)]
+
+
+class FakeUART:
+    """Replays NMEA stream in UART sized chunks, forever."""
+    def __init__(self, data, chunk_size=256):
+        self.chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        self.index = 0
+
+    def any(self):
+        return 1
+
+    def readinto(self, buf):
+        chunk = self.chunks[self.index]
+        self.index = (self.index + 1) % len(self.chunks)
+        size = min(len(chunk), len(buf))
+        buf[:size] = chunk[:size]
+        return size
+
+
+class StubCompass:
+    """Plain stub, Mock call overhead would hide the measured code."""
+    def get_tilt_compensated_heading(self):
+        return 90
+
+
+class StubMotors:
+    def stop(self):
+        pass
+
+    def forward(self):
+        pass
+
+    def turn_left(self, speed):
+        pass
+
+    def turn_right(self, speed):
+        pass
+
+    def update(self):
+        pass
+
+
+def make_navigation():
+    with patch('navigation.get_logger'), patch('navigation.MinIMU9v6', return_value=StubCompass()):
+        return Navigation(Mock())
+
+
+def make_movement(controller=None):
+    with patch('navigation.get_logger'), patch('navigation.microMX1508', return_value=StubMotors()):
+        return Movement(debug_print=False, controller=controller)
+
+
+def make_uart():
+    gps_uart = PX1122RUART(buffer_size=1024)
+    gps_uart.uart = FakeUART(nmea_stream())
+    return gps_uart
+
+
+def benchmarks():
+    """Returns dict name -> (function, args list cycled through calls)."""
+    nav = make_navigation()
+    mov = make_movement()
+    mov_pid = make_movement(LevelPIDController())
+    gps_uart = make_uart()
+    steering = Steering(mov, nav.heading)
+    steering.set_target(120)
+    dead_reckoning = DeadReckoning(nav)
+    dead_reckoning.fix("19.411551", "51.705909", "1.944", "45.0", 0)
+    trail = trail_points()
+    waypoints = Waypoints(len(trail))
+    for lon, lat in trail:
+        waypoints.append(nav.str_to_microdegrees(lon), nav.str_to_microdegrees(lat))
+    path_follower = PathFollower(nav, lookahead_cm=100)
+    path_waypoints = Waypoints(len(trail))
+    for lon, lat in trail:
+        path_waypoints.append(nav.str_to_microdegrees(lon), nav.str_to_microdegrees(lat))
+
+    def follow_path(lon, lat):
+        # Same segment every call, the projection would finish the trail.
+        path_waypoints.cursor = 1
+        path_waypoints.previous = (path_waypoints.coords[0], path_waypoints.coords[1])
+        return path_follower.update(lon, lat, path_waypoints, 0)
+
+    rover = [f"19.{411551 + i * 11:06d}" for i in range(50)], [f"51.{705909 + i * 7:06d}" for i in range(50)]
+    positions = list(zip(*rover))
+    return {
+        "nav.calculate_distance_bearing": (nav.calculate_distance_bearing,
+                                           [(lon, lat, *trail[i % len(trail)]) for i, (lon, lat) in enumerate(positions)]),
+        "nav.distance_bearing_position": (nav.distance_bearing_position,
+                                          [(nav.str_to_microdegrees(lon), nav.str_to_microdegrees(lat), waypoints)
+                                           for lon, lat in positions]),
+        "nav.compile_waypoints": (nav.compile_waypoints, [(waypoints,)]),
+        "path_follower.update": (follow_path, [(nav.str_to_microdegrees(lon), nav.str_to_microdegrees(lat))
+                                               for lon, lat in positions]),
+        "dead_reckoning.predict": (dead_reckoning.predict, [(age_ms, heading) for age_ms in (0, 250, 700)
+                                                            for heading in (None, 10, 200)]),
+        "nav.atan2_int": (nav.atan2_int, [(y, x) for y in (-90000, -3, 0, 17, 45000) for x in (-70000, -1, 5, 123456)]),
+        "nav.cos_int": (nav.cos_int, [(lat,) for lat in range(-89000000, 90000000, 7000000)]),
+        "nav.atan2_table": (nav.atan2_table, [(y, x) for y in (-90000, -3, 0, 17, 45000) for x in (-70000, -1, 5, 123456)]),
+        "nav.cos_table": (nav.cos_table, [(lat,) for lat in range(-89000000, 90000000, 7000000)]),
+        "math.atan2": (math.atan2, [(y, x) for y in (-90000, -3, 0, 17, 45000) for x in (-70000, -1, 5, 123456)]),
+        "math.cos": (math.cos, [(math.radians(lat / 1000000),) for lat in range(-89000000, 90000000, 7000000)]),
+        "nav.isqrt": (nav.isqrt, [(n,) for n in (0, 1, 99, 123456789, 10 ** 12, 987654321987)]),
+        "uart.process_received_data": (gps_uart.process_received_data, [()]),
+        "steering.step": (steering.step, [()]),
+        "mov.move": (mov.move, [(current, target, False) for current in range(0, 360, 45) for target in range(0, 360, 30)]),
+        "mov.move pid": (mov_pid.move, [(current, target, False) for current in range(0, 360, 45) for target in range(0, 360, 30)]),
+    }
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, len(sorted_values) * pct // 100)]
+
+
+def run_benchmark(func, args_list, calls):
+    # Warm up.
+    for args in args_list:
+        func(*args)
+
+    # Latency and throughput.
+    latencies = []
+    perf_counter_ns = time.perf_counter_ns
+    args_count = len(args_list)
+    start = perf_counter_ns()
+    for i in range(calls):
+        args = args_list[i % args_count]
+        t0 = perf_counter_ns()
+        func(*args)
+        latencies.append(perf_counter_ns() - t0)
+    total_ns = perf_counter_ns() - start
+    latencies.sort()
+
+    # Allocated bytes per call, measured separately, tracing slows down the calls.
+    alloc_calls = min(calls, 200)
+    tracemalloc.start()
+    allocated = 0
+    for i in range(alloc_calls):
+        args = args_list[i % args_count]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func(*args)
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    return {
+        "ops_per_s": int(calls * 1e9 / total_ns),
+        "alloc_bytes_per_call": allocated // alloc_calls,
+        "p50_us": round(percentile(latencies, 50) / 1000, 2),
+        "p90_us": round(percentile(latencies, 90) / 1000, 2),
+        "p99_us": round(percentile(latencies, 99) / 1000, 2),
+    }
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_FILE) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rover hot path benchmark.")
+    parser.add_argument("--calls", type=int, default=5000, help="calls per benchmark")
+    parser.add_argument("--filter", default="", help="run only benchmarks containing this text")
+    parser.add_argument("--save", action="store_true", help="store results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against baseline")
+    args = parser.parse_args()
+
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+    print(f"{'benchmark':40} {'ops/s':>10} {'B/call':>8} {'p50 us':>8} {'p90 us':>8} {'p99 us':>8} {'vs base':>8}")
+    for name, (func, args_list) in benchmarks().items():
+        if args.filter not in name:
+            continue
+        result = run_benchmark(func, args_list, args.calls)
+        results[name] = result
+        change = ""
+        if name in baseline:
+            ratio = result["ops_per_s"] / baseline[name]["ops_per_s"]
+            change = f"{ratio:.2f}x"
+            if ratio < 1 - args.tolerance:
+                regressions.append(name)
+                change += " !"
+        print(f"{name:40} {result['ops_per_s']:>10} {result['alloc_bytes_per_call']:>8} "
+              f"{result['p50_us']:>8} {result['p90_us']:>8} {result['p99_us']:>8} {change:>8}")
+
+    if args.save:
+        baseline.update(results)
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {BASELINE_FILE}")
+    elif regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
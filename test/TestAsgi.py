@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+import app as flask_app
+import asgi
+from roverregistry import RoverRegistry
+
+
+class TestAsgi(unittest.TestCase):
+    """Drives the ASGI app directly, without a server."""
+    def setUp(self):
+        flask_app.latest_gps_data.clear()
+        registry = RoverRegistry(lambda: [("m1", "inactive", None), ("m2", "inactive", None)], lambda updates: None)
+        self.registry_patch = patch.object(flask_app, "rover_registry", registry)
+        self.registry_patch.start()
+
+    def tearDown(self):
+        self.registry_patch.stop()
+
+    def request(self, method, path, body=b"", query=b""):
+        async def call():
+            messages = []
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                messages.append(message)
+
+            await asgi.app({"type": "http", "method": method, "path": path, "query_string": query},
+                           receive, send)
+            return messages
+        messages = asyncio.run(call())
+        return messages[0]["status"], b"".join(m.get("body", b"") for m in messages[1:])
+
+    def test_update_gps(self):
+        data = {"mac": "m1", "fix_status": "RTK Fix", "latitude": "1", "longitude": "2", "su": {}, "sv": None}
+        status, _ = self.request("POST", "/rover/update_gps", json.dumps(json.dumps(data)).encode())
+        self.assertEqual(status, 201)
+        self.assertEqual(flask_app.latest_gps_data["m1"]["fix_status"], "RTK Fix")
+
+    def test_trail_page(self):
+        with patch.dict(flask_app.dispatched_trails, {"m1": (7, [(1, 2), (3, 4), (5, 6)])}):
+            status, body = self.request("GET", "/trail/page/m1/7", query=b"offset=1&count=5")
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(body)["points"], [[3, 4], [5, 6]])
+            self.assertEqual(self.request("GET", "/trail/page/m1/7", query=b"offset=-1")[0], 400)
+            self.assertEqual(self.request("GET", "/trail/page/m1/6")[0], 409)
+
+    def test_update_gps_bin_malformed(self):
+        status, _ = self.request("POST", "/rover/update_gps_bin", b"xx")
+        self.assertEqual(status, 400)
+
+    def test_register(self):
+        self.assertEqual(self.request("POST", "/rover/register", b'{"mac": "m1"}')[0], 200)
+        self.assertEqual(self.request("POST", "/rover/register", b'{"mac": "m3"}')[0], 406)
+
+    def test_update_gps_not_registered(self):
+        data = {"mac": "m3", "fix_status": "RTK Fix", "latitude": "1", "longitude": "2", "su": {}, "sv": None}
+        status, _ = self.request("POST", "/rover/update_gps", json.dumps(data).encode())
+        self.assertEqual(status, 406)
+        self.assertNotIn("m3", flask_app.latest_gps_data)
+
+    def test_rover_command_long_poll(self):
+        command = flask_app.rover_mailbox.post("m3", {"precision": 5, "trail_points": "[]"})
+        status, body = self.request("GET", "/trail/upload/m3", query=b"version=0&wait=0")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["version"], command["version"])
+        self.assertEqual(self.request("POST", f"/trail/ack/m3/{command['version']}")[0], 200)
+        self.assertEqual(self.request("GET", "/trail/upload/m3", query=b"wait=0.05")[0], 204)
+        self.assertEqual(self.request("GET", "/trail/upload/m3", query=b"wait=x")[0], 400)
+        self.assertEqual(self.request("POST", "/trail/ack/m4/1")[0], 404)
+
+    def test_get_coords_stream(self):
+        async def stream():
+            received = asyncio.Queue()
+            disconnect = asyncio.Event()
+            chunks = []
+
+            async def receive():
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                await received.put(message)
+
+            with patch.object(flask_app, "SSE_HEARTBEAT_S", 0.05):
+                task = asyncio.create_task(asgi.get_coords({"query_string": b"mac=m1"}, receive, send))
+                self.assertEqual((await received.get())["status"], 200)
+                flask_app.publish_gnss_update({"mac": "m2", "fix_status": "x", "latitude": 1, "longitude": 2,
+                                               "su": {}, "sv": None})
+                flask_app.publish_gnss_update({"mac": "m1", "fix_status": "y", "latitude": 1, "longitude": 2,
+                                               "su": {}, "sv": None})
+                chunks.append((await received.get())["body"])
+                chunks.append((await received.get())["body"])
+                self.assertEqual(flask_app.rover_broker.subscriber_count(), 1)
+                disconnect.set()
+                await asyncio.wait_for(task, 1)
+            return chunks
+
+        chunks = asyncio.run(stream())
+        self.assertIn(b'"fix_status": "y"', chunks[0])
+        self.assertEqual(chunks[1], b": heartbeat\n\n")
+        self.assertEqual(flask_app.rover_broker.subscriber_count(), 0)
+
+    def test_flask_get_coords_releases_subscription(self):
+        flask_app.latest_gps_data["m1"] = {"mac": "m1", "fix_status": "x"}
+        with flask_app.app.test_request_context("/rover/get_coords"):
+            response = flask_app.get_coords()
+            # Response never iterated, nothing to release.
+            self.assertEqual(flask_app.rover_broker.subscriber_count(), 0)
+            self.assertIn('"fix_status": "x"', next(response.response))
+            self.assertEqual(flask_app.rover_broker.subscriber_count(), 1)
+            response.close()
+        self.assertEqual(flask_app.rover_broker.subscriber_count(), 0)
+        del flask_app.latest_gps_data["m1"]
+
+if __name__ == '__main__':
+    unittest.main()
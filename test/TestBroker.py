@@ -0,0 +1,62 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+from broker import DROP_OLDEST, LATEST, Broker
+
+
+class TestBroker(unittest.TestCase):
+    def setUp(self):
+        self.broker = Broker()
+
+    def test_fan_out(self):
+        first = self.broker.subscribe()
+        second = self.broker.subscribe()
+        self.assertEqual(self.broker.publish("mac1", {"n": 1}), 2)
+        self.assertEqual(first.get(timeout=0), {"n": 1})
+        self.assertEqual(second.get(timeout=0), {"n": 1})
+
+    def test_topics(self):
+        all_rovers = self.broker.subscribe()
+        rover1 = self.broker.subscribe("mac1")
+        self.broker.publish("mac1", 1)
+        self.broker.publish("mac2", 2)
+        self.assertEqual([all_rovers.pop(), all_rovers.pop()], [1, 2])
+        self.assertEqual(rover1.pop(), 1)
+        self.assertIsNone(rover1.pop())
+
+    def test_drop_oldest(self):
+        subscription = self.broker.subscribe(maxlen=3, policy=DROP_OLDEST)
+        for n in range(5):
+            self.broker.publish("mac1", n)
+        self.assertEqual([subscription.pop() for _ in range(4)], [2, 3, 4, None])
+        self.assertEqual(subscription.dropped, 2)
+
+    def test_latest(self):
+        subscription = self.broker.subscribe(policy=LATEST)
+        for n in range(3):
+            self.broker.publish("mac1", ("mac1", n))
+        self.broker.publish("mac2", ("mac2", 0))
+        self.broker.publish("mac1", ("mac1", 3))
+        self.assertEqual([subscription.pop() for _ in range(3)], [("mac2", 0), ("mac1", 3), None])
+        self.assertEqual(subscription.dropped, 3)
+
+    def test_get_timeout_and_wakeup(self):
+        subscription = self.broker.subscribe()
+        self.assertIsNone(subscription.get(timeout=0.01))
+        threading.Timer(0.05, self.broker.publish, ("mac1", "x")).start()
+        self.assertEqual(subscription.get(timeout=5), "x")
+
+    def test_unsubscribe(self):
+        with self.broker.subscribe("mac1"):
+            with self.broker.subscribe():
+                self.assertEqual(self.broker.subscriber_count(), 2)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+        self.assertEqual(self.broker.publish("mac1", 1), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+from commandmailbox import CommandMailbox
+
+
+class TestCommandMailbox(unittest.TestCase):
+    def setUp(self):
+        self.mailbox = CommandMailbox()
+
+    def test_commands_per_rover(self):
+        first = self.mailbox.post("mac1", {"trail_points": "[[1, 2]]"})
+        second = self.mailbox.post("mac2", {"trail_points": "[[3, 4]]"})
+        self.assertGreater(second["version"], first["version"])
+        self.assertEqual(self.mailbox.pending("mac1")["trail_points"], "[[1, 2]]")
+        self.assertEqual(self.mailbox.pending("mac2")["mac"], "mac2")
+        self.assertIsNone(self.mailbox.pending("mac3"))
+
+    def test_new_command_replaces_previous(self):
+        self.mailbox.post("mac1", {"trail_points": "[[1, 2]]"})
+        stop = self.mailbox.post("mac1", {"trail_points": "[]"})
+        self.assertEqual(self.mailbox.pending("mac1"), stop)
+
+    def test_delivered_until_acknowledged(self):
+        command = self.mailbox.post("mac1", {"trail_points": "[[1, 2]]"})
+        self.assertEqual(self.mailbox.pending("mac1"), command)
+        self.assertEqual(self.mailbox.pending("mac1"), command)
+        self.assertIsNone(self.mailbox.pending("mac1", since_version=command["version"]))
+        self.assertTrue(self.mailbox.ack("mac1", command["version"]))
+        self.assertIsNone(self.mailbox.pending("mac1"))
+        self.assertFalse(self.mailbox.ack("mac1", command["version"] + 1))
+        self.assertFalse(self.mailbox.ack("mac2", 1))
+
+    def test_wait_returns_posted_command(self):
+        timer = threading.Timer(0.05, self.mailbox.post, ("mac1", {"trail_points": "[]"}))
+        timer.start()
+        start = time.monotonic()
+        command = self.mailbox.wait("mac1", timeout=5)
+        timer.join()
+        self.assertEqual(command["trail_points"], "[]")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.mailbox.broker.subscriber_count(), 0)
+
+    def test_wait_timeout(self):
+        self.mailbox.post("mac2", {"trail_points": "[]"})
+        self.assertIsNone(self.mailbox.wait("mac1", timeout=0.05))
+
+    def test_wait_async(self):
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            # Posted from another thread, like a Flask request.
+            loop.call_later(0.05, lambda: threading.Thread(
+                target=self.mailbox.post, args=("mac1", {"trail_points": "[]"})).start())
+            return await self.mailbox.wait_async("mac1", timeout=5)
+
+        self.assertEqual(asyncio.run(scenario())["mac"], "mac1")
+        self.assertIsNone(asyncio.run(self.mailbox.wait_async("mac2", timeout=0.05)))
+
+
+if __name__ == '__main__':
+    unittest.main()
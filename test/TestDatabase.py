@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+import app as flask_app
+from database import ConnectionPool, connect, ensure_unique_index
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "test.db")
+        self.pool = ConnectionPool(self.path, max_idle=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.tmp.cleanup()
+
+    def test_pragmas(self):
+        db = self.pool.acquire()
+        self.assertEqual(db.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(db.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+        self.pool.release(db)
+
+    def test_connection_reused(self):
+        db = self.pool.acquire()
+        self.pool.release(db)
+        self.assertIs(self.pool.acquire(), db)
+        self.assertEqual(self.pool.opened, 1)
+
+    def test_max_idle(self):
+        connections = [self.pool.acquire() for _ in range(3)]
+        for db in connections:
+            self.pool.release(db)
+        self.assertEqual(self.pool.opened, 3)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connections[2].execute("SELECT 1")
+
+    def test_release_rolls_back(self):
+        db = self.pool.acquire()
+        db.execute("CREATE TABLE t (x INTEGER)")
+        db.execute("INSERT INTO t VALUES (1)")
+        self.pool.release(db)
+        self.assertEqual(self.pool.acquire().execute("SELECT COUNT(*) FROM t").fetchone()[0], 0)
+
+    def test_reader_not_blocked_by_writer(self):
+        writer = self.pool.acquire()
+        writer.execute("CREATE TABLE t (x INTEGER)")
+        writer.commit()
+        writer.execute("INSERT INTO t VALUES (1)")
+        # Writer holds open transaction, reader in another thread sees the last commit.
+        result = []
+        reader = threading.Thread(target=lambda: result.append(
+            connect(self.path).execute("SELECT COUNT(*) FROM t").fetchone()[0]))
+        reader.start()
+        reader.join(2)
+        self.assertEqual(result, [0])
+        writer.commit()
+
+    def test_ensure_unique_index(self):
+        db = self.pool.acquire()
+        db.execute("CREATE TABLE rover (mac TEXT)")
+        db.executemany("INSERT INTO rover VALUES (?)", [("a",), ("a",)])
+        self.assertFalse(ensure_unique_index(db, "rover_mac", "rover", "mac"))
+        db.execute("DELETE FROM rover")
+        self.assertTrue(ensure_unique_index(db, "rover_mac", "rover", "mac"))
+        with self.assertRaises(sqlite3.IntegrityError):
+            db.executemany("INSERT INTO rover VALUES (?)", [("a",), ("a",)])
+
+
+class TestRoverRoutes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [patch.object(flask_app, "DATABASE", os.path.join(self.tmp.name, "test.db")),
+                        patch.object(flask_app, "DATABASE_SCHEMA", os.path.join(self.tmp.name, "schema.sql"))]
+        for p in self.patches:
+            p.start()
+        flask_app.prepare_database()
+        self.client = flask_app.app.test_client()
+
+    def tearDown(self):
+        flask_app.get_pool().close()
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_register_lookup(self):
+        self.assertEqual(self.client.post("/rover/register", json={"mac": "a8032a56ae8c"}).status_code, 200)
+        self.assertEqual(self.client.post("/rover/register", json={"mac": "000000000000"}).status_code, 406)
+        # Every request borrowed the same connection.
+        self.assertEqual(flask_app.get_pool().opened, 1)
+
+    def test_duplicate_mac(self):
+        response = self.client.post("/api/rovers", json={"name": "Copy", "mac": "a8032a56ae8c"})
+        self.assertEqual(response.status_code, 409)
+        rover = self.client.post("/api/rovers", json={"name": "Rover2", "mac": "a8032a56ae8d"}).json
+        response = self.client.put(f"/api/rovers/{rover['id']}", json={"name": "Rover2", "mac": "a8032a56ae8c"})
+        self.assertEqual(response.status_code, 409)
+
+    def test_delete_rover(self):
+        self.client.post("/api/rovers/1/trails", json={"trail_id": 1})
+        self.assertEqual(len(self.client.get("/api/rovers/1/trails").json), 1)
+        self.assertTrue(self.client.delete("/api/rovers/1").json["success"])
+        self.assertEqual(self.client.get("/api/rovers/1").status_code, 404)
+        self.assertEqual(self.client.get("/api/rovers/1/trails").json, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
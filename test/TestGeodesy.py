@@ -0,0 +1,151 @@
+import os
+import random
+import sys
+import tracemalloc
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+
+import numpy as np
+
+
+class MockPrecise:
+    def __init__(self, coord_str):
+        parts = coord_str.split('.')
+        self.whole_part_with_sign = parts[0]
+        if len(parts) > 1:
+            self.decimal_part = parts[1][:10].ljust(10, '0')
+        else:
+            self.decimal_part = '0000000000'
+
+sys.modules['machine'] = MagicMock()
+sys.modules['logger'] = MagicMock()
+sys.modules['microIMU9v6'] = MagicMock()
+sys.modules['microIMU9v6.imu9v6'] = MagicMock()
+sys.modules['microMX1508'] = MagicMock()
+sys.modules['microMX1508.microMX1508'] = MagicMock()
+mock_microNMEA = MagicMock()
+mock_microNMEA_microNMEA = MagicMock()
+mock_microNMEA_microNMEA.Precise = MockPrecise
+sys.modules['microNMEA'] = mock_microNMEA
+sys.modules['microNMEA.microNMEA'] = mock_microNMEA_microNMEA
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+from navigation import Navigation, PathFollower
+from waypoints import Waypoints
+import geodesy
+
+
+class TestGeodesy(unittest.TestCase):
+    def setUp(self):
+        with patch('navigation.get_logger'), patch('navigation.MinIMU9v6'):
+            self.nav = Navigation(Mock())
+        rng = random.Random(1)
+        self.lon = [rng.randint(-179000000, 179000000) for _ in range(500)]
+        self.lat = [rng.randint(-85000000, 85000000) for _ in range(500)]
+
+    def test_integer_functions_match_rover(self):
+        values = self.lon + [0, 1, -1, 9000, -9000]
+        np.testing.assert_array_equal(geodesy.cos_int(self.lat), [self.nav.cos_int(v) for v in self.lat])
+        np.testing.assert_array_equal(geodesy.atan2_int(values, values[::-1]),
+                                      [self.nav.atan2_int(y, x) for y, x in zip(values, values[::-1])])
+        squares = [abs(v) * 1000 + 7 for v in values] + [0, 1, 2, 10 ** 14, 10 ** 14 - 1]
+        np.testing.assert_array_equal(geodesy.isqrt(squares), [self.nav.isqrt(v) for v in squares])
+
+    def test_distance_bearing_matches_rover(self):
+        lon1, lat1 = 19411551, 51705909
+        lon2 = [lon1 + d for d in range(-5000, 5000, 37)]
+        lat2 = [lat1 + d * 3 // 2 for d in range(-5000, 5000, 37)]
+        dist_cm, bearing = geodesy.distance_bearing(lon1, lat1, lon2, lat2)
+        for i, (lon, lat) in enumerate(zip(lon2, lat2)):
+            expected = self.nav.calculate_distance_bearing(f"{lon1 / 1e6:.6f}", f"{lat1 / 1e6:.6f}",
+                                                           f"{lon / 1e6:.6f}", f"{lat / 1e6:.6f}")
+            self.assertEqual((dist_cm[i], bearing[i]), expected[:2])
+
+    def test_exact_reference_close_to_integer(self):
+        lon = np.array([19411551, 19412551, 19412551, 19411051])
+        lat = np.array([51705909, 51706909, 51704909, 51705409])
+        np.testing.assert_allclose(geodesy.leg_lengths(lon, lat, exact=True), geodesy.leg_lengths(lon, lat),
+                                   rtol=0.01)
+        np.testing.assert_allclose(geodesy.headings(lon, lat, exact=True), geodesy.headings(lon, lat), atol=1.5)
+        cumulative = geodesy.cumulative_distance(lon, lat)
+        self.assertEqual(cumulative[0], 0)
+        self.assertEqual(cumulative[-1], geodesy.leg_lengths(lon, lat).sum())
+
+    def test_to_microdegrees(self):
+        np.testing.assert_array_equal(geodesy.to_microdegrees(["51.7059096", "-0.5", "19"]),
+                                      [51705909, -500000, 19000000])
+        np.testing.assert_array_equal(geodesy.to_microdegrees([51.705909, -122.419416]), [51705909, -122419416])
+
+    def test_cross_track_errors(self):
+        # Trail going north, then east.
+        trail_lon = [19000000, 19000000, 19010000]
+        trail_lat = [51000000, 51010000, 51010000]
+        track_lon = [19000100, 18999900, 19005000, 19000000]
+        track_lat = [51005000, 51005000, 51009900, 51010000]
+        errors, segments = geodesy.cross_track_errors(track_lon, track_lat, trail_lon, trail_lat)
+        east_cm = 100 * geodesy.cos_int(51000000) * 1113 // 100000 / 10
+        np.testing.assert_allclose(errors[:2], [east_cm, -east_cm], rtol=0.01)
+        self.assertAlmostEqual(errors[2], 100 * 111.3 / 10, delta=5)
+        self.assertAlmostEqual(errors[3], 0)
+        np.testing.assert_array_equal(segments[:3], [0, 0, 1])
+        exact, _ = geodesy.cross_track_errors(track_lon, track_lat, trail_lon, trail_lat, exact=True)
+        np.testing.assert_allclose(exact, errors, atol=2)
+
+    def test_cross_track_errors_long_trail(self):
+        # Zig-zag of 20000 segments, every track point 10 microdeg of latitude north of a trail point.
+        count = 20001
+        trail_lon = 19000000 + np.arange(count) * 100
+        trail_lat = 51000000 + (np.arange(count) % 2) * 50
+        track_lon = trail_lon[::10]
+        track_lat = trail_lat[::10] + 10
+        tracemalloc.start()
+        errors, segments = geodesy.cross_track_errors(track_lon, track_lat, trail_lon, trail_lat)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        # 2001 points x 20000 segments in one go would be over 300 MB for every array.
+        self.assertLess(peak, 64 * 2 ** 20)
+        self.assertEqual(len(errors), len(track_lon))
+        np.testing.assert_array_less(np.abs(errors), 112)
+        small, small_segments = geodesy.cross_track_errors(track_lon, track_lat, trail_lon, trail_lat, budget=1)
+        np.testing.assert_array_equal(small, errors)
+        np.testing.assert_array_equal(small_segments, segments)
+
+    def test_cross_track_sign_matches_rover(self):
+        trail_lon = [19000000, 19000000]
+        trail_lat = [51000000, 51010000]
+        for track_lon in (19000100, 18999900):
+            waypoints = Waypoints(4)
+            for lon, lat in zip(trail_lon, trail_lat):
+                waypoints.append(lon, lat)
+            waypoints.advance()
+            follower = PathFollower(self.nav)
+            follower.update(track_lon, 51005000, waypoints, 5)
+            errors, _ = geodesy.cross_track_errors([track_lon], [51005000], trail_lon, trail_lat)
+            self.assertAlmostEqual(follower.cross_track_mm / 10, errors[0], delta=1)
+
+    def test_simplify(self):
+        # Hand drawn line north with jitter of few cm, then a corner east.
+        rng = random.Random(1)
+        lon = [19000000 + rng.randint(-3, 3) for _ in range(100)] + [19000000 + i * 100 for i in range(1, 20)]
+        lat = [51000000 + i * 100 for i in range(100)] + [51009900] * 19
+        kept = geodesy.simplify(lon, lat, tolerance_cm=50)
+        self.assertEqual(kept.tolist(), [0, 99, 118])
+        # Every removed point is within tolerance of the simplified trail.
+        errors, _ = geodesy.cross_track_errors(lon, lat, np.take(lon, kept), np.take(lat, kept), exact=True)
+        self.assertLessEqual(np.abs(errors).max(), 50)
+        # Zero tolerance keeps the jitter.
+        self.assertGreater(len(geodesy.simplify(lon, lat, tolerance_cm=0)), 50)
+        self.assertEqual(geodesy.simplify([1, 2], [1, 2], 10).tolist(), [0, 1])
+
+    def test_densify(self):
+        # 1000 microdegrees north is 111.3 m.
+        lon, lat = geodesy.densify([19000000, 19000000, 19000000], [51000000, 51001000, 51001100], max_leg_cm=3000)
+        np.testing.assert_array_equal(lon, [19000000] * 6)
+        np.testing.assert_array_equal(lat, [51000000, 51000250, 51000500, 51000750, 51001000, 51001100])
+        legs = geodesy.leg_lengths(lon, lat, exact=True)
+        self.assertLessEqual(legs.max(), 3000)
+
+
+if __name__ == '__main__':
+    unittest.main()
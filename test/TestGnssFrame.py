@@ -0,0 +1,113 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+# Mock MicroPython modules before importing RTKPlanner.
+sys.modules['urequests'] = MagicMock()
+sys.modules['esp32board'] = MagicMock()
+sys.modules['logger'] = MagicMock()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+from rtkplanner import RTKPlanner, scaled_int
+from app import decode_gnss_frame
+
+
+class TestGnssFrame(unittest.TestCase):
+    def setUp(self):
+        self.rtk_planner = RTKPlanner("localhost", 5000, "a8032a56ae8c")
+        self.nmea = MagicMock()
+        self.nmea.lat = "51.705909608686710"
+        self.nmea.lon = "-19.411551123387607"
+        self.nmea.quality = "RTK Fix"
+        self.nmea.speed = "0.02"
+        self.nmea.course = "271.5"
+        self.nmea.time = "123519.20"
+        self.nmea.satellites_used = {"GP": ["05", "12", "", ""], "GL": ["", ""], "GA": ["31"]}
+
+    def test_scaled_int(self):
+        self.assertEqual(scaled_int("51.705909608", 6), 51705909)
+        self.assertEqual(scaled_int("-0.5", 6), -500000)
+        self.assertEqual(scaled_int("12", 2), 1200)
+        self.assertEqual(scaled_int("", 2), 0)
+        self.assertEqual(scaled_int(None, 2), 0)
+
+    def test_round_trip(self):
+        frame = bytes(self.rtk_planner.gnss_frame(self.nmea))
+        decoded = decode_gnss_frame(frame)
+        self.assertEqual(decoded["mac"], "a8032a56ae8c")
+        self.assertEqual(decoded["latitude"], "51.705909")
+        self.assertEqual(decoded["longitude"], "-19.411551")
+        self.assertEqual(decoded["fix_status"], "RTK Fix")
+        self.assertEqual(decoded["speed"], "0.02")
+        self.assertEqual(decoded["course"], "271.50")
+        self.assertEqual(decoded["time_utc"], "123519.200")
+        self.assertEqual(decoded["su"], {"GP": ["05", "12"], "GL": [], "GA": ["31"]})
+
+    def test_no_position(self):
+        self.nmea.lat = ""
+        self.nmea.lon = None
+        self.nmea.quality = "Invalid"
+        self.nmea.time = ""
+        decoded = decode_gnss_frame(bytes(self.rtk_planner.gnss_frame(self.nmea)))
+        self.assertIsNone(decoded["latitude"])
+        self.assertIsNone(decoded["longitude"])
+        self.assertIsNone(decoded["time_utc"])
+        self.assertEqual(decoded["fix_status"], "Invalid")
+
+    def test_midnight(self):
+        self.nmea.time = "000000.00"
+        decoded = decode_gnss_frame(bytes(self.rtk_planner.gnss_frame(self.nmea)))
+        self.assertEqual(decoded["time_utc"], "000000.000")
+
+    def test_frame_smaller_than_json(self):
+        frame = self.rtk_planner.gnss_frame(self.nmea)
+        self.assertLess(len(frame), 50)
+
+    def test_unknown_status(self):
+        self.nmea.quality = "Something"
+        decoded = decode_gnss_frame(bytes(self.rtk_planner.gnss_frame(self.nmea)))
+        self.assertEqual(decoded["fix_status"], "Unknown")
+
+    def test_update_sent_without_telemetry(self):
+        requests = []
+
+        async def handle(reader, writer):
+            request = await reader.readuntil(b"\r\n\r\n")
+            length = int(request.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            requests.append((request, await reader.readexactly(length)))
+            writer.write(b"HTTP/1.0 201 CREATED\r\n\r\nGPS Updated")
+            await writer.drain()
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            self.rtk_planner.host = "127.0.0.1"
+            self.rtk_planner.port = server.sockets[0].getsockname()[1]
+            self.rtk_planner.send_gnss_update(self.nmea)
+            # Only the latest update is sent.
+            self.nmea.quality = "SPS Fix"
+            self.rtk_planner.send_gnss_update(self.nmea)
+            await self.rtk_planner.flush_gnss_updates()
+            await self.rtk_planner.flush_gnss_updates()
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(run())
+        self.assertEqual(len(requests), 1)
+        header, frame = requests[0]
+        self.assertTrue(header.startswith(b"POST /rover/update_gps_bin HTTP/1.0"))
+        self.assertEqual(decode_gnss_frame(frame)["fix_status"], "SPS Fix")
+
+    def test_malformed_frame(self):
+        frame = bytes(self.rtk_planner.gnss_frame(self.nmea))
+        with self.assertRaises(ValueError):
+            decode_gnss_frame(frame[:10])
+        with self.assertRaises(ValueError):
+            decode_gnss_frame(frame[:-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
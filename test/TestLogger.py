@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Other tests replace logger module with a mock.
+sys.modules.pop('logger', None)
+
+import logger
+from logger import DEBUG, ERROR, INFO, Logger
+
+
+class FakeTime:
+    def __init__(self):
+        self.now_ms = 0
+
+    def ticks_ms(self):
+        return self.now_ms
+
+    @staticmethod
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        self.time = FakeTime()
+        self.time_patcher = patch.object(logger, 'time', self.time)
+        self.time_patcher.start()
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+        self.time_patcher.stop()
+
+    def read(self, filename):
+        try:
+            with open(filename) as f:
+                return f.read()
+        except OSError:
+            return ""
+
+    def test_buffered_flush_on_size(self):
+        log = Logger("t.log", buffered=True, buffer_size=64, flush_interval_ms=10000)
+        log.info("first line")
+        self.assertEqual(self.read("1t.log"), "")
+        log.info("x" * 60)
+        self.assertEqual(self.read("1t.log"), "[0] I first line\n")
+        log.flush()
+        self.assertEqual(log.size, len(self.read("1t.log")))
+        log.close()
+
+    def test_buffered_flush_on_time_and_error(self):
+        log = Logger("t.log", buffered=True, flush_interval_ms=1000)
+        log.info("a")
+        log.poll()
+        self.assertEqual(self.read("1t.log"), "")
+        self.time.now_ms = 1000
+        log.poll()
+        self.assertEqual(self.read("1t.log"), "[0] I a\n")
+        log.error("b")
+        self.assertEqual(self.read("1t.log"), "[0] I a\n[1000] E b\n")
+        log.close()
+
+    def test_levels(self):
+        log = Logger("t.log", buffered=True, level=INFO)
+        log.debug("hidden")
+        log.info("shown")
+        log.flush()
+        self.assertEqual(self.read("1t.log"), "[0] I shown\n")
+        log.level = DEBUG
+        log.debug("visible")
+        log.level = ERROR
+        log.info("hidden")
+        log.close()
+        self.assertEqual(self.read("1t.log"), "[0] I shown\n[0] D visible\n")
+
+    def test_rotation(self):
+        for buffered in (False, True):
+            with self.subTest(buffered=buffered):
+                log = Logger(f"{int(buffered)}.log", max_size=50, buffered=buffered, buffer_size=32)
+                for i in range(10):
+                    log.info(f"line {i}")
+                log.close()
+                lines = (self.read(f"1{int(buffered)}.log") + self.read(f"2{int(buffered)}.log")).splitlines()
+                self.assertIn("[0] I line 9", lines)
+                self.assertNotIn("[0] I line 0", lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
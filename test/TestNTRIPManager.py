@@ -0,0 +1,219 @@
+import asyncio
+import socket
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Mock MicroPython modules before importing NTRIPManager.
+sys.modules['esp32board'] = MagicMock()
+sys.modules['logger'] = MagicMock()
+
+from ntripclient import NTRIPClient, NTRIPManager
+
+
+class FakeTime:
+    def __init__(self):
+        self.now_ms = 0
+
+    def ticks_ms(self):
+        return self.now_ms
+
+    @staticmethod
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+
+class FakeClient:
+    def __init__(self):
+        self.socket = object()
+        self.results = []
+        self.connect_ok = True
+        self.connects = 0
+        self.gga_sent = []
+
+    async def connect_async(self):
+        self.connects += 1
+        if self.connect_ok:
+            self.socket = object()
+        return self.connect_ok
+
+    def disconnect(self):
+        self.socket = None
+
+    def read_into(self, buffer):
+        result = self.results.pop(0) if self.results else None
+        if result == 0:
+            self.socket = None
+        return result
+
+    def send_gga(self, sentence):
+        self.gga_sent.append(sentence)
+
+
+class TestNTRIPManager(unittest.TestCase):
+    def setUp(self):
+        self.time = FakeTime()
+        self.time_patcher = patch('ntripclient.ticks_ms', self.time.ticks_ms)
+        self.time_patcher.start()
+        self.client = FakeClient()
+        self.manager = NTRIPManager(self.client, stale_ms=5000, gap_ms=1000, gga_interval_ms=3000,
+                                    reconnect_min_ms=1000, reconnect_max_ms=4000)
+        self.buffer = bytearray(16)
+
+    def tearDown(self):
+        self.time_patcher.stop()
+
+    def step(self, ms, result=None):
+        self.time.now_ms += ms
+        self.client.results.append(result)
+        asyncio.run(self.manager.maintain())
+        return self.manager.read_into(self.buffer)
+
+    def test_metrics(self):
+        self.step(100, 10)
+        self.step(100, 10)
+        self.step(1500, 10)
+        self.assertEqual(self.manager.bytes_total, 30)
+        self.assertEqual(self.manager.gaps, 1)
+        self.time.now_ms += 300
+        self.assertIn("NTRIP 15 [B/s]", self.manager.stats())
+
+    def test_closed_stream_reconnects_with_backoff(self):
+        self.client.connect_ok = False
+        self.step(100, 0)
+        self.assertIsNone(self.client.socket)
+        self.step(500)      # Before backoff.
+        self.assertEqual(self.client.connects, 0)
+        self.step(500)
+        self.assertEqual(self.client.connects, 1)
+        self.step(1000)     # Backoff doubled to 2000 ms.
+        self.assertEqual(self.client.connects, 1)
+        self.step(1000)
+        self.assertEqual(self.client.connects, 2)
+        self.client.connect_ok = True
+        self.step(4000)     # Backoff limited to 4000 ms.
+        self.assertEqual(self.client.connects, 3)
+        self.assertEqual(self.manager.reconnects, 1)
+        self.assertIsNotNone(self.client.socket)
+
+    def test_stale_stream_dropped(self):
+        self.step(100, 10)
+        self.step(4000)
+        self.assertIsNotNone(self.client.socket)
+        self.step(2000)
+        self.assertIsNone(self.client.socket)
+
+    def test_gga_upstream(self):
+        self.manager.set_gga("$GNGGA,1")
+        self.step(1000, 10)
+        self.assertEqual(self.client.gga_sent, [])
+        self.step(2000, 10)
+        self.assertEqual(self.client.gga_sent, ["$GNGGA,1"])
+        self.step(0, 0)
+        self.step(1000)
+        self.assertEqual(self.client.gga_sent, ["$GNGGA,1", "$GNGGA,1"])
+
+
+
+class TestNTRIPClientConnect(unittest.TestCase):
+    """Asynchronous connection to a loopback caster."""
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.client = NTRIPClient("127.0.0.1", self.server.getsockname()[1], "MOUNT", "user", "pass",
+                                  read_timeout_s=0, connect_timeout_s=1)
+        self.requests = []
+
+    def tearDown(self):
+        self.client.disconnect()
+        self.server.close()
+
+    def serve(self, response, delay_s=0.0):
+        def run():
+            connection, _ = self.server.accept()
+            with connection:
+                self.requests.append(connection.recv(4096))
+                time.sleep(delay_s)
+                if response:
+                    connection.sendall(response + b"\xd3\x00\x00")
+                    time.sleep(0.1)
+                    connection.sendall(b"\xd3\x00\x00")
+                time.sleep(0.3)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def connect_counting_ticks(self):
+        """Runs connect_async next to another task, returns (result, ticks of the other task)."""
+        async def main():
+            ticks = 0
+            connect = asyncio.ensure_future(self.client.connect_async(poll_ms=5))
+            while not connect.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return connect.result(), ticks
+        return asyncio.run(main())
+
+    def test_connect_does_not_block(self):
+        thread = self.serve(b"ICY 200 OK\r\n\r\n", delay_s=0.2)
+        connected, ticks = self.connect_counting_ticks()
+        self.assertTrue(connected)
+        self.assertGreaterEqual(ticks, 10)
+        self.assertIn(b"GET /MOUNT HTTP/1.0", self.requests[0])
+        # Socket is non-blocking for the forwarder, data sent with the header is not lost.
+        buffer = bytearray(16)
+        data = b""
+        for _ in range(50):
+            received = self.client.read_into(buffer)
+            if received:
+                data += buffer[:received]
+            if len(data) == 6:
+                break
+            time.sleep(0.01)
+        self.assertEqual(data, b"\xd3\x00\x00" * 2)
+        thread.join()
+
+    def test_header_lines_skipped(self):
+        thread = self.serve(b"ICY 200 OK\r\nServer: Caster\r\n\r\n")
+        self.assertTrue(self.connect_counting_ticks()[0])
+        # Possibly not in the same read, wait for the first frame.
+        for _ in range(50):
+            data = self.client.read_data(16)
+            if data:
+                break
+            time.sleep(0.01)
+        self.assertEqual(data, b"\xd3\x00\x00")
+        thread.join()
+
+    def test_rejected(self):
+        thread = self.serve(b"HTTP/1.0 401 Unauthorized\r\n\r\n")
+        self.assertEqual(self.connect_counting_ticks()[0], False)
+        self.assertIsNone(self.client.socket)
+        thread.join()
+
+    def test_timeout(self):
+        # Caster accepts but never answers.
+        thread = self.serve(None)
+        connected, ticks = self.connect_counting_ticks()
+        self.assertFalse(connected)
+        self.assertGreaterEqual(ticks, 20)
+        self.assertIsNone(self.client.socket)
+        thread.join()
+
+    def test_refused(self):
+        port = self.server.getsockname()[1]
+        self.server.close()
+        self.client.port = port
+        self.assertFalse(self.connect_counting_ticks()[0])
+        self.assertIsNone(self.client.socket)
+
+
+if __name__ == '__main__':
+    unittest.main()
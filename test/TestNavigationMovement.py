@@ -12,7 +12,7 @@ sys.modules['microNMEA'] = MagicMock()
 sys.modules['microNMEA.microNMEA'] = MagicMock()
 sys.modules['logger'] = MagicMock()
 
-from navigation import Movement
+from navigation import FORWARD, BangBangController, Movement, LevelPIDController, Steering
 
 
 class TestMovementMove(unittest.TestCase):
@@ -96,5 +96,103 @@ class TestMovementMove(unittest.TestCase):
                       f"Logged: '{logged_message}'")
 
 
+class TestControllers(unittest.TestCase):
+    def test_bang_bang_levels(self):
+        controller = BangBangController(tolerance_heading=5)
+        for diff, level in ((0, FORWARD), (-5, FORWARD), (6, 0), (-10, 0), (11, 1), (40, 1),
+                            (41, 2), (-75, 2), (76, 3), (-180, 3)):
+            with self.subTest(diff=diff):
+                self.assertEqual(controller.steer(diff), (diff, level))
+
+    def test_pid_derivative_damps_converging_turn(self):
+        controller = LevelPIDController(kp_x100=100, ki_x100=0, kd_x100=200)
+        self.assertEqual(controller.steer(30), (30, 1))
+        # Error shrinking by 10 deg per step, the rover straightens out early.
+        self.assertEqual(controller.steer(20), (0, FORWARD))
+        # Error growing, stronger turn than bang-bang.
+        self.assertEqual(controller.steer(30), (50, 2))
+
+    def test_pid_integral_limited(self):
+        controller = LevelPIDController(kp_x100=0, ki_x100=10, kd_x100=0, integral_limit=100)
+        outputs = [controller.steer(-4)[0] for _ in range(50)]
+        self.assertEqual(outputs[0], -1)
+        self.assertEqual(outputs[-1], -10)
+        self.assertEqual(controller.integral, -100)
+        controller.reset()
+        self.assertEqual(controller.steer(4), (0, FORWARD))
+
+    def test_pid_derivative_across_south(self):
+        controller = LevelPIDController(kp_x100=0, ki_x100=0, kd_x100=100)
+        controller.steer(179)
+        self.assertEqual(controller.steer(-179)[0], 2)
+
+    @staticmethod
+    def settle(controller, target=90, steps=300):
+        """
+        Rover turning from heading 0 to target, every level has its turn rate [deg/step]
+        reached with inertia. Returns (max overshoot, final error) [deg].
+        """
+        rates = (2, 4, 7, 10)
+        heading = rate = overshoot = 0
+        for _ in range(steps):
+            diff = (target - int(heading % 360) + 180) % 360 - 180
+            output, level = controller.steer(diff)
+            wanted = 0 if level == FORWARD else (rates[level] if output > 0 else -rates[level])
+            rate += (wanted - rate) * 0.3
+            heading += rate
+            overshoot = max(overshoot, heading - target)
+        return overshoot, target - heading
+
+    def test_pid_overshoots_less_than_bang_bang(self):
+        bang_bang_overshoot, bang_bang_error = self.settle(BangBangController(tolerance_heading=5))
+        pid_overshoot, pid_error = self.settle(LevelPIDController(kp_x100=100, ki_x100=0, kd_x100=200))
+        self.assertLessEqual(abs(bang_bang_error), 5)
+        self.assertLessEqual(abs(pid_error), 5)
+        self.assertGreater(bang_bang_overshoot, 2)
+        self.assertLess(pid_overshoot, bang_bang_overshoot)
+
+    def test_movement_with_pid(self):
+        with patch('navigation.get_logger'), patch('navigation.microMX1508') as motor_class:
+            movement = Movement(debug_print=False, controller=LevelPIDController(kd_x100=200))
+        movement.move(0, 30, False)
+        self.assertEqual(movement.status, "R")
+        motor_class.return_value.turn_right.assert_called_once_with(1)
+        movement.move(10, 30, False)
+        self.assertEqual(movement.status, "F")
+        movement.move(0, 0, True)
+        self.assertIsNone(movement.controller.previous_diff)
+
+
+class TestSteering(unittest.TestCase):
+    def setUp(self):
+        self.movement = Mock()
+        self.headings = iter(range(100))
+        self.steering = Steering(self.movement, lambda: next(self.headings))
+
+    def test_stopped_without_target(self):
+        self.steering.step()
+        self.movement.move.assert_called_once_with(-1, -1, True)
+        self.assertIsNone(self.steering.heading)
+
+    def test_every_step_samples_heading(self):
+        self.steering.set_target(90)
+        for _ in range(3):
+            self.steering.step()
+        self.assertEqual([c.args for c in self.movement.move.call_args_list],
+                         [(0, 90, False), (1, 90, False), (2, 90, False)])
+        self.assertEqual(self.steering.heading, 2)
+
+    def test_target_replaced_between_steps(self):
+        self.steering.set_target(90)
+        self.steering.step()
+        self.steering.set_target(180)
+        self.steering.step()
+        self.steering.stop()
+        self.steering.step()
+        self.assertEqual([c.args for c in self.movement.move.call_args_list],
+                         [(0, 90, False), (1, 180, False), (-1, -1, True)])
+        self.assertEqual(self.steering.target_updates, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
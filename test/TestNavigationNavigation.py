@@ -1,3 +1,4 @@
+import math
 import sys
 import unittest
 from unittest.mock import Mock, MagicMock, patch
@@ -27,7 +28,8 @@ mock_microNMEA_microNMEA.Precise = MockPrecise
 sys.modules['microNMEA'] = mock_microNMEA
 sys.modules['microNMEA.microNMEA'] = mock_microNMEA_microNMEA
 
-from navigation import Navigation
+from navigation import DeadReckoning, Navigation, PathFollower
+from waypoints import Waypoints
 
 
 class TestNavigation(unittest.TestCase):
@@ -126,6 +128,196 @@ class TestNavigation(unittest.TestCase):
         dist_cm, bearing, heading = self.nav.calculate_distance_bearing(lon1, lat1, lon2, lat2)
         self.assertGreaterEqual(dist_cm, 0, "Distance should be non-negative")
 
+    def test_waypoints_frame_matches_direct_calculation(self):
+        trail = [["19.411551", "51.705909"],
+                 ["19.412551", "51.706909"],
+                 ["19.410551", "51.705409"],
+                 ["19.411551", "51.695909"]]
+        waypoints = Waypoints(4)
+        for lon2, lat2 in trail:
+            waypoints.append(self.nav.str_to_microdegrees(lon2), self.nav.str_to_microdegrees(lat2))
+        self.assertEqual(len(self.nav.compile_waypoints(waypoints)), len(trail))
+        lon, lat = "19.411051", "51.706109"
+        for index, (lon2, lat2) in enumerate(trail):
+            dist_cm, bearing, heading = self.nav.calculate_distance_bearing(lon, lat, lon2, lat2)
+            frame_dist_cm, frame_bearing = self.nav.distance_bearing_position(
+                self.nav.str_to_microdegrees(lon), self.nav.str_to_microdegrees(lat), waypoints)
+            with self.subTest(index=index):
+                self.assertAlmostEqual(frame_dist_cm, dist_cm, delta=max(5, dist_cm // 500))
+                self.assertAlmostEqual(frame_bearing, bearing, delta=1)
+            waypoints.advance()
+
+    def test_trig_tables_accuracy(self):
+        atan2_errors = {"table": 0, "polynomial": 0}
+        for y in range(-1000, 1001, 37):
+            for x in range(-1000, 1001, 41):
+                expected = math.degrees(math.atan2(y, x)) * 100 % 36000
+                for name, atan2 in (("table", self.nav.atan2_table), ("polynomial", self.nav.atan2_int)):
+                    error = abs(atan2(y, x) - expected)
+                    atan2_errors[name] = max(atan2_errors[name], min(error, 36000 - error))
+        cos_errors = {"table": 0, "polynomial": 0}
+        for microdeg in range(-180000000, 180000001, 1234567):
+            expected = math.cos(math.radians(microdeg / 1000000)) * 10000
+            for name, cos in (("table", self.nav.cos_table), ("polynomial", self.nav.cos_int)):
+                cos_errors[name] = max(cos_errors[name], abs(cos(microdeg) - expected))
+        # Below 0.02 deg and 0.0002.
+        self.assertLess(atan2_errors["table"], 2)
+        self.assertLess(cos_errors["table"], 2)
+        self.assertGreater(atan2_errors["polynomial"], 100)
+        self.assertGreater(cos_errors["polynomial"], 100)
+
+    def test_trig_tables_edges(self):
+        for y, x, expected in ((0, 5, 0), (5, 5, 4500), (5, 0, 9000), (5, -5, 13500), (0, -5, 18000),
+                               (-5, -5, 22500), (-5, 0, 27000), (-5, 5, 31500), (-1, 10 ** 9, 0), (0, 0, 0)):
+            with self.subTest(y=y, x=x):
+                self.assertEqual(self.nav.atan2_table(y, x), expected)
+        for microdeg, expected in ((0, 10000), (90000000, 0), (180000000, -10000), (-60000000, 5000)):
+            with self.subTest(microdeg=microdeg):
+                self.assertEqual(self.nav.cos_table(microdeg), expected)
+
+    def test_trig_tables_selected(self):
+        with patch('navigation.MinIMU9v6'):
+            nav = Navigation(self.mock_i2c, trig_tables=True)
+        self.assertEqual(nav.atan2_int(3, 4), self.nav.atan2_table(3, 4))
+        dist_cm, bearing, _ = nav.calculate_distance_bearing("19.411551", "51.705909", "19.412551", "51.706909")
+        expected_bearing = math.degrees(math.atan2(1000 * math.cos(math.radians(51.7064)), 1000))
+        self.assertAlmostEqual(bearing, expected_bearing, delta=1)
+        self.assertAlmostEqual(dist_cm, 13100, delta=50)
+
+    def test_compile_empty_waypoints(self):
+        self.assertIsNone(self.nav.compile_waypoints(Waypoints(4)))
+
+    def test_waypoints_frame_compiled_after_change(self):
+        trail = [(19411551, 51705909), (19412551, 51706909), (19410551, 51705409)]
+        waypoints = Waypoints(4)
+        for lon, lat in trail:
+            waypoints.append(lon, lat)
+        lon, lat = 19411051, 51706109
+        for index in range(len(trail)):
+            # Compacted window has its own origin, results stay the same.
+            expected = Waypoints(4)
+            for point in trail[index:]:
+                expected.append(*point)
+            with self.subTest(index=index):
+                self.assertEqual(self.nav.distance_bearing_position(lon, lat, waypoints),
+                                 self.nav.distance_bearing_position(lon, lat, expected))
+            compiled = waypoints.frame
+            self.nav.distance_bearing_position(lon, lat, waypoints)
+            self.assertIs(waypoints.frame, compiled)
+            waypoints.advance()
+            waypoints.compact()
+
+
+
+class TestDeadReckoning(unittest.TestCase):
+    def setUp(self):
+        with patch('navigation.get_logger'), patch('navigation.MinIMU9v6'):
+            self.nav = Navigation(Mock())
+        self.dr = DeadReckoning(self.nav, max_age_ms=1000)
+
+    def test_no_fix(self):
+        self.assertIsNone(self.dr.predict(0))
+
+    def test_predict_along_course(self):
+        # 1.944 knots = 1 m/s to the north.
+        self.dr.fix("19.411551", "51.705909", "1.944", "0.0", 1000)
+        self.assertEqual(self.dr.speed_mm_s, 999)
+        self.assertEqual(self.dr.predict(1000), (19411551, 51705909))
+        lon, lat = self.dr.predict(1500)
+        self.assertAlmostEqual(lon, 19411551, delta=1)
+        self.assertAlmostEqual(lat - 51705909, 500 * 10 // 1113, delta=1)
+
+    def test_predict_along_heading(self):
+        self.dr.fix("19.411551", "51.705909", "1.944", "0.0", 0)
+        # East, 1 m at 51.7 deg latitude is about 14.5 microdegrees of longitude.
+        lon, lat = self.dr.predict(1000, heading=90)
+        self.assertAlmostEqual(lon - 19411551, 14, delta=1)
+        self.assertAlmostEqual(lat, 51705909, delta=1)
+        waypoints = Waypoints(1)
+        waypoints.append(lon, lat)
+        dist_cm, bearing = self.nav.distance_bearing_position(19411551, 51705909, waypoints)
+        self.assertAlmostEqual(dist_cm, 100, delta=5)
+        self.assertAlmostEqual(bearing, 90, delta=3)
+
+    def test_prediction_limited_by_max_age(self):
+        self.dr.fix("19.411551", "51.705909", "1.944", "180.0", 0)
+        self.assertEqual(self.dr.predict(5000), self.dr.predict(1000))
+
+    def test_repeated_epoch_does_not_reset_prediction(self):
+        self.assertTrue(self.dr.fix("19.411551", "51.705909", "1.944", "0.0", 0, "123519.000"))
+        # RMC of the same epoch read later, same position.
+        self.assertFalse(self.dr.fix("19.411551", "51.705909", "1.944", "0.0", 80, "123519.000"))
+        self.assertEqual(self.dr.fix_ms, 0)
+        self.assertEqual(self.dr.fixes, 1)
+        lon, lat = self.dr.predict(500)
+        self.assertAlmostEqual(lat - 51705909, 500 * 10 // 1113, delta=1)
+        self.assertTrue(self.dr.fix("19.411551", "51.705914", "1.944", "0.0", 500, "123519.500"))
+        # Within microdegree rounding of the 50 cm drive.
+        self.assertLess(self.dr.last_error_mm, 200)
+
+    def test_new_fix_corrects_prediction(self):
+        self.dr.fix("19.411551", "51.705909", "1.944", "0.0", 0)
+        # Rover did not move, the prediction was 1 m off (rounded to whole microdegrees, 111 mm).
+        self.dr.fix("19.411551", "51.705909", "0", "0.0", 1000)
+        self.assertAlmostEqual(self.dr.last_error_mm, 1000, delta=112)
+        self.assertEqual(self.dr.predict(1500), (19411551, 51705909))
+        self.assertEqual(self.dr.fixes, 2)
+
+
+
+class TestPathFollower(unittest.TestCase):
+    # Trail going 10 m north (90 microdeg), then 10 m east (144 microdeg at 51.7 deg).
+    TRAIL = [(19411551, 51705909), (19411551, 51705999), (19411695, 51705999)]
+
+    def setUp(self):
+        with patch('navigation.get_logger'), patch('navigation.MinIMU9v6'):
+            self.nav = Navigation(Mock())
+        self.follower = PathFollower(self.nav, lookahead_cm=100)
+        self.waypoints = Waypoints(8)
+        for lon, lat in self.TRAIL:
+            self.waypoints.append(lon, lat)
+
+    def test_trail_start_heads_to_first_waypoint(self):
+        dist_cm, bearing = self.follower.update(19411551, 51705900, self.waypoints, 5)
+        self.assertAlmostEqual(dist_cm, 100, delta=1)
+        self.assertEqual(bearing, 0)
+        self.assertEqual(self.waypoints.cursor, 0)
+
+    def test_converges_to_segment(self):
+        self.follower.update(19411551, 51705909, self.waypoints, 5)
+        self.assertEqual(self.waypoints.cursor, 1)
+        # 14 microdeg (97 cm) east of the north segment, steering back north-west onto it.
+        dist_cm, bearing = self.follower.update(19411565, 51705929, self.waypoints, 5)
+        self.assertAlmostEqual(self.follower.cross_track_mm, 967, delta=5)
+        # atan2_int is up to 5 deg off around 45 deg.
+        self.assertAlmostEqual(bearing, 316, delta=6)
+        self.assertAlmostEqual(dist_cm, 785, delta=5)
+        # West of it, north-east.
+        _, bearing = self.follower.update(19411537, 51705929, self.waypoints, 5)
+        self.assertLess(self.follower.cross_track_mm, 0)
+        self.assertAlmostEqual(bearing, 44, delta=6)
+
+    def test_advances_by_projection(self):
+        self.waypoints.advance()
+        # Passed the corner 2 m wide of it, far outside the waypoint radius.
+        result = self.follower.update(19411580, 51706001, self.waypoints, 5)
+        self.assertEqual(self.waypoints.cursor, 2)
+        self.assertEqual(self.waypoints.previous, self.TRAIL[1])
+        # 22 cm north of the east segment, look-ahead point 1 m east on it.
+        self.assertAlmostEqual(result[1], 102, delta=2)
+
+    def test_look_ahead_cuts_corner(self):
+        self.waypoints.advance()
+        # 45 cm before the corner, look-ahead point is 55 cm along the east segment.
+        _, bearing = self.follower.update(19411551, 51705995, self.waypoints, 5)
+        self.assertAlmostEqual(bearing, 51, delta=3)
+
+    def test_trail_end(self):
+        for _ in range(2):
+            self.waypoints.advance()
+        self.assertIsNone(self.follower.update(19411695, 51705999, self.waypoints, 5))
+        self.assertTrue(self.waypoints.finished())
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,75 @@
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+# Mock MicroPython modules before importing PX1122RUART.
+sys.modules['machine'] = MagicMock()
+sys.modules['logger'] = MagicMock()
+
+from px1122r import PX1122RUART
+
+
+def nmea(body):
+    checksum = 0
+    for char in body.encode():
+        checksum ^= char
+    return f"${body}*{checksum:02X}"
+
+
+class FakeUART:
+    """Returns prepared chunks through readinto, one chunk per call."""
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def any(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def readinto(self, buf):
+        chunk = self.chunks.pop(0)
+        size = min(len(chunk), len(buf))
+        buf[:size] = chunk[:size]
+        return size
+
+
+class TestPX1122RUART(unittest.TestCase):
+    GGA = nmea("GNGGA,123519,4807.038,N,01131.000,E,4,08,0.9,545.4,M,46.9,M,,")
+    RMC = nmea("GNRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W")
+
+    def setUp(self):
+        self.gps_uart = PX1122RUART(buffer_size=256)
+
+    def feed(self, *chunks):
+        self.gps_uart.uart = FakeUART(chunks)
+        return self.gps_uart.process_received_data()
+
+    def test_all_sentences_in_chunk(self):
+        data = f"{self.GGA}\r\n{self.RMC}\r\n".encode()
+        self.assertEqual(self.feed(data), [self.GGA, self.RMC])
+
+    def test_sentence_split_across_chunks(self):
+        data = f"{self.GGA}\r\n{self.RMC}\r\n".encode()
+        self.assertEqual(self.feed(data[:30]), [])
+        self.assertEqual(self.gps_uart.rx_len, 30)
+        self.gps_uart.uart = FakeUART([data[30:]])
+        self.assertEqual(self.gps_uart.process_received_data(), [self.GGA, self.RMC])
+        self.assertEqual(self.gps_uart.rx_len, 0)
+
+    def test_garbage_and_bad_checksum_dropped(self):
+        broken = self.GGA[:-2] + "00"
+        data = f"xx\r\n{broken}\r\n{self.RMC[:20]}{self.GGA}\r\n".encode()
+        self.assertEqual(self.feed(data), [self.GGA])
+        self.assertEqual(self.gps_uart.checksum_errors, 1)
+
+    def test_no_data(self):
+        self.assertEqual(self.feed(), [])
+
+    def test_overflow_resets_buffer(self):
+        self.assertEqual(self.feed(b"$" + b"A" * 300), [])
+        self.assertEqual(self.gps_uart.overflows, 1)
+        data = f"{self.RMC}\r\n".encode()
+        self.gps_uart.uart = FakeUART([data])
+        self.assertEqual(self.gps_uart.process_received_data(), [self.RMC])
+
+
+if __name__ == '__main__':
+    unittest.main()
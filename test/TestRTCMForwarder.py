@@ -0,0 +1,86 @@
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+# Mock MicroPython modules before importing RTCMForwarder.
+sys.modules['logger'] = MagicMock()
+
+from rtcmforwarder import RTCMForwarder
+
+
+def rtcm_frame(payload_size, fill=0x11):
+    return bytes([0xD3, payload_size >> 8, payload_size & 0xFF]) + bytes([fill]) * payload_size + b"\x01\x02\x03"
+
+
+class FakeNTRIPClient:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def read_into(self, buffer):
+        if not self.chunks:
+            return None
+        chunk = self.chunks.pop(0)
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class FakeUART:
+    def __init__(self, max_write=None):
+        self.max_write = max_write
+        self.data = bytearray()
+
+    def send_data(self, data):
+        size = len(data) if self.max_write is None else min(len(data), self.max_write)
+        self.data += data[:size]
+        return size
+
+
+class TestRTCMForwarder(unittest.TestCase):
+    def forward_all(self, forwarder, calls=20):
+        for _ in range(calls):
+            forwarder.forward()
+
+    def test_complete_frames_forwarded(self):
+        frames = rtcm_frame(10) + rtcm_frame(100, 0x22)
+        uart = FakeUART()
+        forwarder = RTCMForwarder(FakeNTRIPClient([frames]), uart)
+        self.forward_all(forwarder)
+        self.assertEqual(bytes(uart.data), frames)
+        self.assertEqual(forwarder.frames, 2)
+
+    def test_frame_split_across_reads(self):
+        frame1, frame2 = rtcm_frame(50), rtcm_frame(20, 0x33)
+        uart = FakeUART()
+        forwarder = RTCMForwarder(FakeNTRIPClient([frame1[:30], frame1[30:] + frame2[:5]]), uart)
+        forwarder.forward()
+        self.assertEqual(bytes(uart.data), b"")
+        forwarder.forward()
+        self.assertEqual(bytes(uart.data), frame1)
+        forwarder.ntrip_client.chunks.append(frame2[5:])
+        forwarder.forward()
+        self.assertEqual(bytes(uart.data), frame1 + frame2)
+
+    def test_garbage_between_frames_dropped(self):
+        frame1, frame2 = rtcm_frame(8), rtcm_frame(12, 0x44)
+        uart = FakeUART()
+        forwarder = RTCMForwarder(FakeNTRIPClient([b"ICY" + frame1 + b"\x00\x01" + frame2]), uart)
+        self.forward_all(forwarder)
+        self.assertEqual(bytes(uart.data), frame1 + frame2)
+        self.assertEqual(forwarder.bytes_dropped, 5)
+
+    def test_partial_uart_writes(self):
+        frames = rtcm_frame(200) + rtcm_frame(300, 0x55)
+        uart = FakeUART(max_write=64)
+        forwarder = RTCMForwarder(FakeNTRIPClient([frames, frames]), uart)
+        self.forward_all(forwarder, 40)
+        self.assertEqual(bytes(uart.data), frames + frames)
+
+    def test_not_aligned(self):
+        uart = FakeUART()
+        forwarder = RTCMForwarder(FakeNTRIPClient([b"raw data"]), uart, frame_aligned=False)
+        forwarder.forward()
+        self.assertEqual(bytes(uart.data), b"raw data")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+import app as flask_app
+from roverregistry import ACTIVE, INACTIVE, RoverRegistry
+
+
+class TestRoverRegistry(unittest.TestCase):
+    def setUp(self):
+        self.loads = 0
+        self.written = []
+        self.registry = RoverRegistry(self.load, self.written.extend, inactive_after_s=30)
+
+    def load(self):
+        self.loads += 1
+        return [("m1", INACTIVE, "2025-01-01 22:22:22"), ("m2", INACTIVE, None)]
+
+    def test_loaded_once(self):
+        for _ in range(10):
+            self.assertTrue(self.registry.is_registered("m1"))
+            self.assertFalse(self.registry.is_registered("m3"))
+        self.assertEqual(self.loads, 1)
+        self.registry.invalidate()
+        self.assertTrue(self.registry.is_registered("m2"))
+        self.assertEqual(self.loads, 2)
+
+    def test_seen_written_back(self):
+        self.assertFalse(self.registry.seen("m3"))
+        self.assertTrue(self.registry.seen("m1"))
+        self.assertEqual(self.registry.status("m1")["status"], ACTIVE)
+        self.assertEqual(self.registry.write_back(), 1)
+        last_active, status, mac = self.written[0]
+        self.assertEqual((status, mac), (ACTIVE, "m1"))
+        self.assertNotEqual(last_active, "2025-01-01 22:22:22")
+        # Nothing changed since.
+        self.assertEqual(self.registry.write_back(), 0)
+
+    def test_inactive_after_timeout(self):
+        self.registry.seen("m1")
+        self.registry.write_back()
+        late = datetime.datetime.now() + datetime.timedelta(seconds=31)
+        with patch("roverregistry.datetime.datetime") as mock_datetime:
+            mock_datetime.now.return_value = late
+            self.assertEqual(self.registry.write_back(), 1)
+        self.assertEqual(self.written[-1][1:], (INACTIVE, "m1"))
+
+    def test_invalidate_keeps_pending_changes(self):
+        self.registry.seen("m2")
+        self.registry.invalidate()
+        self.assertEqual(self.written[0][2], "m2")
+
+    def test_active_at_reload_becomes_inactive(self):
+        recent = (datetime.datetime.now() - datetime.timedelta(seconds=10)).strftime("%Y-%m-%d %H:%M:%S")
+        registry = RoverRegistry(lambda: [("m1", ACTIVE, "2025-01-01 22:22:22"), ("m2", ACTIVE, None),
+                                          ("m3", ACTIVE, recent)], self.written.extend, inactive_after_s=30)
+        self.assertTrue(registry.is_registered("m1"))
+        self.assertEqual(registry.write_back(), 2)
+        self.assertEqual(sorted(self.written, key=lambda update: update[2]), [("2025-01-01 22:22:22", INACTIVE, "m1"),
+                                                (None, INACTIVE, "m2")])
+        self.assertEqual(registry.status("m3")["status"], ACTIVE)
+
+    def test_seen_during_invalidate_kept(self):
+        def write(updates):
+            # Rover update arriving while the pending changes are written.
+            if seen.ident is None:
+                seen.start()
+                seen.join(0.1)
+            self.written.extend(updates)
+
+        self.registry = RoverRegistry(self.load, write)
+        seen = threading.Thread(target=self.registry.seen, args=("m1",))
+        self.registry.seen("m2")
+        self.registry.invalidate()
+        seen.join()
+        self.assertEqual(self.registry.write_back(), 1)
+        self.assertEqual(self.written[-1][1:], (ACTIVE, "m1"))
+
+
+class TestRoverRegistryRoutes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [patch.object(flask_app, "DATABASE", os.path.join(self.tmp.name, "test.db")),
+                        patch.object(flask_app, "DATABASE_SCHEMA", os.path.join(self.tmp.name, "schema.sql")),
+                        patch.object(flask_app, "rover_registry",
+                                     RoverRegistry(flask_app.load_rovers, flask_app.write_rovers)),
+                        patch("builtins.print")]
+        for p in self.patches:
+            p.start()
+        flask_app.prepare_database()
+        self.client = flask_app.app.test_client()
+
+    def tearDown(self):
+        flask_app.get_pool().close()
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmp.cleanup()
+
+    def update(self, mac):
+        data = {"mac": mac, "fix_status": "RTK Fix", "latitude": "1", "longitude": "2", "su": {}, "sv": None}
+        return self.client.post("/rover/update_gps", json=data).status_code
+
+    def test_registry_follows_rover_table(self):
+        self.assertEqual(self.update("a8032a56ae8c"), 201)
+        self.assertEqual(self.update("a8032a56ae8d"), 406)
+        rover = self.client.post("/api/rovers", json={"name": "Rover2", "mac": "a8032a56ae8d"}).json
+        self.assertEqual(self.update("a8032a56ae8d"), 201)
+        self.client.put(f"/api/rovers/{rover['id']}", json={"name": "Rover2", "mac": "a8032a56ae8e"})
+        self.assertEqual(self.update("a8032a56ae8d"), 406)
+        self.client.delete("/api/rovers/1")
+        self.assertEqual(self.client.post("/rover/register", json={"mac": "a8032a56ae8c"}).status_code, 406)
+
+    def test_write_back(self):
+        self.update("a8032a56ae8c")
+        flask_app.rover_registry.write_back()
+        rover = self.client.get("/api/rovers/1").json
+        self.assertEqual(rover["status"], ACTIVE)
+        self.assertNotEqual(rover["last_active"], "2025-01-01 22:22:22.22")
+
+
+if __name__ == '__main__':
+    unittest.main()
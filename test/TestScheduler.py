@@ -0,0 +1,63 @@
+import asyncio
+import sys
+import time
+import unittest
+from unittest.mock import MagicMock
+
+# Mock MicroPython modules before importing Scheduler.
+sys.modules['logger'] = MagicMock()
+
+from scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def run_for(self, scheduler, duration_s):
+        async def main():
+            try:
+                await asyncio.wait_for(scheduler.main(), duration_s)
+            except asyncio.TimeoutError:
+                pass
+        asyncio.run(main())
+
+    def test_periods(self):
+        calls = {"fast": 0, "slow": 0}
+        scheduler = Scheduler()
+        fast = scheduler.add("fast", 10, lambda: calls.__setitem__("fast", calls["fast"] + 1))
+        slow = scheduler.add("slow", 100, lambda: calls.__setitem__("slow", calls["slow"] + 1))
+        self.run_for(scheduler, 0.35)
+        self.assertGreaterEqual(calls["fast"], 20)
+        self.assertLessEqual(calls["fast"], 36)
+        self.assertIn(calls["slow"], (3, 4))
+        self.assertEqual(fast.runs, calls["fast"])
+        self.assertEqual(slow.overruns, 0)
+
+    def test_coroutine_task(self):
+        done = []
+
+        async def task():
+            await asyncio.sleep(0)
+            done.append(1)
+
+        scheduler = Scheduler()
+        scheduler.add("async", 50, task)
+        self.run_for(scheduler, 0.12)
+        self.assertGreaterEqual(len(done), 2)
+
+    def test_deadline_accounting(self):
+        scheduler = Scheduler()
+        slow = scheduler.add("blocking", 20, lambda: time.sleep(0.03), deadline_ms=10)
+        self.run_for(scheduler, 0.1)
+        self.assertGreater(slow.overruns, 0)
+        self.assertGreater(slow.missed, 0)
+        self.assertIn("blocking", scheduler.stats())
+
+    def test_error_does_not_stop_task(self):
+        scheduler = Scheduler()
+        failing = scheduler.add("failing", 10, lambda: 1 / 0)
+        self.run_for(scheduler, 0.05)
+        self.assertGreater(failing.errors, 1)
+        self.assertEqual(failing.errors, failing.runs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,266 @@
+import asyncio
+import errno
+import os
+import socket
+import sys
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Mock MicroPython modules before importing RTKPlanner.
+sys.modules['urequests'] = MagicMock()
+sys.modules['esp32board'] = MagicMock()
+sys.modules['logger'] = MagicMock()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+import app as flask_app
+import asgi
+from roverregistry import RoverRegistry
+from rtkplanner import RTKPlanner, TelemetryChannel
+
+MAC = "a8032a56ae8c"
+
+
+class FakeTime:
+    def __init__(self):
+        self.now_ms = 0
+
+    def ticks_ms(self):
+        return self.now_ms
+
+    @staticmethod
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+
+def gnss_frames(count, mac=MAC):
+    rover = RTKPlanner("localhost", 5000, mac)
+    frames = []
+    for i in range(count):
+        nmea = MagicMock()
+        nmea.lat = f"51.{705909 + i:06d}"
+        nmea.lon = "19.411551"
+        nmea.quality = "RTK Fix"
+        nmea.speed = "0.02"
+        nmea.course = "271.5"
+        nmea.time = "123519.20"
+        nmea.satellites_used = {"GP": ["05", "12"]}
+        frames.append(bytes(rover.gnss_frame(nmea)))
+    return frames
+
+
+class PartialSocket:
+    """Accepts at most `chunk` bytes per send, every other send would block."""
+    def __init__(self, chunk):
+        self.chunk = chunk
+        self.data = b""
+        self.blocked = True
+
+    def send(self, data):
+        self.blocked = not self.blocked
+        if self.blocked:
+            raise OSError(errno.EAGAIN, "would block")
+        data = bytes(data[:self.chunk])
+        self.data += data
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class TestTelemetryChannel(unittest.TestCase):
+    """Rover side, loopback server instead of RTK Planner."""
+    def setUp(self):
+        self.time = FakeTime()
+        self.time_patcher = patch('rtkplanner.time', self.time)
+        self.time_patcher.start()
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.server.settimeout(2)
+        self.connection = None
+        self.channel = TelemetryChannel("127.0.0.1", self.server.getsockname()[1], batch_size=3,
+                                        max_delay_ms=500, reconnect_min_ms=1000, reconnect_max_ms=4000)
+        self.frames = gnss_frames(12)
+
+    def tearDown(self):
+        self.channel.close()
+        if self.connection:
+            self.connection.close()
+        self.server.close()
+        self.time_patcher.stop()
+
+    def finish(self):
+        # Loopback connection completes at once, a few polls at most.
+        for _ in range(100):
+            self.channel.poll()
+            if not self.channel.frames:
+                return
+            time.sleep(0.01)
+
+    def received(self, size):
+        if not self.connection:
+            self.connection, _ = self.server.accept()
+            self.connection.settimeout(2)
+        data = b""
+        while len(data) < size:
+            data += self.connection.recv(size - len(data))
+        return data
+
+    def test_batch_by_size(self):
+        for frame in self.frames[:2]:
+            self.channel.add(frame)
+        self.assertIsNone(self.channel.socket)
+        self.channel.add(self.frames[2])
+        self.finish()
+        self.assertEqual(self.received(sum(map(len, self.frames[:3]))), b"".join(self.frames[:3]))
+        self.assertEqual(self.channel.reconnects, 1)
+
+    def test_batch_by_age(self):
+        self.channel.add(self.frames[0])
+        self.channel.poll()
+        self.assertEqual(self.channel.frames, 1)
+        self.time.now_ms += 500
+        self.finish()
+        self.assertEqual(self.received(len(self.frames[0])), self.frames[0])
+
+    def test_all_frames_in_order(self):
+        for i, frame in enumerate(self.frames, 1):
+            self.channel.add(frame)
+            if i % self.channel.batch_size == 0:
+                self.finish()
+        self.assertEqual(self.received(sum(map(len, self.frames))), b"".join(self.frames))
+        self.assertEqual(self.channel.dropped_frames, 0)
+
+    def test_partial_send_continued(self):
+        self.channel.socket = PartialSocket(chunk=7)
+        for frame in self.frames[:3]:
+            self.channel.add(frame)
+        self.assertEqual(self.channel.frames, 3)
+        self.assertGreater(self.channel.sent, 0)
+        while self.channel.frames:
+            self.channel.poll()
+        self.assertEqual(self.channel.socket.data, b"".join(self.frames[:3]))
+
+    def test_reconnect_backoff(self):
+        port = self.server.getsockname()[1]
+        self.server.close()
+        self.channel.port = port
+        self.channel.address = None
+        delays = []
+        for _ in range(4):
+            for frame in self.frames[:3]:
+                self.channel.add(frame)
+            self.finish()
+            delays.append(self.channel.next_connect_ms - self.time.now_ms)
+            self.time.now_ms = self.channel.next_connect_ms
+        self.assertEqual(delays, [1000, 2000, 4000, 4000])
+        self.assertEqual(self.channel.dropped_frames, 12)
+        self.assertEqual(self.channel.reconnects, 0)
+
+    def test_dropped_while_not_connected(self):
+        self.channel.next_connect_ms = 1000
+        for frame in self.frames[:3]:
+            self.channel.add(frame)
+        self.assertIsNone(self.channel.socket)
+        self.assertEqual(self.channel.dropped_frames, 3)
+
+    def test_buffer_full_drops_oldest(self):
+        self.channel.socket = PartialSocket(chunk=0)
+        self.channel.batch_size = 100
+        for frame in self.frames * 3:
+            self.channel.add(frame)
+        self.assertGreater(self.channel.dropped_frames, 0)
+        self.assertEqual(self.channel.dropped_frames + self.channel.frames, 36)
+
+
+class TelemetryServerTests:
+    """Stream framing of the telemetry ingest."""
+    def setUp(self):
+        flask_app.latest_gps_data.clear()
+        registry = RoverRegistry(lambda: [(MAC, "inactive", None)], lambda updates: None)
+        self.patches = [patch.object(flask_app, "rover_registry", registry), patch("builtins.print")]
+        for p in self.patches:
+            p.start()
+        self.frames = gnss_frames(12)
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def stream(self, data):
+        """Sends data, returns True when the server closed the connection."""
+        raise NotImplementedError
+
+    def test_frames_published(self):
+        self.assertFalse(self.stream(b"".join(self.frames)))
+        self.assertEqual(flask_app.latest_gps_data[MAC]["latitude"], "51.705920")
+
+    def test_bad_version_closes(self):
+        frame = bytearray(self.frames[0])
+        frame[0] = 9
+        self.assertTrue(self.stream(bytes(frame) + self.frames[1]))
+        self.assertNotIn(MAC, flask_app.latest_gps_data)
+
+    def test_bad_size_closes(self):
+        frame = bytearray(self.frames[0])
+        frame[1] = 3
+        self.assertTrue(self.stream(bytes(frame)))
+
+    def test_unknown_mac_closes(self):
+        self.assertTrue(self.stream(gnss_frames(1, mac="ffffffffffff")[0] + self.frames[0]))
+        self.assertNotIn(MAC, flask_app.latest_gps_data)
+
+
+class TestTelemetryHandler(TelemetryServerTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = flask_app.start_telemetry_server("127.0.0.1", 0)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def stream(self, data):
+        with socket.create_connection(self.server.server_address[:2], timeout=0.5) as client:
+            client.sendall(data)
+            # Without closing the write side the handler waits for the next frame,
+            # empty read means it closed the connection.
+            try:
+                closed = client.recv(1) == b""
+            except socket.timeout:
+                closed = False
+            except ConnectionResetError:
+                closed = True
+        return closed
+
+
+class TestAsgiTelemetry(TelemetryServerTests, unittest.TestCase):
+    def stream(self, data):
+        async def run():
+            server = await asyncio.start_server(asgi.handle_telemetry, "127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(data)
+            await writer.drain()
+            # Without closing the write side the server waits for the next frame,
+            # empty read means it closed the connection.
+            try:
+                closed = await asyncio.wait_for(reader.read(1), 0.5) == b""
+            except asyncio.TimeoutError:
+                closed = False
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return closed
+        return asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
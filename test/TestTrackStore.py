@@ -0,0 +1,115 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+import app as flask_app
+from roverregistry import RoverRegistry
+from trackstore import TrackStore
+
+
+class TestTrackStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TrackStore(os.path.join(self.tmp.name, "tracks.db"), batch_size=100)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def add_track(self, mac, count, t0=0):
+        # 10 Hz east-west zig-zag with one spike north.
+        for i in range(count):
+            lat = 51000000 + (5000 if i == count // 2 else 0)
+            self.store.append(mac, 19000000 + i % 100, lat, 4, t_ms=t0 + i * 100)
+
+    def test_batched_writes(self):
+        self.add_track("m1", 150)
+        self.assertEqual(self.store.written, 100)
+        self.assertEqual(self.store.count("m1", 0, 10 ** 9), 150)
+        self.assertEqual(self.store.written, 150)
+
+    def test_window_without_downsampling(self):
+        self.add_track("m1", 50)
+        self.add_track("m2", 50)
+        track = self.store.get_track("m1", 1000, 1900)
+        self.assertEqual([point[0] for point in track], list(range(1000, 2000, 100)))
+        self.assertEqual(track[0][1:], (19000010, 51000000, 4))
+
+    def test_downsampling(self):
+        self.add_track("m1", 20000)
+        track = self.store.get_track("m1", 0, 2000000, max_points=400)
+        self.assertLessEqual(len(track), 400)
+        self.assertGreater(len(track), 100)
+        times = [point[0] for point in track]
+        self.assertEqual(times, sorted(times))
+        # Extremes survive.
+        self.assertEqual(max(point[2] for point in track), 51005000)
+        self.assertEqual(min(point[1] for point in track), 19000000)
+        self.assertEqual(max(point[1] for point in track), 19000099)
+
+    def test_delete_before(self):
+        self.add_track("m1", 10)
+        self.assertEqual(self.store.delete_before(500), 5)
+        self.assertEqual(self.store.count("m1", 0, 10 ** 9), 5)
+
+    def test_retention_by_flush_thread(self):
+        now_ms = int(time.time() * 1000)
+        self.add_track("m1", 10, t0=now_ms - 2 * 86400 * 1000)
+        self.add_track("m1", 10, t0=now_ms)
+        self.store.retention_s = 86400
+        self.store.flush_interval_s = 0.01
+        self.store.start()
+        for _ in range(100):
+            if self.store.count("m1", 0, now_ms * 2) == 10:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.store.count("m1", 0, now_ms * 2), 10)
+        # Not pruned again until prune_interval_s passed.
+        self.add_track("m1", 10, t0=now_ms - 2 * 86400 * 1000)
+        time.sleep(0.05)
+        self.assertEqual(self.store.count("m1", 0, now_ms * 2), 20)
+
+
+class TestTrackRoute(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = flask_app.app.test_client()
+        registry = RoverRegistry(lambda: [("m1", "inactive", None)], lambda updates: None)
+        self.registry_patch = patch.object(flask_app, "rover_registry", registry)
+        self.registry_patch.start()
+
+    def tearDown(self):
+        self.registry_patch.stop()
+        if flask_app.track_store:
+            flask_app.track_store.close()
+        flask_app.track_store = None
+        self.tmp.cleanup()
+
+    def test_disabled(self):
+        self.assertEqual(self.client.get("/api/rovers/m1/track").status_code, 503)
+
+    def test_published_updates_recorded(self):
+        flask_app.start_track_store(os.path.join(self.tmp.name, "tracks.db"))
+        with patch("builtins.print"):
+            for i in range(3):
+                flask_app.publish_gnss_update({"mac": "m1", "fix_status": "RTK Fix", "latitude": f"51.00000{i}",
+                                               "longitude": "19.5", "su": {}, "sv": None})
+            flask_app.publish_gnss_update({"mac": "m1", "fix_status": "Invalid", "latitude": None,
+                                           "longitude": None, "su": {}, "sv": None})
+            flask_app.publish_gnss_update({"mac": "m1", "fix_status": "Invalid", "latitude": "",
+                                           "longitude": "", "su": {}, "sv": None})
+        end = int(time.time() * 1000) + 1000
+        track = self.client.get(f"/api/rovers/m1/track?end={end}").json
+        self.assertEqual(track["total"], 3)
+        self.assertEqual(track["points"][-1][1:], ["19.500000", "51.000002", "RTK Fix"])
+        self.assertEqual(self.client.get("/api/rovers/m1/track?points=x").status_code, 400)
+        self.assertEqual(self.client.get("/api/rovers/m1/track?start=5&end=1").status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Mock MicroPython modules before importing RTKPlanner.
+sys.modules['urequests'] = MagicMock()
+sys.modules['esp32board'] = MagicMock()
+sys.modules['logger'] = MagicMock()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+import app as flask_app
+from commandmailbox import CommandMailbox
+from rtkplanner import TRAIL_WINDOW_SIZE, RTKPlanner
+
+MAC = "a8032a56ae8c"
+
+
+class TestTrailPaging(unittest.TestCase):
+    """Rover downloads trail pages from the Flask app, HTTP is replaced by the test client."""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [patch.object(flask_app, "DATABASE", os.path.join(self.tmp.name, "test.db")),
+                        patch.object(flask_app, "DATABASE_SCHEMA", os.path.join(self.tmp.name, "schema.sql")),
+                        patch.object(flask_app, "rover_mailbox", CommandMailbox()),
+                        patch("builtins.print")]
+        for p in self.patches:
+            p.start()
+        flask_app.prepare_database()
+        self.client = flask_app.app.test_client()
+        self.rover = RTKPlanner("localhost", 5000, MAC)
+        self.rover._http_request = self.http_request
+
+    def tearDown(self):
+        flask_app.get_pool().close()
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmp.cleanup()
+
+    async def http_request(self, method, path, timeout_s):
+        response = self.client.open(path, method=method)
+        return response.status_code, response.data
+
+    def upload(self, count):
+        # Zig-zag, simplification keeps every point.
+        points = [[f"19.{411551 + i * 100}", f"51.{705909 + (i % 2) * 100}"] for i in range(count)]
+        trail = self.client.post("/api/trails", json={"name": f"t{count}", "trail_points": points}).json
+        self.client.post(f"/trail/upload/1/{trail['id']}/5")
+        return [(19411551 + i * 100, 51705909 + (i % 2) * 100) for i in range(count)]
+
+    def test_drive_whole_trail(self):
+        expected = self.upload(200)
+        self.assertTrue(asyncio.run(self.rover.poll_trails(wait_s=0)))
+        waypoints = self.rover.waypoints
+        self.assertEqual(waypoints.total, 200)
+        visited = []
+        while not waypoints.finished():
+            asyncio.run(self.rover.fill_trail_window())
+            self.assertTrue(self.rover.has_trail())
+            self.assertIs(self.rover.waypoints, waypoints)
+            self.assertLessEqual(waypoints.length, TRAIL_WINDOW_SIZE)
+            visited.append(self.rover.current_trail_point())
+            self.rover.next_trail_point()
+        self.assertEqual(visited, expected)
+        self.assertFalse(self.rover.has_trail())
+        # Acknowledged, no command pending.
+        self.assertIsNone(flask_app.rover_mailbox.pending(MAC))
+
+    def test_command_without_trail_points(self):
+        self.upload(3)
+        response = self.client.get(f"/trail/upload/{MAC}?paged=1")
+        self.assertNotIn("trail_points", response.json)
+        self.assertEqual(response.json["total"], 3)
+        self.assertIn("trail_points", self.client.get(f"/trail/upload/{MAC}").json)
+
+    def test_negative_offset_rejected(self):
+        self.upload(20)
+        version = self.client.get(f"/trail/upload/{MAC}?paged=1").json["version"]
+        self.assertEqual(self.client.get(f"/trail/page/{MAC}/{version}?offset=-16").status_code, 400)
+        self.assertEqual(self.client.get(f"/trail/page/{MAC}/{version}?offset=16").json["offset"], 16)
+
+    def test_replaced_trail(self):
+        self.upload(100)
+        asyncio.run(self.rover.poll_trails(wait_s=0))
+        self.client.post("/trail/stop/1")
+        for _ in range(20):
+            self.rover.next_trail_point()
+        asyncio.run(self.rover.fill_trail_window())
+        self.assertEqual(self.rover.waypoints.total, 0)
+        self.assertFalse(self.rover.has_trail())
+        asyncio.run(self.rover.poll_trails(wait_s=0))
+        self.assertEqual(self.rover.waypoints.total, 0)
+
+    def test_legacy_whole_trail(self):
+        self.rover._apply_trail({"precision": "5", "trail_points": "[['19.5', '51.5'], ['19.6', '51.6']]"})
+        self.assertEqual(self.rover.waypoints.total, 2)
+        self.assertEqual(self.rover.current_trail_point(), (19500000, 51500000))
+        self.rover.next_trail_point()
+        self.assertEqual(self.rover.current_trail_point(), (19600000, 51600000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTK_Planner"))
+
+import app as flask_app
+import trailstore
+
+
+class TestTrailStore(unittest.TestCase):
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.executescript("""
+            CREATE TABLE trail (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, trail_points TEXT);
+            CREATE TABLE rover_trail (rover_id INTEGER, trail_id INTEGER);
+        """)
+        self.assertTrue(trailstore.create_schema(self.db))
+
+    def add_trail(self, name, points):
+        trail_id = self.db.execute("INSERT INTO trail (name) VALUES (?)", [name]).lastrowid
+        trailstore.insert_points(self.db, trail_id, trailstore.parse_points(points))
+        return trail_id
+
+    def test_parse_microdegrees(self):
+        self.assertEqual(trailstore.parse_microdegrees("19.41155112338"), 19411551)
+        self.assertEqual(trailstore.parse_microdegrees("-0.5"), -500000)
+        self.assertEqual(trailstore.parse_microdegrees(51.705909), 51705909)
+        self.assertEqual(trailstore.parse_microdegrees("12"), 12000000)
+        self.assertEqual(trailstore.parse_microdegrees(1e-05), 10)
+        self.assertEqual(trailstore.format_microdegrees(-500000), "-0.500000")
+
+    def test_round_trip(self):
+        trail_id = self.add_trail("t", [["19.411551", "51.705909"], ["19.411600", "51.705950"]])
+        points = trailstore.get_points(self.db, trail_id)
+        self.assertEqual(points, [(19411551, 51705909), (19411600, 51705950)])
+        self.assertEqual(trailstore.points_as_degrees(points)[1], ["19.411600", "51.705950"])
+        summary = trailstore.trail_summaries(self.db)[0]
+        self.assertEqual(summary["point_count"], 2)
+        self.assertEqual(summary["bbox"], ["19.411551", "51.705909", "19.411600", "51.705950"])
+
+    def test_replace_and_delete(self):
+        trail_id = self.add_trail("t", [[1, 2], [3, 4], [5, 6]])
+        trailstore.insert_points(self.db, trail_id, [(1, 1)])
+        self.assertEqual(trailstore.get_points(self.db, trail_id), [(1, 1)])
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM trail_segment_index").fetchone()[0], 1)
+        trailstore.delete_points(self.db, trail_id)
+        self.assertEqual(trailstore.get_points(self.db, trail_id), [])
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM trail_segment_index").fetchone()[0], 0)
+
+    def test_points_in_bbox(self):
+        first = self.add_trail("a", [[0, 0], [0.001, 0.001], [0.002, 0.002]])
+        self.add_trail("b", [[0.001, 0.001]])
+        points = trailstore.points_in_bbox(self.db, 500, 500, 1500, 1500)
+        self.assertEqual(len(points), 2)
+        points = trailstore.points_in_bbox(self.db, 500, 500, 1500, 1500, trail_id=first)
+        self.assertEqual(points, [(first, 1, 1000, 1000)])
+
+    def test_trails_near(self):
+        # Long east-west segment, the point is near its middle, far from both ends.
+        line = self.add_trail("line", [["19.0", "51.0"], ["19.01", "51.0"]])
+        single = self.add_trail("single", [["19.005", "51.00002"]])
+        self.add_trail("far", [["20.0", "52.0"], ["20.1", "52.0"]])
+        near = trailstore.trails_near(self.db, 19005000, 51000010, radius_cm=500)
+        self.assertEqual([trail_id for trail_id, _ in near], [line, single])
+        self.assertAlmostEqual(near[0][1], 111.3, places=0)
+        self.assertEqual(trailstore.trails_near(self.db, 19005000, 51001000, radius_cm=500), [])
+
+    def test_trails_near_without_index(self):
+        self.db.execute("DROP TABLE trail_segment_index")
+        line = self.add_trail("line", [["19.0", "51.0"], ["19.01", "51.0"]])
+        self.assertEqual(trailstore.trails_near(self.db, 19005000, 51000010, radius_cm=500)[0][0], line)
+
+    def test_migrate_legacy_trails(self):
+        self.db.execute("INSERT INTO trail (name, trail_points) VALUES ('old', ?)",
+                        ["[['19.411551', '51.705909'], ['19.4116', '51.70595']]"])
+        self.db.execute("INSERT INTO trail (name, trail_points) VALUES ('broken', 'x')")
+        self.assertEqual(trailstore.migrate_legacy_trails(self.db), 1)
+        self.assertEqual(trailstore.get_points(self.db, 1), [(19411551, 51705909), (19411600, 51705950)])
+        self.assertIsNone(self.db.execute("SELECT trail_points FROM trail WHERE id = 1").fetchone()[0])
+        self.assertEqual(trailstore.migrate_legacy_trails(self.db), 0)
+
+
+class TestTrailRoutes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [patch.object(flask_app, "DATABASE", os.path.join(self.tmp.name, "test.db")),
+                        patch.object(flask_app, "DATABASE_SCHEMA", os.path.join(self.tmp.name, "schema.sql"))]
+        for p in self.patches:
+            p.start()
+        flask_app.prepare_database()
+        self.client = flask_app.app.test_client()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_sample_trail_migrated(self):
+        trails = self.client.get("/api/trails").json
+        self.assertEqual(trails[0]["point_count"], 2)
+        self.assertEqual(self.client.get("/api/trails/1/points").json[0], ["45.123000", "-122.456000"])
+
+    def test_create_query_and_upload(self):
+        points = [["19.411551", "51.705909"], ["19.4116", "51.70595"], ["19.4117", "51.706"]]
+        created = self.client.post("/api/trails", json={"name": "new", "trail_points": points}).json
+        self.assertEqual(created["point_count"], 3)
+        trail_id = created["id"]
+        inside = self.client.get(f"/api/trails/{trail_id}/points?min_lon=19.41155&min_lat=51.7059"
+                                 f"&max_lon=19.4116&max_lat=51.70596").json
+        self.assertEqual(inside, [["19.411551", "51.705909"], ["19.411600", "51.705950"]])
+        near = self.client.get("/api/trails/near?lon=19.41165&lat=51.70597&radius_cm=300").json
+        self.assertEqual(near[0]["id"], trail_id)
+        self.assertEqual(self.client.post("/api/trails", json={"name": "bad", "trail_points": "x"}).status_code, 400)
+
+        command = self.client.post(f"/trail/upload/1/{trail_id}/5").json
+        self.assertEqual(json.loads(command["trail_points"])[1], ["19.411600", "51.705950"])
+        flask_app.rover_mailbox.ack(command["mac"], command["version"])
+        # Second point is 0.9 m off the line of its neighbours, tolerance 5 m.
+        command = self.client.post(f"/trail/upload/1/{trail_id}/1000").json
+        self.assertEqual(json.loads(command["trail_points"]), [["19.411551", "51.705909"], ["19.411700", "51.706000"]])
+        flask_app.rover_mailbox.ack(command["mac"], command["version"])
+        # Remaining leg is 14.4 m.
+        command = self.client.post(f"/trail/upload/1/{trail_id}/1000?max_leg_cm=1000").json
+        self.assertEqual(len(json.loads(command["trail_points"])), 3)
+        flask_app.rover_mailbox.ack(command["mac"], command["version"])
+
+        self.assertTrue(self.client.delete("/api/trails/new").json["success"])
+        self.assertEqual(self.client.get(f"/api/trails/{trail_id}/points").json, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from waypoints import Waypoints
+
+
+class TestWaypoints(unittest.TestCase):
+    def setUp(self):
+        self.waypoints = Waypoints(4)
+        self.waypoints.clear(total=6)
+
+    def test_append_and_cursor(self):
+        self.waypoints.append(19411551, 51705909)
+        self.waypoints.append(19412551, 51706909)
+        self.assertEqual(len(self.waypoints.coords), 8)
+        self.assertEqual(self.waypoints.current(), (19411551, 51705909))
+        self.waypoints.advance()
+        self.assertEqual(self.waypoints.current(), (19412551, 51706909))
+        self.assertEqual(self.waypoints.current_index(), 1)
+        self.waypoints.advance()
+        self.assertFalse(self.waypoints.has_current())
+        self.assertFalse(self.waypoints.finished())
+
+    def test_full(self):
+        for i in range(4):
+            self.waypoints.append(i, -i)
+        self.assertEqual(self.waypoints.free(), 0)
+        with self.assertRaises(IndexError):
+            self.waypoints.append(4, -4)
+
+    def test_compact_keeps_trail_indexes(self):
+        for i in range(4):
+            self.waypoints.append(i, -i)
+        self.waypoints.frame = object()
+        self.waypoints.advance()
+        self.waypoints.advance()
+        self.assertEqual(self.waypoints.free(), 2)
+        self.waypoints.compact()
+        self.assertIsNone(self.waypoints.frame)
+        self.assertEqual((self.waypoints.offset, self.waypoints.length), (2, 2))
+        self.assertEqual(self.waypoints.current(), (2, -2))
+        self.assertEqual(self.waypoints.current_index(), 0)
+        self.waypoints.append(4, -4)
+        self.waypoints.append(5, -5)
+        self.assertEqual(self.waypoints.end(), 6)
+        visited = []
+        while self.waypoints.has_current():
+            visited.append(self.waypoints.current())
+            self.waypoints.advance()
+        self.assertEqual(visited, [(2, -2), (3, -3), (4, -4), (5, -5)])
+        self.assertTrue(self.waypoints.finished())
+
+    def test_previous_survives_compact(self):
+        self.waypoints.append(1, 2)
+        self.waypoints.append(3, 4)
+        self.assertIsNone(self.waypoints.previous)
+        self.waypoints.advance()
+        self.waypoints.compact()
+        self.assertEqual(self.waypoints.previous, (1, 2))
+        self.assertEqual(self.waypoints.current(), (3, 4))
+        self.waypoints.clear()
+        self.assertIsNone(self.waypoints.previous)
+
+    def test_compact_past_window(self):
+        self.waypoints.append(0, 0)
+        for _ in range(3):
+            self.waypoints.advance()
+        self.waypoints.compact()
+        self.assertEqual((self.waypoints.offset, self.waypoints.length), (1, 0))
+        self.assertFalse(self.waypoints.has_current())
+
+    def test_clear(self):
+        self.waypoints.append(1, 2)
+        self.waypoints.advance()
+        self.waypoints.clear()
+        self.assertEqual((self.waypoints.length, self.waypoints.cursor, self.waypoints.total), (0, 0, 0))
+        self.assertTrue(self.waypoints.finished())
+
+
+if __name__ == '__main__':
+    unittest.main()
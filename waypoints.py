@@ -0,0 +1,79 @@
+from array import array
+
+
+class Waypoints:
+    """
+    Trail waypoints packed as integer microdegrees [lon0, lat0, lon1, lat1, ...]
+    in a preallocated array, 8 bytes per waypoint.
+    Holds a window of the trail: waypoint number `offset` is stored first,
+    the cursor is the trail index of the current target and only moves forward.
+    Reached waypoints are dropped by compact() to make space for next ones,
+    the last reached one is kept in `previous` as the start of the current segment.
+    """
+    def __init__(self, capacity):
+        self.coords = array("i", bytes(8 * capacity))
+        self.capacity = capacity
+        self.length = 0         # Waypoints in the window.
+        self.offset = 0         # Trail index of the first waypoint in the window.
+        self.cursor = 0         # Trail index of the current waypoint.
+        self.total = 0          # Waypoints of the whole trail.
+        self.previous = None    # Last reached waypoint (lon, lat), None at the trail start.
+        self.frame = None       # Window in local frame, compiled by Navigation, None after a change.
+
+    def clear(self, total=0):
+        self.length = 0
+        self.offset = 0
+        self.cursor = 0
+        self.total = total
+        self.previous = None
+        self.frame = None
+
+    def append(self, lon, lat):
+        if self.length == self.capacity:
+            raise IndexError("Waypoints full")
+        i = 2 * self.length
+        self.coords[i] = lon
+        self.coords[i + 1] = lat
+        self.length += 1
+        self.frame = None
+
+    def end(self):
+        """Trail index after the last waypoint in the window."""
+        return self.offset + self.length
+
+    def free(self):
+        """Space for new waypoints after compact()."""
+        return self.capacity - (self.end() - max(self.cursor, self.offset))
+
+    def compact(self):
+        """Drop reached waypoints."""
+        dropped = min(self.cursor - self.offset, self.length)
+        if dropped <= 0:
+            return
+        coords = self.coords
+        shift = 2 * dropped
+        for i in range(2 * (self.length - dropped)):
+            coords[i] = coords[i + shift]
+        self.length -= dropped
+        self.offset += dropped
+        self.frame = None
+
+    def has_current(self):
+        return self.offset <= self.cursor < self.end()
+
+    def current(self):
+        """Current waypoint (lon, lat) in microdegrees."""
+        i = 2 * (self.cursor - self.offset)
+        return self.coords[i], self.coords[i + 1]
+
+    def current_index(self):
+        """Position of the current waypoint in the window and its frame."""
+        return self.cursor - self.offset
+
+    def advance(self):
+        if self.has_current():
+            self.previous = self.current()
+        self.cursor += 1
+
+    def finished(self):
+        return self.cursor >= self.total